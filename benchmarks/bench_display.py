@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+Display Text Benchmark for CO2 Monitor
+Compares drawing the reading on the OLED with the previous text_2x(), which
+scaled the 8x8 font pixel by pixel on every update, against font.Font, which
+scales each glyph once and blits it from a cache.
+
+framebuf is a C module on the device, so the cost of drawing lies in the
+number of calls the interpreter makes into it. The benchmark runs both on a
+host stand-in for framebuf that counts those calls. The stand-in draws each
+character as a fixed pattern of columns rather than the real font, which
+keeps the number of lit pixels realistic without shipping the font data.
+"""
+import argparse
+import sys
+import types
+from collections import Counter
+
+sys.path.insert(0, '.')
+
+WIDTH = 128
+HEIGHT = 32
+
+calls = Counter()
+
+
+class FrameBuffer:
+    """MONO_VLSB frame buffer: one byte per column of each 8-row page"""
+
+    def __init__(self, buffer, width, height, format=0):
+        calls['FrameBuffer'] += 1
+        self.buffer = buffer
+        self.width = width
+        self.height = height
+
+    def _get(self, x, y):
+        return self.buffer[(y >> 3) * self.width + x] >> (y & 7) & 1
+
+    def _set(self, x, y, c):
+        if 0 <= x < self.width and 0 <= y < self.height:
+            i = (y >> 3) * self.width + x
+            if c:
+                self.buffer[i] |= 1 << (y & 7)
+            else:
+                self.buffer[i] &= ~(1 << (y & 7))
+
+    def fill(self, c):
+        calls['fill'] += 1
+        for i in range(len(self.buffer)):
+            self.buffer[i] = 0xFF if c else 0
+
+    def pixel(self, x, y, c=None):
+        calls['pixel'] += 1
+        if c is None:
+            return self._get(x, y)
+        self._set(x, y, c)
+
+    def text(self, s, x, y, c=1):
+        calls['text'] += 1
+        for k, char in enumerate(s):
+            for col, bits in enumerate(glyph_columns(char)):
+                for row in range(8):
+                    if bits >> row & 1:
+                        self._set(x + 8 * k + col, y + row, c)
+
+    def blit(self, fb, x, y, key=-1):
+        calls['blit'] += 1
+        for sy in range(fb.height):
+            for sx in range(fb.width):
+                c = fb._get(sx, sy)
+                if c != key:
+                    self._set(x + sx, y + sy, c)
+
+
+def glyph_columns(char):
+    """Stand-in 8x8 glyph: blank columns on both sides like the real font,
+    a space is blank"""
+    if char == ' ':
+        return [0] * 8
+    k = ord(char)
+    width = 4 + k % 3
+    return ([0] + [(k * 37 + c * 91) & 0x7E | 0x02 for c in range(width)]
+            + [0] * (7 - width))
+
+
+def install_framebuf():
+    module = types.ModuleType('framebuf')
+    module.FrameBuffer = FrameBuffer
+    module.MONO_VLSB = 0
+    sys.modules['framebuf'] = module
+
+
+def text_2x(display, text, x, y):
+    """The previous 2x text: renders to a new buffer, then reads every pixel
+    back and draws each lit one as a 2x2 block"""
+    import framebuf
+    text_width = len(text) * 8
+    buf = bytearray(text_width)
+    fb = framebuf.FrameBuffer(buf, text_width, 8, framebuf.MONO_VLSB)
+    fb.fill(0)
+    fb.text(text, 0, 0, 1)
+    for py in range(8):
+        for px in range(text_width):
+            if fb.pixel(px, py):
+                display.pixel(x + px * 2, y + py * 2, 1)
+                display.pixel(x + px * 2 + 1, y + py * 2, 1)
+                display.pixel(x + px * 2, y + py * 2 + 1, 1)
+                display.pixel(x + px * 2 + 1, y + py * 2 + 1, 1)
+
+
+def legacy_update(display, fonts, value):
+    """update_display() before the font cache"""
+    display.fill(0)
+    text = f"CO2:{value}"
+    text_2x(display, text, (WIDTH - len(text) * 16) // 2, 8)
+
+
+def cached_update(display, fonts, value):
+    """update_display() of main.py"""
+    digits_3x, digits_2x = fonts
+    display.fill(0)
+    display.text("CO2", 0, 4, 1)
+    display.text("ppm", 0, 20, 1)
+    value = str(value)
+    font = digits_3x if digits_3x.width(value) <= WIDTH - 28 else digits_2x
+    font.draw(display, value, WIDTH - font.width(value),
+              (HEIGHT - font.height) // 2)
+
+
+def check_identical():
+    """Font at 2x must draw the same pixels as text_2x, and at 3x the same
+    pixels as scaling the 8x8 text by hand"""
+    from font import Font
+    for scale in (2, 3):
+        text = 'CO2:1234'
+        width = len(text) * 8 * scale
+        expected = FrameBuffer(bytearray(width * scale), width, 8 * scale)
+        if scale == 2:
+            text_2x(expected, text, 0, 0)
+        else:
+            source = FrameBuffer(bytearray(len(text) * 8), len(text) * 8, 8)
+            source.text(text, 0, 0, 1)
+            for y in range(expected.height):
+                for x in range(expected.width):
+                    if source._get(x // scale, y // scale):
+                        expected._set(x, y, 1)
+        drawn = FrameBuffer(bytearray(len(expected.buffer)), expected.width,
+                            expected.height)
+        Font(scale=scale).draw(drawn, text, 0, 0)
+        if drawn.buffer != expected.buffer:
+            sys.exit(f"{scale}x glyphs differ from the scaled font")
+
+
+def run(update, fonts, values):
+    """Return the framebuf calls of the first update, the average of the
+    following ones and their breakdown. Host times are left out: they
+    measure the stand-in's pixel loops, which are C code on the device."""
+    display = FrameBuffer(bytearray(WIDTH * HEIGHT // 8), WIDTH, HEIGHT)
+    calls.clear()
+    update(display, fonts, values[0])
+    first = sum(calls.values())
+    calls.clear()
+    for value in values[1:]:
+        update(display, fonts, value)
+    return first, sum(calls.values()) / (len(values) - 1), dict(calls)
+
+
+def main():
+    """Main CLI interface"""
+    parser = argparse.ArgumentParser(
+        description="Benchmark drawing the CO2 reading on the OLED")
+    parser.add_argument('--updates', type=int, default=200,
+                        help='Number of display updates measured')
+    args = parser.parse_args()
+
+    install_framebuf()
+    from font import Font
+    check_identical()
+
+    # readings drift like a room's CO2 over a day, with a sensor dropout
+    values = [420 + (i * 37) % 1400 for i in range(args.updates)]
+    values[args.updates // 2] = '----'
+    fonts = (Font(scale=3, proportional=True),
+             Font(scale=2, proportional=True))
+
+    print(f"{'drawing':>8} {'calls (1st)':>11} {'calls/update':>12}  "
+          f"breakdown")
+    for label, update in (('legacy', legacy_update),
+                          ('cached', cached_update)):
+        first, per_update, breakdown = run(update, fonts, values)
+        detail = ' '.join(f"{k}={v}" for k, v in sorted(breakdown.items()))
+        print(f"{label:>8} {first:>11} {per_update:>12.1f}  {detail}")
+
+
+if __name__ == "__main__":
+    main()
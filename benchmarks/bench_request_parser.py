@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Request Parser Benchmark for CO2 Monitor
+Compares Microdot's request parser, which keeps the header lines as read and
+decodes them on access, against the previous parser that decoded every header
+line into a NoCaseDict
+"""
+import argparse
+import asyncio
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, '.')
+from microdot import Microdot, NoCaseDict, Request
+
+# the head of a dashboard request as sent by a desktop browser
+BROWSER_REQUEST = (
+    b'GET /spark/week32.csv HTTP/1.1\r\n'
+    b'Host: 192.168.1.50\r\n'
+    b'Connection: keep-alive\r\n'
+    b'Cache-Control: max-age=0\r\n'
+    b'Upgrade-Insecure-Requests: 1\r\n'
+    b'User-Agent: Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 '
+    b'(KHTML, like Gecko) Chrome/126.0.0.0 Safari/537.36\r\n'
+    b'Accept: text/html,application/xhtml+xml,application/xml;q=0.9,'
+    b'image/avif,image/webp,*/*;q=0.8\r\n'
+    b'Referer: http://192.168.1.50/\r\n'
+    b'Accept-Encoding: gzip, deflate\r\n'
+    b'Accept-Language: en-US,en;q=0.9\r\n'
+    b'If-None-Match: "1f40-66b4a2c0"\r\n'
+    b'\r\n'
+)
+
+# the head of a request sent by a script polling the API
+CURL_REQUEST = (
+    b'GET /co2 HTTP/1.1\r\n'
+    b'Host: 192.168.1.50\r\n'
+    b'User-Agent: curl/8.5.0\r\n'
+    b'Accept: */*\r\n'
+    b'\r\n'
+)
+
+
+async def legacy_create(app, client_reader, client_writer, client_addr):
+    """Parse a request the way Microdot did before the lazy parser"""
+    line = (await Request._safe_readline(client_reader)).strip().decode()
+    if not line:
+        return None
+    method, url, http_version = line.split()
+    http_version = http_version.split('/', 1)[1]
+
+    headers = NoCaseDict()
+    content_length = 0
+    while True:
+        line = (await Request._safe_readline(
+            client_reader)).strip().decode()
+        if line == '':
+            break
+        header, value = line.split(':', 1)
+        value = value.strip()
+        headers[header] = value
+        if header.lower() == 'content-length':
+            content_length = int(value)
+
+    body = b''
+    stream = client_reader
+    if content_length and content_length <= Request.max_body_length:
+        body = await client_reader.readexactly(content_length)
+        stream = None
+    return Request(app, client_addr, method, url, http_version, headers,
+                   body=body, stream=stream,
+                   sock=(client_reader, client_writer))
+
+
+def make_reader(data, count):
+    """Return a reader with ``count`` pipelined copies of a request"""
+    reader = asyncio.StreamReader()
+    reader.feed_data(data * count)
+    reader.feed_eof()
+    return reader
+
+
+async def parse_all(create, app, data, count):
+    """Parse requests the way a handler would use them, reading the two
+    headers the monitor's routes look at"""
+    reader = make_reader(data, count)
+    for _ in range(count):
+        req = await create(app, reader, None, None)
+        req.headers.get('If-None-Match')
+        req.headers.get('Connection')
+
+
+def bench_time(create, app, data, count):
+    start = time.perf_counter()
+    asyncio.run(parse_all(create, app, data, count))
+    return (time.perf_counter() - start) / count * 1e6
+
+
+def bench_memory(create, app, data):
+    """Return the peak bytes allocated while parsing one request and the
+    bytes still held by the request object afterwards"""
+    async def parse_one():
+        reader = make_reader(data, 1)
+        tracemalloc.start()
+        req = await create(app, reader, None, None)
+        req.headers.get('If-None-Match')
+        req.headers.get('Connection')
+        held, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        return held, peak
+
+    return asyncio.run(parse_one())
+
+
+def main():
+    """Main CLI interface"""
+    parser = argparse.ArgumentParser(
+        description="Benchmark Microdot request parsing")
+    parser.add_argument('--requests', type=int, default=5000,
+                        help='Number of requests parsed per measurement')
+    args = parser.parse_args()
+
+    # the timeouts are applied around the parser, leave them out so that
+    # only the parsers are compared
+    Request.head_timeout = Request.body_timeout = None
+
+    app = Microdot()
+    print(f"{'request':>8} {'parser':>9} {'us/req':>8} {'peak (B)':>9} "
+          f"{'held (B)':>9}")
+    for name, data in (('browser', BROWSER_REQUEST), ('curl', CURL_REQUEST)):
+        for label, create in (('legacy', legacy_create),
+                              ('lazy', Request.create)):
+            us = bench_time(create, app, data, args.requests)
+            held, peak = bench_memory(create, app, data)
+            print(f"{name:>8} {label:>9} {us:>8.2f} {peak:>9} {held:>9}")
+
+
+if __name__ == "__main__":
+    main()
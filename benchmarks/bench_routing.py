@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Routing Benchmark for CO2 Monitor
+Compares Microdot's dispatch index against a linear scan of the URL map
+"""
+import argparse
+import sys
+import time
+
+sys.path.insert(0, '.')
+from microdot import Microdot
+
+
+def build_app(num_routes):
+    """Create an app with a mix of static, parametrized and regex routes"""
+    app = Microdot()
+
+    def handler(request, **kwargs):
+        return ''
+
+    for i in range(num_routes):
+        kind = i % 4
+        if kind == 0:
+            app.route(f'/api/v1/resource{i}')(handler)
+        elif kind == 1:
+            app.route(f'/api/v1/resource{i}/<name>')(handler)
+        elif kind == 2:
+            app.route(f'/api/v1/resource{i}/<int:id>/items')(handler)
+        else:
+            app.route(f'/api/v1/resource{i}/<re:[a-f0-9]+:key>')(handler)
+
+    # the routes of the monitor application, registered last so that they
+    # are the worst case for a linear scan
+    for url in ['/', '/co2', '/status', '/download/<filename>',
+                '/spark/<filename>', '/delete/<filename>',
+                '/truncate/<filename>']:
+        app.route(url)(handler)
+    return app
+
+
+def linear_match(app, path):
+    """Match a path the way Microdot did before the dispatch index"""
+    matches = []
+    for route in app.url_map:
+        args = route[1].match(path)
+        if args is not None:
+            matches.append((route, args))
+    return matches
+
+
+def bench(func, paths, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        for path in paths:
+            func(path)
+    elapsed = time.perf_counter() - start
+    return elapsed / (iterations * len(paths)) * 1e6
+
+
+def main():
+    """Main CLI interface"""
+    parser = argparse.ArgumentParser(description="Benchmark Microdot routing")
+    parser.add_argument('--routes', type=int, nargs='+',
+                        default=[10, 100, 300, 600],
+                        help='Number of extra routes to register')
+    parser.add_argument('--iterations', type=int, default=2000,
+                        help='Number of passes over the request paths')
+    args = parser.parse_args()
+
+    paths = ['/', '/co2', '/spark/week32.csv', '/download/week32.csv',
+             '/api/v1/resource5/abc', '/api/v1/resource6/42/items',
+             '/api/v1/resource7/beef', '/not/found']
+
+    print(f"{'routes':>8} {'linear (us)':>12} {'index (us)':>12} {'speedup':>8}")
+    for num_routes in args.routes:
+        app = build_app(num_routes)
+        for path in paths:
+            # both strategies must agree before they are compared
+            assert app.match_routes(path) == linear_match(app, path), path
+        linear = bench(lambda path: linear_match(app, path), paths,
+                       args.iterations)
+        indexed = bench(app.match_routes, paths, args.iterations)
+        print(f"{num_routes:>8} {linear:>12.2f} {indexed:>12.2f} "
+              f"{linear / indexed:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Template Rendering Benchmark for CO2 Monitor
+Compares the pages generated by the stock utemplate compiler against the
+optimized compiler: chunks yielded, chunks encoded at run time, page size
+and the time to render a page to bytes
+"""
+import argparse
+import io
+import sys
+import time
+
+sys.path.insert(0, '.')
+from utemplate.source import Compiler
+
+LOG_FILES = [(f'week{n:02d}.csv', 180000 + n * 37) for n in range(40, 30, -1)]
+
+# template name -> keyword arguments of the page rendered by main.py
+PAGES = {
+    'index.tpl': dict(current_co2=850, last_measurement_time='12:04:31',
+                      current_time='2025-08-08 12:05:02', log_files=LOG_FILES),
+    'chart.tpl': dict(title='week32', series_url='/api/series/week32.csv',
+                      is_weekly=True),
+}
+
+
+def compile_render(name, optimize):
+    """Compile a template in memory and return its render function"""
+    out = io.StringIO()
+    with open('templates/' + name) as f:
+        Compiler(f, out, optimize=optimize).compile()
+    # fragments cached by {% cache %} are keyed by module name
+    namespace = {'__name__': f'{name}:{optimize}'}
+    exec(out.getvalue(), namespace)
+    return namespace['render']
+
+
+def render_bytes(render, kwargs):
+    """Render a page to bytes the way the application consumes it"""
+    chunks = list(render(**kwargs))
+    if chunks and isinstance(chunks[0], str):
+        return ''.join(chunks).encode()
+    return b''.join(chunks)
+
+
+def count_chunks(render, kwargs):
+    """Return the number of chunks yielded and how many of them had to be
+    encoded at run time instead of coming from a constant. The page is
+    rendered once first, so that fragments are counted as served from the
+    fragment cache."""
+    constants = {id(c) for c in render.__code__.co_consts
+                 if isinstance(c, bytes)}
+    render_bytes(render, kwargs)
+    chunks = list(render(**kwargs))
+    encoded = sum(1 for c in chunks if id(c) not in constants)
+    return len(chunks), encoded
+
+
+def bench_time(render, kwargs, count):
+    start = time.perf_counter()
+    for _ in range(count):
+        render_bytes(render, kwargs)
+    return (time.perf_counter() - start) / count * 1e6
+
+
+def main():
+    """Main CLI interface"""
+    parser = argparse.ArgumentParser(
+        description="Benchmark the utemplate compiler optimizations")
+    parser.add_argument('--renders', type=int, default=2000,
+                        help='Number of renders per measurement')
+    args = parser.parse_args()
+
+    print(f"{'template':>10} {'compiler':>9} {'yields':>7} {'encodes':>8} "
+          f"{'bytes':>6} {'us/page':>8}")
+    for name, kwargs in PAGES.items():
+        pages = []
+        for label, optimize in (('stock', False), ('optimized', True)):
+            render = compile_render(name, optimize)
+            yields, encodes = count_chunks(render, kwargs)
+            page = render_bytes(render, kwargs)
+            pages.append(page)
+            us = bench_time(render, kwargs, args.renders)
+            print(f"{name:>10} {label:>9} {yields:>7} {encodes:>8} "
+                  f"{len(page):>6} {us:>8.2f}")
+        if pages[0].split() != pages[1].split():
+            print(f"ERROR: {name} renders differently apart from whitespace")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Boot Report for CO2 Monitor
+Deploys the application as sources and then as .mpy bytecode and, after each
+deployment, imports every module on the device to compare import time and
+heap use
+"""
+import argparse
+import json
+import subprocess
+import sys
+
+sys.path.insert(0, '.')
+from deploy import deploy, device_modules
+
+# Run on the device after a soft reset. Automatic collection is disabled
+# while a module is imported so that the heap used to compile a source file
+# is still allocated when the import returns. If the heap fills up,
+# MicroPython collects anyway and the allocation figure is a lower bound.
+DEVICE_SCRIPT = """
+import gc, json, time
+for name in {modules!r}:
+    gc.collect()
+    before = gc.mem_alloc()
+    gc.disable()
+    start = time.ticks_us()
+    error = None
+    try:
+        __import__(name)
+    except Exception as exc:
+        error = repr(exc)
+    us = time.ticks_diff(time.ticks_us(), start)
+    alloc = gc.mem_alloc() - before
+    gc.enable()
+    gc.collect()
+    print(json.dumps([name, us, alloc, gc.mem_alloc() - before, error]))
+print(json.dumps(["free", gc.mem_free()]))
+"""
+
+
+def module_names():
+    """Return the import names of the deployed modules, in the order of the
+    manifest (dependencies first)"""
+    return [source[:-3].replace('/', '.') for source in device_modules()]
+
+
+def measure(device):
+    """Soft reset the device, import the modules and return the results"""
+    command = ['mpremote'] + (['connect', device] if device else [])
+    command += ['soft-reset', 'exec',
+                DEVICE_SCRIPT.format(modules=module_names())]
+    output = subprocess.run(command, capture_output=True, text=True,
+                            check=True).stdout
+    rows = {}
+    free = None
+    for line in output.splitlines():
+        if not line.startswith('['):
+            continue
+        row = json.loads(line)
+        if row[0] == 'free':
+            free = row[1]
+        else:
+            name, us, alloc, held, error = row
+            rows[name] = {'ms': us / 1000, 'alloc': alloc, 'held': held,
+                          'error': error}
+    return {'modules': rows, 'free': free}
+
+
+def print_report(results):
+    source, mpy = results['source'], results['mpy']
+    print(f"{'module':>28} {'src ms':>8} {'mpy ms':>8} {'src alloc':>10} "
+          f"{'mpy alloc':>10} {'src held':>9} {'mpy held':>9}")
+    totals = [0, 0, 0, 0]
+    for name, s in source['modules'].items():
+        m = mpy['modules'][name]
+        print(f"{name:>28} {s['ms']:>8.1f} {m['ms']:>8.1f} "
+              f"{s['alloc']:>10} {m['alloc']:>10} {s['held']:>9} "
+              f"{m['held']:>9}")
+        for r in (s, m):
+            if r['error']:
+                print(f"{'':>28} {r['error']}")
+        totals[0] += s['ms']
+        totals[1] += m['ms']
+        totals[2] = max(totals[2], s['alloc'])
+        totals[3] = max(totals[3], m['alloc'])
+    print(f"{'total ms / peak alloc':>28} {totals[0]:>8.1f} {totals[1]:>8.1f} "
+          f"{totals[2]:>10} {totals[3]:>10}")
+    print(f"Free heap after imports: {source['free']} (source), "
+          f"{mpy['free']} (mpy)")
+
+
+def main():
+    """Main CLI interface"""
+    parser = argparse.ArgumentParser(
+        description="Compare device import time and heap between source "
+        "and .mpy deployments")
+    parser.add_argument('--device', help='mpremote device, e.g. /dev/ttyACM0')
+    parser.add_argument('--output', help='Write the results to a JSON file')
+    args = parser.parse_args()
+
+    results = {}
+    for variant in ('source', 'mpy'):
+        if not deploy(variant == 'mpy', args.device):
+            sys.exit(1)
+        results[variant] = measure(args.device)
+    print_report(results)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,427 @@
+#!/usr/bin/env python3
+"""
+HTTP Load Test for CO2 Monitor
+Boots the routes of main.py on CPython with fake hardware modules and an SD
+card backed by a temporary directory, drives them with concurrent clients
+and reports latency percentiles, throughput and peak memory per route
+"""
+import argparse
+import asyncio
+import builtins
+import calendar
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+import types
+import warnings
+from datetime import datetime, timedelta
+
+sys.path.insert(0, '.')
+
+# Path templates of the routes that can be part of the load mix
+ROUTES = {
+    'index': '/',
+    'co2': '/co2',
+    'spark': '/spark/{file}',
+    'svg': '/svg/{file}',
+    'download': '/download/{file}',
+    'series': '/api/series/{file}',
+    'sampled': '/api/series/{file}?points=840',
+    'binary': '/api/series/{file}?points=840&format=bin',
+    'range': '/api/range?points=840&format=bin',
+}
+
+DEFAULT_MIX = 'index:3,co2:4,spark:2,download:1'
+
+
+class FakeSD:
+    """Map the /sd mount point of the device to a host directory"""
+
+    def __init__(self, root):
+        self.root = root
+        self.real_open = builtins.open
+        self.real = {name: getattr(os, name)
+                     for name in ('stat', 'listdir', 'remove', 'mkdir')}
+
+    def path(self, path):
+        if isinstance(path, str) and (path == '/sd' or path.startswith('/sd/')):
+            return os.path.join(self.root, path[4:])
+        if path == 'password_work.txt':
+            return os.path.join(self.root, path)
+        return path
+
+    def install(self):
+        real_open = self.real_open
+        builtins.open = lambda file, *args, **kwargs: real_open(
+            self.path(file), *args, **kwargs)
+        for name, func in self.real.items():
+            setattr(os, name, self._wrap(func))
+        os.mount = lambda device, mount_point: None
+
+    def _wrap(self, func):
+        return lambda path, *args, **kwargs: func(self.path(path), *args,
+                                                  **kwargs)
+
+
+def fake_utime():
+    """The subset of MicroPython's utime used by main.py"""
+    utime = types.ModuleType('utime')
+
+    def mktime(t):
+        # MicroPython takes an 8-tuple and interprets it as UTC
+        return calendar.timegm(tuple(t[:6]) + (0, 0, 0))
+
+    def gmtime(secs=None):
+        return time.gmtime(secs)[:8]
+
+    utime.mktime = mktime
+    utime.gmtime = gmtime
+    utime.localtime = gmtime
+    utime.time = time.time
+    utime.sleep = time.sleep
+    return utime
+
+
+def install_fake_hardware(co2=650):
+    """Register stand-ins for the MicroPython and device driver modules"""
+    class Device:
+        def __init__(self, *args, **kwargs):
+            pass
+
+        def __getattr__(self, name):
+            # drawing and control calls are accepted and ignored
+            return lambda *args, **kwargs: None
+
+    class I2C(Device):
+        def scan(self):
+            return [0x3c, 0x62, 0x68]
+
+    class WLAN(Device):
+        def isconnected(self):
+            return True
+
+        def status(self):
+            return 3
+
+        def ifconfig(self):
+            return ('127.0.0.1', '255.0.0.0', '127.0.0.1', '127.0.0.1')
+
+    class DS3231(Device):
+        def datetime(self, datetime=None):
+            t = time.localtime()
+            return (t[0], t[1], t[2], t[6] + 1, t[3], t[4], t[5], 0)
+
+    class SCD4X(Device):
+        data_ready = True
+
+        @property
+        def co2(self):
+            return co2
+
+    modules = {
+        'machine': {'I2C': I2C, 'SPI': Device, 'Pin': Device},
+        'network': {'WLAN': WLAN, 'STA_IF': 0, 'STAT_GOT_IP': 3},
+        'sdcard': {'SDCard': Device},
+        'ds3231': {'DS3231': DS3231},
+        'scd4x': {'SCD4X': SCD4X},
+        'ssd1306': {'SSD1306_I2C': Device},
+        'framebuf': {'FrameBuffer': Device, 'MONO_VLSB': 0},
+    }
+    for name, attrs in modules.items():
+        module = types.ModuleType(name)
+        module.__dict__.update(attrs)
+        sys.modules[name] = module
+    sys.modules['utime'] = fake_utime()
+    sys.modules['ujson'] = json
+
+
+def seed_readings(root, weeks, interval, seed=42):
+    """Write week files like the monitor logs them, ending with the live
+    week, and return their names newest first"""
+    rnd = random.Random(seed)
+    readings = os.path.join(root, 'readings')
+    os.makedirs(readings, exist_ok=True)
+    now = datetime.now().replace(second=0, microsecond=0)
+    files = []
+    for w in range(weeks):
+        day = now - timedelta(weeks=w)
+        week = day.isocalendar()[1]
+        start = (day - timedelta(days=day.weekday())).replace(hour=0,
+                                                              minute=1)
+        end = min(start + timedelta(days=7), now)
+        name = f'week{week}.csv'
+        with open(os.path.join(readings, name), 'w') as f:
+            f.write('time,co2\n')
+            t = start
+            while t < end:
+                # occupied rooms build up CO2 during the day
+                base = 900 if 8 <= t.hour <= 22 and t.weekday() < 5 else 520
+                f.write(f'{t:%Y-%m-%d %H:%M:%S},'
+                        f'{max(400, base + rnd.randint(-120, 120))}\n')
+                t += timedelta(minutes=interval)
+        files.append(name)
+    with open(os.path.join(root, 'password_work.txt'), 'w') as f:
+        f.write('loadtest\nloadtest\n')
+    return files
+
+
+def boot_app(sd_root):
+    """Import main.py with fake hardware and return the module"""
+    FakeSD(sd_root).install()
+    install_fake_hardware()
+    with warnings.catch_warnings():
+        # main.py calls asyncio.sleep() without awaiting it at import time
+        warnings.simplefilter('ignore', RuntimeWarning)
+        import main
+    main.current_co2 = 650
+    main.last_measurement_time = main.get_timestamp()
+    return main
+
+
+def parse_mix(spec, files):
+    """Turn 'index:3,spark:1' into weighted (name, path) choices"""
+    choices = []
+    for item in spec.split(','):
+        name, _, weight = item.partition(':')
+        if name not in ROUTES:
+            raise SystemExit(f"Unknown route '{name}', expected one of "
+                             f"{', '.join(ROUTES)}")
+        paths = [ROUTES[name].format(file=f) for f in files] \
+            if '{file}' in ROUTES[name] else [ROUTES[name]]
+        choices.append((name, paths, int(weight or 1)))
+    return choices
+
+
+async def fetch(reader, writer, path):
+    """Send a GET request over a persistent connection and read the whole
+    response. Returns the status code, body size and whether the server
+    keeps the connection open."""
+    writer.write(f'GET {path} HTTP/1.1\r\nHost: loadtest\r\n'
+                 f'Accept-Encoding: gzip\r\n\r\n'.encode())
+    await writer.drain()
+    head = await reader.readuntil(b'\r\n\r\n')
+    lines = head.decode().split('\r\n')
+    status = int(lines[0].split()[1])
+    headers = {}
+    for line in lines[1:]:
+        if line:
+            name, value = line.split(':', 1)
+            headers[name.lower()] = value.strip()
+    size = 0
+    if 'content-length' in headers:
+        size = int(headers['content-length'])
+        await reader.readexactly(size)
+    elif headers.get('transfer-encoding') == 'chunked':
+        while True:
+            length = int((await reader.readline()).strip(), 16)
+            await reader.readexactly(length + 2)
+            size += length
+            if length == 0:
+                break
+    else:
+        size = len(await reader.read())
+    keep_alive = headers.get('connection', '').lower() != 'close' and \
+        lines[0].startswith('HTTP/1.1')
+    return status, size, keep_alive
+
+
+async def client(port, choices, deadline, results, rnd):
+    weights = [weight for _, _, weight in choices]
+    conn = None
+    while time.perf_counter() < deadline:
+        name, paths, _ = rnd.choices(choices, weights)[0]
+        path = rnd.choice(paths)
+        start = time.perf_counter()
+        try:
+            if conn is None:
+                conn = await asyncio.open_connection('127.0.0.1', port)
+            status, size, keep_alive = await fetch(*conn, path)
+        except (OSError, asyncio.IncompleteReadError, ValueError):
+            status, size, keep_alive = 0, 0, False
+        elapsed = time.perf_counter() - start
+        results.setdefault(name, []).append((elapsed, status, size))
+        if not keep_alive and conn is not None:
+            conn[1].close()
+            conn = None
+    if conn is not None:
+        conn[1].close()
+
+
+async def run_load(port, choices, concurrency, duration, seed):
+    results = {}
+    start = time.perf_counter()
+    await asyncio.gather(*[
+        client(port, choices, start + duration, results,
+               random.Random(seed + i))
+        for i in range(concurrency)])
+    return results, time.perf_counter() - start
+
+
+class NullWriter:
+    """A connection writer that discards the response"""
+
+    async def awrite(self, data):
+        pass
+
+    async def aclose(self):
+        pass
+
+    def get_extra_info(self, name):
+        return ('127.0.0.1', 0)
+
+
+async def measure_memory(app, choices):
+    """Peak traced memory, in bytes, of one request to each route with no
+    other traffic.
+
+    The request is handed to the app over in-memory streams, since the
+    256KB receive buffer of CPython's socket transports would otherwise
+    dominate the peak.
+    """
+    async def request(path):
+        reader = asyncio.StreamReader()
+        reader.feed_data(f'GET {path} HTTP/1.1\r\nHost: loadtest\r\n'
+                         f'Connection: close\r\n\r\n'.encode())
+        reader.feed_eof()
+        await app.handle_request(reader, NullWriter())
+
+    peaks = {}
+    for name, paths, _ in choices:
+        await request(paths[0])  # warm up imports and caches
+        tracemalloc.start()
+        base = tracemalloc.get_traced_memory()[0]
+        await request(paths[-1])
+        peaks[name] = tracemalloc.get_traced_memory()[1] - base
+        tracemalloc.stop()
+    return peaks
+
+
+async def run(app, choices, concurrency, duration, seed):
+    """Serve the app on an ephemeral port, apply the load and then measure
+    the memory used by each route"""
+    app.server = None
+    server = asyncio.create_task(app.start_server(host='127.0.0.1', port=0))
+    while app.server is None:
+        await asyncio.sleep(0)
+    port = app.server.sockets[0].getsockname()[1]
+    try:
+        results, elapsed = await run_load(port, choices, concurrency,
+                                          duration, seed)
+        # let the server see the clients disconnect
+        await asyncio.sleep(0.1)
+    finally:
+        app.shutdown()
+        await server
+    peaks = await measure_memory(app, choices)
+    return results, elapsed, peaks
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def summarize(results, elapsed, peaks):
+    routes = {}
+    for name, samples in sorted(results.items()):
+        latencies = [s[0] * 1000 for s in samples]
+        status = {}
+        for _, code, _ in samples:
+            status[str(code)] = status.get(str(code), 0) + 1
+        routes[name] = {
+            'requests': len(samples),
+            'rps': round(len(samples) / elapsed, 1),
+            'p50_ms': round(percentile(latencies, 0.50), 2),
+            'p95_ms': round(percentile(latencies, 0.95), 2),
+            'p99_ms': round(percentile(latencies, 0.99), 2),
+            'bytes': sum(s[2] for s in samples),
+            'status': status,
+            'peak_memory': peaks.get(name, 0),
+        }
+    total = sum(r['requests'] for r in routes.values())
+    return {'requests': total, 'rps': round(total / elapsed, 1),
+            'routes': routes}
+
+
+def print_report(summary, baseline=None):
+    print(f"{'route':>9} {'reqs':>6} {'req/s':>7} {'p50 ms':>8} "
+          f"{'p95 ms':>8} {'p99 ms':>8} {'peak KB':>8}  status")
+    for name, r in summary['routes'].items():
+        line = (f"{name:>9} {r['requests']:>6} {r['rps']:>7} "
+                f"{r['p50_ms']:>8} {r['p95_ms']:>8} {r['p99_ms']:>8} "
+                f"{r['peak_memory'] / 1024:>8.1f}  {r['status']}")
+        print(line)
+        old = (baseline or {}).get('routes', {}).get(name)
+        if old:
+            print(f"{'vs base':>9} {'':>6} "
+                  f"{r['rps'] - old['rps']:>+7.1f} "
+                  f"{r['p50_ms'] - old['p50_ms']:>+8.2f} "
+                  f"{r['p95_ms'] - old['p95_ms']:>+8.2f} "
+                  f"{r['p99_ms'] - old['p99_ms']:>+8.2f} "
+                  f"{(r['peak_memory'] - old['peak_memory']) / 1024:>+8.1f}")
+    print(f"Total: {summary['requests']} requests, {summary['rps']} req/s")
+
+
+def main():
+    """Main CLI interface"""
+    parser = argparse.ArgumentParser(
+        description="Load test the CO2 monitor routes on the host")
+    parser.add_argument('--mix', default=DEFAULT_MIX,
+                        help='Weighted routes, from: ' + ', '.join(ROUTES) +
+                        f' (default: {DEFAULT_MIX})')
+    parser.add_argument('--concurrency', type=int, default=4,
+                        help='Number of concurrent clients')
+    parser.add_argument('--duration', type=float, default=10,
+                        help='Seconds to run the load for')
+    parser.add_argument('--weeks', type=int, default=4,
+                        help='Number of week files on the fake SD card')
+    parser.add_argument('--interval', type=int, default=60,
+                        help='Minutes between logged readings')
+    parser.add_argument('--no-admission', action='store_true',
+                        help='Disable admission control to measure the '
+                        'routes without 503 responses')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help='Write the results to a JSON file')
+    parser.add_argument('--baseline',
+                        help='JSON results of an earlier run to compare to')
+    args = parser.parse_args()
+
+    sd_root = tempfile.mkdtemp(prefix='co2-sd-')
+    try:
+        files = seed_readings(sd_root, args.weeks, args.interval)
+        monitor = boot_app(sd_root)
+        if args.no_admission:
+            monitor.app.admission = None
+        choices = parse_mix(args.mix, files)
+
+        results, elapsed, peaks = asyncio.run(run(
+            monitor.app, choices, args.concurrency, args.duration,
+            args.seed))
+    finally:
+        shutil.rmtree(sd_root, ignore_errors=True)
+
+    summary = summarize(results, elapsed, peaks)
+    summary['config'] = {
+        'mix': args.mix, 'concurrency': args.concurrency,
+        'duration': args.duration, 'weeks': args.weeks,
+        'interval': args.interval, 'admission': not args.no_admission,
+        'python': sys.version.split()[0],
+    }
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    print_report(summary, baseline)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(summary, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
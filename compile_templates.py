@@ -1,34 +1,211 @@
 #!/usr/bin/env python3
 """
 Template Compiler for CO2 Monitor
-Compiles .tpl files to _tpl.py files using utemplate
+Minifies and compiles .tpl files to _tpl.py files using utemplate, precompresses
+static assets to .gz files and builds .mpy bytecode of the device modules
+with mpy-cross
 """
+import argparse
+import gzip
+import io
+import json
+import os
+import shutil
+import subprocess
 import sys
+import tempfile
 from pathlib import Path
+from minify import check_equivalent, minify_template
 from utemplate.source import Compiler
 
+# Modules imported by main.py on the device. main.py itself stays a source
+# file since MicroPython only runs main.py at boot.
+DEVICE_MODULES = [
+    "sdcard.py",
+    "scd4x.py",
+    "ds3231.py",
+    "font.py",
+    "microdot.py",
+    "microdot_sse.py",
+    "microdot_websocket.py",
+    "pagecache.py",
+    "series.py",
+    "svgchart.py",
+    "utemplate/compiled.py",
+    "utemplate/fragments.py",
+    "utemplate/recompile.py",
+    "utemplate/source.py",
+]
 
-def compile_template(tpl_path):
-    """Compile a single template file"""
+BUILD_DIR = Path("build")
+MANIFEST = BUILD_DIR / "manifest.json"
+
+
+def compile_source(source, name):
+    """Compile template source in memory and return its render function"""
+    out = io.StringIO()
+    Compiler(io.StringIO(source), out).compile()
+    # fragments cached by {% cache %} are keyed by module name
+    namespace = {"__name__": name}
+    exec(out.getvalue(), namespace)
+    return namespace["render"]
+
+
+def check_minified(tpl_path, source, minified):
+    """Render the generate_html.py fixtures of a template, and the template
+    with its default arguments, from both sources and compare the pages.
+    Return the sizes of the rendered pages, or None if any page differs."""
+    from generate_html import fixtures
+
+    original = compile_source(source, "original:" + tpl_path.name)
+    minimal = compile_source(minified, "minified:" + tpl_path.name)
+    sizes = [0, 0]
+    with tempfile.TemporaryDirectory() as directory:
+        pages = [(name, data) for name, template, data in fixtures(directory)
+                 if template == tpl_path.name]
+        pages.append(("defaults", {}))
+        for name, data in pages:
+            before = b"".join(original(**data)).decode()
+            after = b"".join(minimal(**data)).decode()
+            problem = check_equivalent(before, after)
+            if problem:
+                print(f"ERROR minified {tpl_path.name} renders {name} "
+                      f"differently: {problem}")
+                return None
+            sizes[0] += len(before.encode())
+            sizes[1] += len(after.encode())
+    return sizes
+
+
+def compile_template(tpl_path, minify=True):
+    """Compile a single template file, minified if it renders the same"""
     try:
         # Determine output path
         output_path = tpl_path.with_name(tpl_path.stem + "_tpl.py")
-        
+        source = tpl_path.read_text()
+        ok = True
+
+        if minify:
+            minified = minify_template(source)
+            sizes = check_minified(tpl_path, source, minified)
+            if sizes is None:
+                ok = False
+            else:
+                print(f"Minifying {tpl_path.name}: source "
+                      f"{len(source.encode())} -> {len(minified.encode())} "
+                      f"bytes, rendered pages {sizes[0]} -> {sizes[1]} bytes")
+                source = minified
+
         print(f"Compiling {tpl_path.name} -> {output_path.name}")
-        
+
         # Compile template
-        with open(tpl_path, 'r') as f_in, open(output_path, 'w') as f_out:
-            compiler = Compiler(f_in, f_out)
+        with open(output_path, 'w') as f_out:
+            compiler = Compiler(io.StringIO(source), f_out)
             compiler.compile()
-        
-        return True
+
+        return ok
     except Exception as e:
         print(f"ERROR compiling {tpl_path.name}: {e}")
         return False
 
 
+def compress_asset(asset_path):
+    """Write a gzip-compressed copy of a static asset next to it"""
+    try:
+        output_path = asset_path.with_name(asset_path.name + ".gz")
+        data = asset_path.read_bytes()
+        # mtime=0 keeps the output reproducible between builds
+        compressed = gzip.compress(data, compresslevel=9, mtime=0)
+        output_path.write_bytes(compressed)
+        print(f"Compressing {asset_path.name} -> {output_path.name} "
+              f"({len(data)} -> {len(compressed)} bytes)")
+        return True
+    except Exception as e:
+        print(f"ERROR compressing {asset_path.name}: {e}")
+        return False
+
+
+def compress_static():
+    """Compress all .js and .css files in static/ directory"""
+    static_dir = Path("static")
+    assets = sorted(list(static_dir.glob("*.js")) + list(static_dir.glob("*.css")))
+    if not assets:
+        return True
+
+    print(f"\nFound {len(assets)} static assets to compress:")
+    return all([compress_asset(asset) for asset in assets])
+
+
+def find_mpy_cross():
+    """Return the mpy-cross command, from $MPY_CROSS or the PATH.
+
+    The bytecode version it emits must match the firmware on the device,
+    set MPY_CROSS to the mpy-cross built with that firmware if needed.
+    """
+    return os.environ.get("MPY_CROSS") or shutil.which("mpy-cross")
+
+
+def compile_mpy(mpy_cross, source):
+    """Compile a module to build/<source>.mpy, return its manifest entry"""
+    output_path = BUILD_DIR / Path(source).with_suffix(".mpy")
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    result = subprocess.run(
+        [mpy_cross, "-o", str(output_path), source],
+        capture_output=True, text=True)
+    if result.returncode != 0:
+        print(f"ERROR compiling {source}: {result.stderr.strip()}")
+        return None
+    entry = {
+        "source": source,
+        "mpy": output_path.as_posix(),
+        "target": Path(source).with_suffix(".mpy").as_posix(),
+        "source_bytes": Path(source).stat().st_size,
+        "mpy_bytes": output_path.stat().st_size,
+    }
+    print(f"Compiling {source} -> {entry['mpy']} "
+          f"({entry['source_bytes']} -> {entry['mpy_bytes']} bytes)")
+    return entry
+
+
+def build_mpy():
+    """Build .mpy bytecode of the device modules and compiled templates and
+    write build/manifest.json listing the artifacts.
+
+    Without mpy-cross the manifest lists no modules and deploy.py copies
+    the sources instead.
+    """
+    sources = DEVICE_MODULES + sorted(
+        p.as_posix() for p in Path("templates").glob("*_tpl.py"))
+    BUILD_DIR.mkdir(exist_ok=True)
+    manifest = {"mpy_cross": None, "modules": []}
+
+    mpy_cross = find_mpy_cross()
+    if mpy_cross is None:
+        print("\nmpy-cross not found, skipping bytecode (pip install "
+              "mpy-cross); the device will run the sources")
+        MANIFEST.write_text(json.dumps(manifest, indent=2) + "\n")
+        return True
+
+    version = subprocess.run([mpy_cross, "--version"], capture_output=True,
+                             text=True).stdout.strip()
+    manifest["mpy_cross"] = version
+    print(f"\nBuilding {len(sources)} modules with {version}:")
+    entries = [compile_mpy(mpy_cross, source) for source in sources]
+    manifest["modules"] = [entry for entry in entries if entry]
+    MANIFEST.write_text(json.dumps(manifest, indent=2) + "\n")
+    print(f"Manifest written to {MANIFEST}")
+    return all(entries)
+
+
 def main():
     """Compile all .tpl files in templates/ directory"""
+    parser = argparse.ArgumentParser(
+        description="Compile templates, compress static assets and build "
+        ".mpy bytecode")
+    parser.add_argument('--no-minify', action='store_true',
+                        help='Compile the templates as written')
+    args = parser.parse_args()
+
     templates_dir = Path("templates")
     
     if not templates_dir.exists():
@@ -46,12 +223,15 @@ def main():
     
     success_count = 0
     for tpl_file in sorted(tpl_files):
-        if compile_template(tpl_file):
+        if compile_template(tpl_file, not args.no_minify):
             success_count += 1
     
     print(f"\nCompilation complete: {success_count}/{len(tpl_files)} templates compiled successfully")
     
-    if success_count != len(tpl_files):
+    if not compress_static() or success_count != len(tpl_files):
+        sys.exit(1)
+
+    if not build_mpy():
         sys.exit(1)
 
 
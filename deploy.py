@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Deployment Script for CO2 Monitor
+Copies the application to the Pico with mpremote, using the .mpy bytecode
+listed in build/manifest.json and falling back to the source of any module
+that has no bytecode
+"""
+import argparse
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+from compile_templates import DEVICE_MODULES, MANIFEST
+
+# Files that are always copied as they are
+DATA_FILES = [
+    "main.py",
+    "templates/index.tpl",
+    "templates/chart.tpl",
+    "templates/chart_svg.tpl",
+    "templates/base.tpl",
+    "static/chart.js",
+    "static/chart.js.gz",
+    "static/chart.css",
+    "static/chart.css.gz",
+]
+
+DEVICE_DIRS = ["utemplate", "templates", "static"]
+
+
+def load_manifest():
+    """Return the bytecode entries of the manifest keyed by source file"""
+    try:
+        manifest = json.loads(Path(MANIFEST).read_text())
+    except (OSError, ValueError):
+        return {}
+    # bytecode older than its source is stale, the source is copied instead
+    return {entry["source"]: entry for entry in manifest["modules"]
+            if Path(entry["mpy"]).exists() and
+            Path(entry["mpy"]).stat().st_mtime >=
+            Path(entry["source"]).stat().st_mtime}
+
+
+def device_modules():
+    """Return the module sources deployed next to main.py"""
+    return DEVICE_MODULES + sorted(
+        p.as_posix() for p in Path("templates").glob("*_tpl.py"))
+
+
+def plan(use_mpy):
+    """Return the (local, remote) copies and the stale remote files to
+    remove. MicroPython imports a .py file in preference to the .mpy next to
+    it, so the other variant of each module is removed from the device."""
+    entries = load_manifest() if use_mpy else {}
+    copies = []
+    stale = []
+    for source in device_modules():
+        entry = entries.get(source)
+        if entry:
+            copies.append((entry["mpy"], entry["target"]))
+            stale.append(source)
+        else:
+            copies.append((source, source))
+            stale.append(Path(source).with_suffix(".mpy").as_posix())
+    copies += [(path, path) for path in DATA_FILES]
+    return copies, stale
+
+
+def prepare_script(stale):
+    """MicroPython code that creates the directories and removes stale files,
+    ignoring the ones that already exist or are missing"""
+    return "\n".join([
+        "import os",
+        f"for d in {DEVICE_DIRS!r}:",
+        "    try:",
+        "        os.mkdir(d)",
+        "    except OSError:",
+        "        pass",
+        f"for f in {stale!r}:",
+        "    try:",
+        "        os.remove(f)",
+        "    except OSError:",
+        "        pass",
+    ])
+
+
+def deploy(use_mpy=True, device=None, dry_run=False):
+    """Copy the application to the device in two mpremote invocations"""
+    copies, stale = plan(use_mpy)
+    base = ["mpremote"] + (["connect", device] if device else [])
+    commands = [base + ["exec", prepare_script(stale)]]
+    cp = list(base)
+    for local, remote in copies:
+        if len(cp) > len(base):
+            cp.append("+")
+        cp += ["fs", "cp", local, ":" + remote]
+    commands.append(cp)
+
+    mpy = sum(1 for local, _ in copies if local.endswith(".mpy"))
+    print(f"Deploying {len(copies)} files ({mpy} as .mpy bytecode)")
+    for command in commands:
+        if dry_run:
+            print(" ".join(command))
+            continue
+        if subprocess.run(command).returncode != 0:
+            return False
+    return True
+
+
+def main():
+    """Main CLI interface"""
+    parser = argparse.ArgumentParser(
+        description="Copy the CO2 monitor to the device with mpremote")
+    parser.add_argument('--source', action='store_true',
+                        help='Deploy the .py sources even if bytecode was '
+                        'built')
+    parser.add_argument('--device', help='mpremote device, e.g. /dev/ttyACM0')
+    parser.add_argument('--dry-run', action='store_true',
+                        help='Print the mpremote commands without running '
+                        'them')
+    args = parser.parse_args()
+
+    if not deploy(not args.source, args.device, args.dry_run):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
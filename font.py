@@ -0,0 +1,98 @@
+"""
+Scaled text for the OLED display.
+
+framebuf only draws its 8x8 font at 1x. A Font renders each character once
+with FrameBuffer.text(), scales the glyph with integer operations on its
+columns and keeps the result in a small cache, so drawing text afterwards is
+a single blit per character. A proportional font trims the empty columns of
+each glyph, which narrows characters such as 1 and lets a large reading fit
+the 128 pixel wide screen.
+"""
+import framebuf
+
+# Width of a blank glyph, such as a space, in a proportional font
+SPACE_WIDTH = 3
+
+
+class Font:
+    """The framebuf 8x8 font at an integer scale.
+
+    :param scale: The size of a font pixel on the display, e.g. 2 or 3.
+    :param proportional: Trim the empty columns on both sides of each glyph
+                         instead of giving every character 8 columns.
+    :param spacing: Columns left between the glyphs of a proportional font,
+                    before scaling.
+    :param max_glyphs: The number of scaled glyphs kept. When the cache is
+                       full, the glyph rendered first is dropped.
+    """
+
+    def __init__(self, scale=2, proportional=False, spacing=1, max_glyphs=16):
+        self.scale = scale
+        self.proportional = proportional
+        self.gap = spacing * scale if proportional else 0
+        self.height = 8 * scale
+        self.max_glyphs = max_glyphs
+        self.glyphs = {}  # char -> (FrameBuffer, width in pixels)
+        self.order = []  # rendered first first
+        # MONO_VLSB with 8 rows: one byte per column, bit 0 at the top
+        self.columns = bytearray(8)
+        self.source = framebuf.FrameBuffer(self.columns, 8, 8, framebuf.MONO_VLSB)
+
+    def glyph(self, char):
+        """Return the scaled glyph of a character and its width"""
+        glyph = self.glyphs.get(char)
+        if glyph is None:
+            if len(self.order) >= self.max_glyphs:
+                del self.glyphs[self.order.pop(0)]
+            glyph = self.glyphs[char] = self.render(char)
+            self.order.append(char)
+        return glyph
+
+    def render(self, char):
+        self.source.fill(0)
+        self.source.text(char, 0, 0, 1)
+        columns = self.columns
+        first, last = 0, 8
+        if self.proportional:
+            while first < 8 and not columns[first]:
+                first += 1
+            while last > first and not columns[last - 1]:
+                last -= 1
+            if first == last:
+                first, last = 0, SPACE_WIDTH
+
+        # Each source row becomes `scale` rows and each source column
+        # `scale` identical columns, stored as `scale` pages of 8 rows
+        s = self.scale
+        fill = (1 << s) - 1
+        width = (last - first) * s
+        buf = bytearray(width * s)
+        for c in range(first, last):
+            bits = columns[c]
+            tall = 0
+            for row in range(8):
+                if bits >> row & 1:
+                    tall |= fill << (row * s)
+            x = (c - first) * s
+            for page in range(s):
+                byte = tall >> (8 * page) & 0xFF
+                start = page * width + x
+                for i in range(start, start + s):
+                    buf[i] = byte
+        return framebuf.FrameBuffer(buf, width, 8 * s, framebuf.MONO_VLSB), width
+
+    def width(self, text):
+        """Return the width of text in pixels"""
+        width = 0
+        for char in text:
+            width += self.glyph(char)[1] + self.gap
+        return width - self.gap if text else 0
+
+    def draw(self, display, text, x, y):
+        """Draw text with its top left corner at x, y and return the x after
+        it. Unlit pixels of the glyphs leave the display unchanged."""
+        for char in text:
+            fb, width = self.glyph(char)
+            display.blit(fb, x, y, 0)
+            x += width + self.gap
+        return x
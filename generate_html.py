@@ -7,6 +7,7 @@ import argparse
 import json
 import os
 import random
+import shutil
 import subprocess
 import sys
 import webbrowser
@@ -14,6 +15,7 @@ from datetime import datetime, timedelta
 from pathlib import Path
 
 sys.path.insert(0, '.')
+from svgchart import SvgChart
 from utemplate.source import Loader
 
 
@@ -180,6 +182,83 @@ class FakeDataGenerator:
         return data
 
 
+    def dashboard_context(self, scenario="excellent"):
+        """Template data of the dashboard for an air quality scenario"""
+        if scenario == "excellent":
+            current_co2 = self.generate_co2_reading(420, 20)
+        elif scenario == "ventilation":
+            current_co2 = self.generate_co2_reading(1300, 100)
+        elif scenario == "action":
+            current_co2 = self.generate_co2_reading(1700, 200)
+        else:
+            current_co2 = self.generate_co2_reading()
+
+        return {
+            'current_co2': current_co2,
+            'last_measurement_time': self.get_timestamp(offset_minutes=-5),
+            'current_time': self.get_timestamp(),
+            'log_files': self.generate_log_files()
+        }
+
+    def chart_series(self, kind):
+        """Title and readings of a chart: daily, weekly, weekly-partial or
+        weekly-gap"""
+        week = self.base_date.isocalendar()[1]
+        if kind == "daily":
+            chart_data = self.generate_daily_chart_data()
+            title = f"Daily Chart - {self.base_date.strftime('%Y-%m-%d')}"
+        elif kind == "weekly":
+            chart_data = self.generate_weekly_chart_data()
+            title = f"Weekly Chart - Week {week}"
+        elif kind == "weekly-partial":
+            chart_data = self.generate_weekly_chart_data_partial_first2days()
+            title = f"Weekly Chart (Partial) - Week {week}"
+        else:
+            chart_data = self.generate_weekly_chart_data_with_gap()
+            title = f"Weekly Chart (Gap) - Week {week}"
+        return title, chart_data
+
+    def chart_context(self, kind):
+        """Template data of a chart page drawn by chart.js"""
+        title, chart_data = self.chart_series(kind)
+        return {
+            'title': title,
+            'json_data': json.dumps(chart_data),
+            'is_weekly': kind != "daily",
+            'static_url': 'static'
+        }
+
+    def svg_chart_context(self, kind, directory):
+        """Template data of a chart page drawn on the device. The readings
+        are written to a CSV file in directory, which the chart streams."""
+        title, chart_data = self.chart_series(kind)
+        path = Path(directory) / f"{kind}_chart.csv"
+        with open(path, "w") as f:
+            f.write("time,co2\n")
+            f.writelines(f"{t},{c}\n" for t, c in chart_data)
+        return {
+            'title': title,
+            'chart': SvgChart(str(path), weekly=kind != "daily"),
+            'static_url': 'static'
+        }
+
+
+def fixtures(directory):
+    """Return (name, template, data) for every page the generator produces,
+    used by compile_templates.py to check the minified templates. Data files
+    of the SVG charts are written to directory."""
+    fake = FakeDataGenerator()
+    pages = [(f"dashboard_{scenario}", "index.tpl",
+              fake.dashboard_context(scenario))
+             for scenario in ("excellent", "ventilation", "action")]
+    pages += [(f"{kind}_chart", "chart.tpl", fake.chart_context(kind))
+              for kind in ("daily", "weekly", "weekly-partial", "weekly-gap")]
+    pages += [(f"{kind}_chart_svg", "chart_svg.tpl",
+               fake.svg_chart_context(kind, directory))
+              for kind in ("daily", "weekly", "weekly-gap")]
+    return pages
+
+
 class HTMLGenerator:
     """Generate HTML files from templates using fake data"""
     
@@ -187,33 +266,26 @@ class HTMLGenerator:
         self.output_dir = Path(output_dir)
         self.output_dir.mkdir(exist_ok=True)
         self.loader = Loader(None, "templates")
+        self.copy_static()
         self.fake_data = FakeDataGenerator()
     
+    def copy_static(self):
+        """Copy chart assets next to the generated files"""
+        static_dir = self.output_dir / "static"
+        static_dir.mkdir(exist_ok=True)
+        for asset in Path("static").glob("*"):
+            if asset.suffix != ".gz":
+                shutil.copy(asset, static_dir / asset.name)
+    
     def generate_dashboard(self, scenario="excellent"):
         """Generate main dashboard HTML"""
         print("Generating dashboard HTML...")
         
-        # Configure data based on scenario
-        if scenario == "excellent":
-            current_co2 = self.fake_data.generate_co2_reading(420, 20)
-        elif scenario == "ventilation":
-            current_co2 = self.fake_data.generate_co2_reading(1300, 100)
-        elif scenario == "action":
-            current_co2 = self.fake_data.generate_co2_reading(1700, 200)
-        else:
-            current_co2 = self.fake_data.generate_co2_reading()
-        
-        # Generate template data
-        template_data = {
-            'current_co2': current_co2,
-            'last_measurement_time': self.fake_data.get_timestamp(offset_minutes=-5),
-            'current_time': self.fake_data.get_timestamp(),
-            'log_files': self.fake_data.generate_log_files()
-        }
-        
+        template_data = self.fake_data.dashboard_context(scenario)
+
         # Render template
         template = self.loader.load("index.tpl")
-        html = "".join(template(**template_data))
+        html = b"".join(template(**template_data)).decode()
         
         # Write file
         filename = f"dashboard_{scenario}.html"
@@ -227,18 +299,11 @@ class HTMLGenerator:
         """Generate daily chart HTML"""
         print("Generating daily chart HTML...")
         
-        chart_data = self.fake_data.generate_daily_chart_data()
-        json_data = json.dumps(chart_data)
-        
-        template_data = {
-            'title': f"Daily Chart - {self.fake_data.base_date.strftime('%Y-%m-%d')}",
-            'json_data': json_data,
-            'is_weekly': False
-        }
+        template_data = self.fake_data.chart_context("daily")
         
         # Render template
         template = self.loader.load("chart.tpl")
-        html = "".join(template(**template_data))
+        html = b"".join(template(**template_data)).decode()
         
         # Write file
         output_file = self.output_dir / "daily_chart.html"
@@ -251,18 +316,11 @@ class HTMLGenerator:
         """Generate weekly chart HTML"""
         print("Generating weekly chart HTML...")
         
-        chart_data = self.fake_data.generate_weekly_chart_data()
-        json_data = json.dumps(chart_data)
-        
-        template_data = {
-            'title': f"Weekly Chart - Week {self.fake_data.base_date.isocalendar()[1]}",
-            'json_data': json_data,
-            'is_weekly': True
-        }
+        template_data = self.fake_data.chart_context("weekly")
         
         # Render template
         template = self.loader.load("chart.tpl")
-        html = "".join(template(**template_data))
+        html = b"".join(template(**template_data)).decode()
         
         # Write file
         output_file = self.output_dir / "weekly_chart.html"
@@ -275,18 +333,11 @@ class HTMLGenerator:
         """Generate weekly chart HTML with partial data (first 2 days only)"""
         print("Generating weekly chart with partial data (first 2 days only)...")
         
-        chart_data = self.fake_data.generate_weekly_chart_data_partial_first2days()
-        json_data = json.dumps(chart_data)
-        
-        template_data = {
-            'title': f"Weekly Chart (Partial) - Week {self.fake_data.base_date.isocalendar()[1]}",
-            'json_data': json_data,
-            'is_weekly': True
-        }
+        template_data = self.fake_data.chart_context("weekly-partial")
         
         # Render template
         template = self.loader.load("chart.tpl")
-        html = "".join(template(**template_data))
+        html = b"".join(template(**template_data)).decode()
         
         # Write file
         output_file = self.output_dir / "weekly_chart_partial.html"
@@ -299,18 +350,11 @@ class HTMLGenerator:
         """Generate weekly chart HTML with gap (missing 2 days in middle)"""
         print("Generating weekly chart with gap (missing 2 days in middle)...")
         
-        chart_data = self.fake_data.generate_weekly_chart_data_with_gap()
-        json_data = json.dumps(chart_data)
-        
-        template_data = {
-            'title': f"Weekly Chart (Gap) - Week {self.fake_data.base_date.isocalendar()[1]}",
-            'json_data': json_data,
-            'is_weekly': True
-        }
+        template_data = self.fake_data.chart_context("weekly-gap")
         
         # Render template
         template = self.loader.load("chart.tpl")
-        html = "".join(template(**template_data))
+        html = b"".join(template(**template_data)).decode()
         
         # Write file
         output_file = self.output_dir / "weekly_chart_gap.html"
@@ -319,6 +363,24 @@ class HTMLGenerator:
         print(f"✓ Generated {output_file}")
         return output_file
     
+    def generate_svg_chart(self, kind):
+        """Generate chart HTML with the SVG drawn by the template, as served
+        by /svg/<filename>"""
+        print(f"Generating {kind} SVG chart HTML...")
+        
+        template_data = self.fake_data.svg_chart_context(kind, self.output_dir)
+        
+        # Render template
+        template = self.loader.load("chart_svg.tpl")
+        html = b"".join(template(**template_data)).decode()
+        
+        # Write file
+        output_file = self.output_dir / f"{kind}_chart_svg.html"
+        output_file.write_text(html, encoding='utf-8')
+        
+        print(f"✓ Generated {output_file}")
+        return output_file
+    
     def generate_all(self):
         """Generate all HTML files"""
         print(f"Generating all HTML files to {self.output_dir}/")
@@ -334,6 +396,8 @@ class HTMLGenerator:
         files.append(self.generate_weekly_chart())
         files.append(self.generate_weekly_chart_partial())
         files.append(self.generate_weekly_chart_gap())
+        files.append(self.generate_svg_chart("daily"))
+        files.append(self.generate_svg_chart("weekly"))
         
         # Create index file listing all generated files
         self._create_index_file(files)
@@ -389,6 +453,13 @@ class HTMLGenerator:
                 <a href="weekly_chart_partial.html">Partial (2 days)</a>
                 <a href="weekly_chart_gap.html">With Gap</a>
             </div>
+            
+            <div class="file-card">
+                <h3>🖼️ Server-side SVG Charts</h3>
+                <p>Charts drawn by the template, without JavaScript</p>
+                <a href="daily_chart_svg.html">Daily</a>
+                <a href="weekly_chart_svg.html">Weekly</a>
+            </div>
         </div>
         
         <div style="margin-top: 40px; padding: 20px; background: #e8f5e8; border-radius: 5px;">
@@ -410,7 +481,8 @@ def main():
     parser = argparse.ArgumentParser(description="Generate HTML files from CO2 monitor templates with fake data")
     parser.add_argument(
         'command', 
-        choices=['dashboard', 'daily', 'weekly', 'weekly-partial', 'weekly-gap', 'all'],
+        choices=['dashboard', 'daily', 'weekly', 'weekly-partial', 'weekly-gap',
+                 'daily-svg', 'weekly-svg', 'all'],
         help='What to generate'
     )
     parser.add_argument(
@@ -444,6 +516,8 @@ def main():
         output_file = generator.generate_weekly_chart_partial()
     elif args.command == 'weekly-gap':
         output_file = generator.generate_weekly_chart_gap()
+    elif args.command in ('daily-svg', 'weekly-svg'):
+        output_file = generator.generate_svg_chart(args.command[:-4])
     elif args.command == 'all':
         files = generator.generate_all()
         output_file = generator.output_dir / "index.html"
@@ -3,6 +3,7 @@ import gc
 import utime
 import os
 import time
+import struct
 import sys
 
 import network
@@ -11,13 +12,21 @@ from machine import I2C, SPI, Pin
 
 import sdcard
 from ds3231 import DS3231
-from microdot import Microdot, send_file
+from font import Font
+from microdot import Admission, Metrics, Microdot, send_file
+from microdot_sse import SSEBroadcaster
+from microdot_websocket import WebSocketBroadcaster, with_websocket
+from pagecache import PageCache
 from scd4x import SCD4X
+from series import DOWNSAMPLERS, FORMATS as SERIES_FORMATS, day_number, day_string
+from series import is_row_start, read_range, span
+from series import read as read_series
+from svgchart import SvgChart
+from utemplate import fragments
 from utemplate.source import Loader
 from ssd1306 import SSD1306_I2C
 
 _stats = {
-    "requests_total": 0,
     "uptime": time.time(),
 }
 # I2C setup
@@ -27,10 +36,16 @@ scd = SCD4X(i2c)
 rtc = DS3231(i2c)
 
 # OLED display setup
-display = SSD1306_I2C(128, 32, i2c)
+DISPLAY_WIDTH = 128
+DISPLAY_HEIGHT = 32
+DIGITS_X = 28  # left edge of the reading, right of the labels
+display = SSD1306_I2C(DISPLAY_WIDTH, DISPLAY_HEIGHT, i2c)
 display.poweron()
 display.fill(0)
 display.show()
+# Scaled glyphs are rendered once and cached, drawing is a blit per digit
+DIGITS_3X = Font(scale=3, proportional=True)
+DIGITS_2X = Font(scale=2, proportional=True)
 
 # Set default time to DS3231 on startup
 if False:  # Set to True to enable setting time
@@ -96,17 +111,86 @@ last_measurement_time = None
 # Global variable for tracking last weekly log write time
 last_weekly_log_time = None
 
+# Bumped whenever a reading is taken or a log file changes, so that cached
+# pages showing that data are rendered again
+state_version = 0
+
+# Rendered dashboard bytes. The dashboard also shows the current time, so
+# entries expire after a minute even if the state did not change. A dashboard
+# over 8 KB, which lists more than about 20 weekly logs, is streamed without
+# being cached, so a miss holds at most 8 KB of the page.
+page_cache = PageCache(
+    max_bytes=12 * 1024, max_age=60, min_free_memory=16384, max_page=8 * 1024
+)
+
+# Fragments of pages kept by {% cache %} blocks, such as the data-files table
+# of the dashboard, which only changes when the log files do. The table takes
+# about 250 bytes plus up to 240 per weekly log. Logs are named by week
+# number, so there are at most 53 of them and 13 KB holds a full year.
+fragments.store = fragments.FragmentStore(max_entries=8, max_bytes=13 * 1024)
+
 app = Microdot()
 
+# Cap concurrent work so that bursts of chart views cannot exhaust the heap
+# needed by the sampling task. Routes declare their weight: charts and
+# downloads are heavy, JSON endpoints are light and the live channels have
+# their own subscriber limits.
+app.admission = Admission(
+    max_weight=4, max_pending=2, wait_timeout=2, min_free_memory=8192, backlog=2
+)
+
+# Per-route request counts, status classes, bytes sent and handler/write
+# latency histograms, reported by /status
+app.metrics = Metrics(max_routes=16)
+
+# Live measurement stream for dashboards, fed by co2_monitor_loop
+live_events = SSEBroadcaster(max_subscribers=4, max_queue=4, heartbeat=30)
+
+# Binary live channel for wall panels and the host-side aggregator. Each
+# frame is a type byte followed by little-endian (uint32 epoch, uint16 ppm)
+# records.
+live_ws = WebSocketBroadcaster(max_clients=4, max_queue=4)
+WS_MEASUREMENT = 1
+WS_BACKFILL = 2
+WS_BACKFILL_CHUNK = 64  # records per backfill frame
+
+# MicroPython ports with a 2000 epoch need an offset to report Unix time
+_EPOCH_OFFSET = 946684800 if utime.gmtime(0)[0] == 2000 else 0
+
 # Initialize template loader
 template_loader = Loader(None, "templates")
 
 
+def bump_state_version():
+    """Invalidate cached pages after a reading or a log file change"""
+    global state_version
+    state_version += 1
+
+
 def get_timestamp():
     dt = rtc.datetime()
     return f"{dt[0]:04d}-{dt[1]:02d}-{dt[2]:02d} {dt[4]:02d}:{dt[5]:02d}:{dt[6]:02d}"
 
 
+def to_epoch(ts):
+    """Convert a YYYY-MM-DD HH:MM:SS timestamp to Unix epoch seconds"""
+    return (
+        utime.mktime(
+            (
+                int(ts[0:4]),
+                int(ts[5:7]),
+                int(ts[8:10]),
+                int(ts[11:13]),
+                int(ts[14:16]),
+                int(ts[17:19]),
+                0,
+                0,
+            )
+        )
+        + _EPOCH_OFFSET
+    )
+
+
 def get_week_number(year, month, day):
     """
     Calculate ISO week number for a given date.
@@ -216,49 +300,85 @@ def list_files(directory):
         return []
 
 
-def text_2x(display, text, x, y):
-    """Draw text at 2x scale by rendering to temp buffer and scaling up"""
-    import framebuf
-    # Create a small buffer for the text (8 pixels high, 8 pixels per char)
-    text_width = len(text) * 8
-    buf = bytearray(text_width)  # 1 bit per pixel, 8 rows
-    fb = framebuf.FrameBuffer(buf, text_width, 8, framebuf.MONO_VLSB)
-    fb.fill(0)
-    fb.text(text, 0, 0, 1)
+_HTTP_DAYS = ("Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun")
+_HTTP_MONTHS = (
+    "Jan", "Feb", "Mar", "Apr", "May", "Jun",
+    "Jul", "Aug", "Sep", "Oct", "Nov", "Dec",
+)
 
-    # Scale up 2x and draw to display
-    for py in range(8):
-        for px in range(text_width):
-            if fb.pixel(px, py):
-                # Draw 2x2 block for each pixel
-                display.pixel(x + px * 2, y + py * 2, 1)
-                display.pixel(x + px * 2 + 1, y + py * 2, 1)
-                display.pixel(x + px * 2, y + py * 2 + 1, 1)
-                display.pixel(x + px * 2 + 1, y + py * 2 + 1, 1)
+
+def http_date(timestamp):
+    """Format a timestamp as an HTTP date, e.g. Wed, 06 Aug 2025 14:30:00 GMT"""
+    t = utime.gmtime(timestamp)
+    return "{}, {:02d} {} {:04d} {:02d}:{:02d}:{:02d} GMT".format(
+        _HTTP_DAYS[t[6]], t[2], _HTTP_MONTHS[t[1] - 1], t[0], t[3], t[4], t[5]
+    )
+
+
+def file_validators(path, prefix=""):
+    """Return (etag, last_modified) validators for a file.
+
+    Both are derived from the file size and mtime, so appending a reading or
+    truncating the file changes them. The prefix tells apart different
+    representations of the same file, such as the CSV and its chart.
+    """
+    stat = os.stat(path)
+    size, mtime = stat[6], stat[8]
+    return f'"{prefix}{size:x}-{mtime:x}"', http_date(mtime)
+
+
+def cache_headers(filename, etag, last_modified):
+    """Build validator and Cache-Control headers for a log file.
+
+    Closed weeks no longer change and may be cached for a day, while the
+    live week must be revalidated on every request.
+    """
+    live = get_weekly_log_filename() == f"/sd/readings/{filename}"
+    return {
+        "ETag": etag,
+        "Last-Modified": last_modified,
+        "Cache-Control": "no-cache" if live else "max-age=86400",
+    }
+
+
+def is_not_modified(request, etag, last_modified):
+    """Check the request's conditional headers against the validators.
+
+    If-None-Match takes precedence over If-Modified-Since, which is compared
+    verbatim since clients echo back the Last-Modified value they got.
+    """
+    if_none_match = request.headers.get("If-None-Match")
+    if if_none_match is not None:
+        tags = [tag.strip() for tag in if_none_match.split(",")]
+        return "*" in tags or etag in tags or "W/" + etag in tags
+    return request.headers.get("If-Modified-Since") == last_modified
 
 
 def update_display(co2_value, ip_address=None):
     """Update OLED display with CO2 reading in large font"""
     display.fill(0)
 
-    # Format CO2 text (no space to fit 8 chars at 2x = 128px)
-    if co2_value is not None:
-        co2_text = f"CO2:{co2_value}"
-    else:
-        co2_text = "CO2:----"
-
-    # Center vertically: (32 - 16) / 2 = 8
-    # Center horizontally based on text length
-    text_width = len(co2_text) * 16  # 2x scale = 16px per char
-    x_pos = (128 - text_width) // 2
-
-    text_2x(display, co2_text, x_pos, 8)
+    # Small labels on the left, the reading right-aligned in large
+    # proportional digits, at 2x if it is too wide for 3x
+    display.text("CO2", 0, 4, 1)
+    display.text("ppm", 0, 20, 1)
+    value = "----" if co2_value is None else str(co2_value)
+    font = DIGITS_3X
+    if font.width(value) > DISPLAY_WIDTH - DIGITS_X:
+        font = DIGITS_2X
+    x = DISPLAY_WIDTH - font.width(value)
+    font.draw(display, value, x, (DISPLAY_HEIGHT - font.height) // 2)
 
     display.show()
 
 
-@app.route("/")
+@app.route("/", weight=2)
 async def index(request):
+    page = page_cache.get("index", state_version)
+    if page is not None:
+        return page, 200, {"Content-Type": "text/html"}
+
+    version = state_version
     log_files = []
     try:
         # Get directory listing with error handling
@@ -281,18 +401,21 @@ async def index(request):
 
     log_files.sort(reverse=True)  # Show newest first
 
-    # Render template
+    # Stream the rendered template, the response coalesces the fragments it
+    # yields into socket writes and the cache keeps a copy of the page
     template = template_loader.load("index.tpl")
-    html = "".join(
+    page = page_cache.capture(
+        "index",
+        version,
         template(
             current_co2=current_co2,
             last_measurement_time=last_measurement_time or "",
             current_time=get_timestamp(),
             log_files=log_files,
-        )
+        ),
     )
 
-    return html, 200, {"Content-Type": "text/html"}
+    return page, 200, {"Content-Type": "text/html"}
 
 
 @app.route("/co2")
@@ -311,61 +434,397 @@ async def co2_api(request):
         )
 
 
+@app.route("/events", weight=0)
+async def events(request):
+    initial = None
+    if current_co2 is not None:
+        initial = {"co2": current_co2, "timestamp": last_measurement_time}
+    return live_events.response(request, initial=initial, event="co2")
+
+
+def ws_frame(kind, records):
+    """Pack (epoch, ppm) records into a binary live channel frame"""
+    buf = bytearray(1 + 6 * len(records))
+    buf[0] = kind
+    for i, (epoch, co2) in enumerate(records):
+        struct.pack_into("<IH", buf, 1 + 6 * i, epoch, co2)
+    return buf
+
+
+async def send_backfill(ws, since):
+    """Send readings of the live week logged after the since epoch"""
+    records = []
+    try:
+        with open(get_weekly_log_filename(), "r") as f:
+            f.readline()  # Skip header
+            for ln in f:
+                ln = ln.strip()
+                if not ln:
+                    continue
+                t, c = ln.split(",")
+                epoch = to_epoch(t)
+                if epoch <= since:
+                    continue
+                records.append((epoch, int(c)))
+                if len(records) == WS_BACKFILL_CHUNK:
+                    await ws.send(ws_frame(WS_BACKFILL, records))
+                    records = []
+    except OSError:
+        pass
+    # An empty backfill frame tells the client the backfill is complete
+    await ws.send(ws_frame(WS_BACKFILL, records))
+
+
+async def ws_control(client, message):
+    """Handle a JSON control message from a live channel client.
+
+    {"subscribe": ["co2"]} limits the series pushed to the client and
+    {"since": <epoch>} requests a backfill of the live week.
+    """
+    try:
+        request = ujson.loads(message)
+        if "subscribe" in request:
+            client.series = set(request["subscribe"])
+        if "since" in request:
+            await send_backfill(client.ws, int(request["since"]))
+    except (ValueError, TypeError, AttributeError):
+        await client.ws.send('{"error": "invalid control message"}')
+
+
+@app.route("/ws", weight=0)
+@with_websocket
+async def live_socket(request, ws):
+    await live_ws.serve(ws, ws_control)
+
+
 @app.route("/delete/<filename>")
 async def delete_file(request, filename):
     try:
         os.remove(f"/sd/readings/{filename}")
+        bump_state_version()
         return "redirect", 302, {"Location": "/"}
     except OSError:
         return "File not found", 404
 
 
-@app.route("/download/<filename>")
+@app.route("/download/<filename>", weight=2)
 async def download_file(request, filename):
+    path = f"/sd/readings/{filename}"
     try:
-        filestream = open(f"/sd/readings/{filename}", "rb")
-        return send_file(
-            f"/sd/readings/{filename}", file_extension="csv", stream=filestream
-        )
+        headers = cache_headers(filename, *file_validators(path))
+    except OSError as e:
+        return f"File {filename} not found: {e}", 404
+    if is_not_modified(request, headers["ETag"], headers["Last-Modified"]):
+        return "", 304, headers
+
+    try:
+        filestream = open(path, "rb")
+        response = send_file(path, file_extension="csv", stream=filestream)
     except OSError as e:
         return f"File {filename} not found: {e}", 404
+    response.headers.update(headers)
+    return response
+
+
+# Points per chart, about one per pixel of the plot width. Charts ask the
+# series for that many points unless a points=N query overrides it, and
+# points=0 sends every reading.
+CHART_POINTS = 840
+# Largest points=N accepted, larger targets are capped. Bucket numbers of a
+# week's log stay small integers on MicroPython up to this many points.
+MAX_POINTS = 1500
+# Seconds between the polls of an open chart of the live week for new rows
+CHART_POLL = 300
+
+
+def downsample_args(request, default=0):
+    """Return the (target, method) of a points=N&method=... query, or None
+    if they are invalid. The target is capped at MAX_POINTS."""
+    try:
+        target = int(request.args.get("points", default))
+    except ValueError:
+        return None
+    method = request.args.get("method", "lttb")
+    if target < 0 or method not in DOWNSAMPLERS:
+        return None
+    return min(target, MAX_POINTS), method
 
 
 @app.route("/spark/<filename>")
 async def spark(request, filename):
     path = f"/sd/readings/{filename}"
     try:
-        with open(path, "r") as f:
-            lines = f.readlines()
+        os.stat(path)
     except OSError:
         return "File not found", 404
 
-    data = []
-    for ln in lines[1:]:
-        ln = ln.strip()
-        if not ln:
-            continue
-        t, c = ln.split(",")
-        data.append([t, int(c)])
-
-    json_data = ujson.dumps(data)
-
     # For weekly files, show the filename without extension
     pretty_date = filename[:-4]  # Remove .csv extension
 
-    # Render template
-    template = template_loader.load("chart.tpl")
-    html = "".join(
-        template(
-            title=pretty_date,
-            json_data=json_data,
-            is_weekly=True,
+    if request.args.get("mode") == "svg":
+        # Drawn by /svg, weighted like the series API as it reads as much
+        query = "&".join(
+            arg for arg in request.query_string.split("&") if arg != "mode=svg"
         )
+        location = f"/svg/{filename}" + (f"?{query}" if query else "")
+        return "redirect", 301, {"Location": location}
+    sampling = downsample_args(request, CHART_POINTS)
+    if sampling is None:
+        return "Invalid points or method", 400
+
+    # Stream the page shell, the chart fetches its data from the series API
+    # The chart of the live week polls for the readings logged after it
+    live = path == get_weekly_log_filename()
+    template = template_loader.load("chart.tpl")
+    html = template(
+        title=pretty_date,
+        series_url="/api/series/%s?points=%d&method=%s&format=bin"
+        % ((filename,) + sampling),
+        is_weekly=True,
+        readings_url=f"/api/readings/{filename}?format=bin" if live else "",
+        poll=CHART_POLL,
     )
 
+    # The shell of the live week carries the polling URL, which it must drop
+    # once the week is closed, so it is fetched again on every visit
+    return (
+        html,
+        200,
+        {
+            "Content-Type": "text/html; charset=utf-8",
+            "Cache-Control": "no-cache" if live else "max-age=86400",
+        },
+    )
+
+
+@app.route("/svg/<filename>", weight=3)
+async def spark_svg(request, filename):
+    """Chart page with the SVG drawn on the device, streamed from the CSV"""
+    path = f"/sd/readings/{filename}"
+    sampling = downsample_args(request, CHART_POINTS)
+    if sampling is None:
+        return "Invalid points or method", 400
+    try:
+        headers = cache_headers(filename, *file_validators(path, "svg-"))
+    except OSError:
+        return "File not found", 404
+    if is_not_modified(request, headers["ETag"], headers["Last-Modified"]):
+        return "", 304, headers
+
+    try:
+        chart = SvgChart(path, weekly=True, target=sampling[0], method=sampling[1])
+    except OSError:
+        return "File not found", 404
+    template = template_loader.load("chart_svg.tpl")
+    headers["Content-Type"] = "text/html; charset=utf-8"
+    return template(title=filename[:-4], chart=chart), 200, headers
+
+
+@app.route("/api/series/<filename>", weight=3)
+async def series(request, filename):
+    path = f"/sd/readings/{filename}"
+    sampling = downsample_args(request)
+    if sampling is None:
+        return "Invalid points or method", 400
+    fmt = request.args.get("format", "json")
+    if fmt not in SERIES_FORMATS:
+        return "Invalid format", 400
+    try:
+        headers = cache_headers(filename, *file_validators(path, f"series-{fmt}-"))
+        size = os.stat(path)[6]
+    except OSError:
+        return "File not found", 404
+    # Rows appended later can be fetched from /api/readings with this cursor
+    headers["X-Cursor"] = str(size)
+    if is_not_modified(request, headers["ETag"], headers["Last-Modified"]):
+        return "", 304, headers
+
+    try:
+        days = span(path)
+    except OSError:
+        return "File not found", 404
+    encode, headers["Content-Type"] = SERIES_FORMATS[fmt]
+    first_day, num_days = days or (0, 0)
+    # Single pass over the file, streamed in chunks of bounded size
+    points = read_series(path, first_day, num_days, *sampling, stop=size)
+    return encode(points, first_day), 200, headers
+
+
+@app.route("/api/readings/<filename>")
+async def readings_since(request, filename):
+    """Rows appended to a log file after the byte offset in ?since=, as in
+    the X-Cursor header of the series API or of the previous response"""
+    path = f"/sd/readings/{filename}"
+    fmt = request.args.get("format", "json")
+    if fmt not in SERIES_FORMATS:
+        return "Invalid format", 400
+    try:
+        since = int(request.args.get("since", "0"))
+    except ValueError:
+        return "Invalid cursor", 400
+    try:
+        size = os.stat(path)[6]
+        if since > size or not is_row_start(path, since):
+            # The file was truncated or replaced, the client must reload
+            return "Cursor out of range", 409
+        days = span(path)
+    except OSError:
+        return "File not found", 404
+
+    encode, content_type = SERIES_FORMATS[fmt]
+    headers = {
+        "Content-Type": content_type,
+        "Cache-Control": "no-store",
+        "X-Cursor": str(size),
+    }
+    if path != get_weekly_log_filename():
+        # No rows follow these, open charts of the log stop polling
+        headers["X-Log-Closed"] = "1"
+    first_day, num_days = days or (0, 0)
+    points = read_series(path, first_day, num_days, start=since, stop=size)
+    return encode(points, first_day), 200, headers
+
+
+# Longest range of days a chart covers, which bounds its axis labels and
+# keeps the readings' seconds small integers
+MAX_RANGE_DAYS = 93
+# Most weeks drawn over each other in an overlay chart
+MAX_OVERLAY = 4
+
+
+def week_logs():
+    """Return the paths of the weekly log files"""
+    try:
+        files = os.listdir("/sd/readings")
+    except (OSError, UnicodeError):
+        return []
+    return [
+        f"/sd/readings/{f}"
+        for f in files
+        if f.startswith("week") and f.endswith(".csv")
+    ]
+
+
+def range_args(request):
+    """Return (first_day, num_days) of a from=YYYY-MM-DD&to=YYYY-MM-DD query,
+    the last four weeks by default, or None if they are invalid"""
+    try:
+        last = day_number(request.args.get("to", get_timestamp()))
+        first = day_number(request.args.get("from", day_string(last - 27)))
+    except ValueError:
+        return None
+    if not 0 <= last - first < MAX_RANGE_DAYS:
+        return None
+    return first, last - first + 1
+
+
+@app.route("/range")
+async def range_chart(request):
+    """Chart of the weekly logs between two dates, merged into one series"""
+    days = range_args(request)
+    sampling = downsample_args(request, CHART_POINTS)
+    if days is None or sampling is None:
+        return "Invalid range, points or method", 400
+    first, last = day_string(days[0]), day_string(days[0] + days[1] - 1)
+    template = template_loader.load("chart.tpl")
+    html = template(
+        title=f"{first} - {last}",
+        series_url="/api/range?from=%s&to=%s&points=%d&method=%s&format=bin"
+        % ((first, last) + sampling),
+        is_weekly=True,
+    )
+    return html, 200, {"Content-Type": "text/html; charset=utf-8"}
+
+
+@app.route("/api/range", weight=3)
+async def range_series(request):
+    """Series of the weekly logs between two dates. The logs are merged in
+    time order one row at a time, so with ?points= the memory used does not
+    depend on the length of the range."""
+    days = range_args(request)
+    sampling = downsample_args(request)
+    if days is None or sampling is None:
+        return "Invalid range, points or method", 400
+    fmt = request.args.get("format", "json")
+    if fmt not in SERIES_FORMATS:
+        return "Invalid format", 400
+    try:
+        points = read_range(week_logs(), *days, *sampling)
+    except OSError:
+        return "File not found", 404
+    encode, content_type = SERIES_FORMATS[fmt]
+    headers = {"Content-Type": content_type, "Cache-Control": "no-cache"}
+    return encode(points, days[0]), 200, headers
+
+
+@app.route("/overlay")
+async def overlay_chart(request):
+    """Chart of weekly logs drawn over each other, aligned by weekday and
+    hour. ?files=week31.csv,week32.csv picks the weeks, by default the two
+    latest ones."""
+    sampling = downsample_args(request, CHART_POINTS)
+    if sampling is None:
+        return "Invalid points or method", 400
+    files = request.args.get("files")
+    if files:
+        names = files.split(",")
+        for name in names:
+            if not name.startswith("week") or not name.endswith(".csv"):
+                return "Invalid filename", 400
+            try:
+                os.stat(f"/sd/readings/{name}")
+            except OSError:
+                return "File not found", 404
+    else:
+        # The weeks with the latest first readings
+        weeks = []
+        for path in week_logs():
+            try:
+                days = span(path)
+            except OSError:
+                continue
+            if days is not None:
+                weeks.append((days[0], path.rsplit("/", 1)[1]))
+        weeks.sort()
+        names = [name for _, name in weeks[-2:]]
+    if not names or len(names) > MAX_OVERLAY:
+        return "Select 1 to %d weekly logs" % MAX_OVERLAY, 400
+
+    url = "/api/series/%s?points=%d&method=%s&format=bin"
+    overlay = [[name[:-4], url % ((name,) + sampling)] for name in names]
+    template = template_loader.load("chart.tpl")
+    html = template(
+        title=" vs ".join(label for label, _ in overlay),
+        overlay=ujson.dumps(overlay),
+        is_weekly=True,
+    )
     return html, 200, {"Content-Type": "text/html; charset=utf-8"}
 
 
+# Chart assets, versioned through a query string in chart.tpl
+STATIC_FILES = ("chart.js", "chart.css")
+
+
+@app.route("/static/<filename>")
+async def static(request, filename):
+    if filename not in STATIC_FILES:
+        return "File not found", 404
+    path = f"static/{filename}"
+    response = None
+    if "gzip" in request.headers.get("Accept-Encoding", ""):
+        try:
+            response = send_file(path + ".gz", compressed=True, max_age=31536000)
+        except OSError:
+            pass  # Fall back to the uncompressed asset
+    if response is None:
+        try:
+            response = send_file(path, max_age=31536000)
+        except OSError:
+            return "File not found", 404
+    response.headers["Vary"] = "Accept-Encoding"
+    return response
+
+
 @app.route("/truncate/<filename>")
 async def truncate_csv(request, filename):
     """Remove last line from a CSV file"""
@@ -378,6 +837,7 @@ async def truncate_csv(request, filename):
         )
 
     result = remove_last_line_from_csv(filename)
+    bump_state_version()
     return result, 200, {"Content-Type": "application/json"}
 
 
@@ -424,7 +884,13 @@ def get_system_info():
         "mem_used": total - free,
         "mem_total": total,
         "uptime": int(uptime),
-        "requests_total": _stats["requests_total"],
+        "requests_total": app.metrics.requests,
+        "timeouts": app.timeouts,
+        "idle_closes": app.idle_closes,
+        "page_cache": page_cache.stats(),
+        "fragment_cache": fragments.store.stats(),
+        "routes": app.metrics.stats()["routes"],
+        "latency_buckets_ms": app.metrics.buckets_ms,
     }
 
 
@@ -462,6 +928,14 @@ async def co2_monitor_loop(max_retries: int = 10):
         # Update last measurement time
         global last_measurement_time
         last_measurement_time = ts
+        bump_state_version()
+        if page_cache.memory_low():
+            page_cache.clear()
+            fragments.store.clear()
+
+        # Push the new reading to live dashboards
+        live_events.publish({"co2": co2, "timestamp": ts}, event="co2")
+        live_ws.publish(ws_frame(WS_MEASUREMENT, [(to_epoch(ts), co2)]), "co2")
 
         # Update display with latest CO2 reading and IP
         update_display(current_co2, ip_address)
@@ -478,5 +952,7 @@ async def main():
     await asyncio.gather(start_web_server(), co2_monitor_loop())
 
 
-# Run the main async loop
-asyncio.run(main())
+# Run the main async loop. MicroPython runs main.py as __main__ at boot, the
+# guard lets host-side tools import the app without starting the loop.
+if __name__ == "__main__":
+    asyncio.run(main())
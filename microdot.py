@@ -45,6 +45,18 @@ except ImportError:  # pragma: no cover
             ret = await ret
         return ret
 
+try:
+    from time import ticks_diff, ticks_ms, ticks_us
+except ImportError:  # pragma: no cover
+    def ticks_us():
+        return int(time.perf_counter() * 1000000)
+
+    def ticks_ms():
+        return int(time.perf_counter() * 1000)
+
+    def ticks_diff(end, start):
+        return end - start
+
 try:
     from sys import print_exception
 except ImportError:  # pragma: no cover
@@ -79,6 +91,23 @@ def urldecode(s):
     return b''.join(result).decode()
 
 
+async def with_timeout(coro, timeout):
+    """Await a coroutine, raising ``asyncio.TimeoutError`` if it does not
+    complete within ``timeout`` seconds. A timeout of ``None`` waits
+    indefinitely."""
+    if timeout is None:
+        return await coro
+    return await asyncio.wait_for(coro, timeout)
+
+
+def _buffer_put(buf, n, data):
+    # copy data into a bytearray at offset n, growing it if necessary, and
+    # return the offset that follows the copied data
+    end = n + len(data)
+    buf[n:end] = data
+    return end
+
+
 def urlencode(s):
     return s.replace('+', '%2B').replace(' ', '+').replace(
         '%', '%25').replace('?', '%3F').replace('#', '%23').replace(
@@ -137,6 +166,101 @@ class NoCaseDict(dict):
             self[key] = value
 
 
+class RequestHeaders:
+    """The headers of a request, decoded on access.
+
+    :param lines: The header lines, as read from the client.
+    :param offsets: A list with two offsets for each line: the colon and the
+                    end of the line, before its line ending.
+
+    A header is only decoded the first time it is looked up. Lookups are
+    case-insensitive, and when a header is repeated the last value is
+    returned, as with a :class:`NoCaseDict`. The headers can be modified, in
+    which case they are all decoded into a :class:`NoCaseDict` first.
+    """
+    def __init__(self, lines, offsets):
+        self._lines = lines
+        self._offsets = offsets
+        self._found = None
+        self._dict = None
+
+    def _lookup(self, key):
+        if self._dict is not None:
+            return self._dict.get(key)
+        kl = key.lower()
+        if self._found is not None and kl in self._found:
+            return self._found[kl]
+        name = kl.encode()
+        length = len(name)
+        value = None
+        lines = self._lines
+        offsets = self._offsets
+        for i in range(len(lines)):
+            if offsets[2 * i] == length and \
+                    lines[i][:length].lower() == name:
+                value = i
+        if value is not None:
+            value = self._value(value)
+        if self._found is None:
+            self._found = {}
+        self._found[kl] = value
+        return value
+
+    def _value(self, i):
+        start = self._offsets[2 * i] + 1
+        return self._lines[i][start:self._offsets[2 * i + 1]].decode().strip()
+
+    def to_dict(self):
+        """Return all the headers as a :class:`NoCaseDict`."""
+        if self._dict is None:
+            lines = self._lines
+            offsets = self._offsets
+            self._dict = NoCaseDict()
+            for i in range(len(lines)):
+                self._dict[lines[i][:offsets[2 * i]].decode()] = \
+                    self._value(i)
+            self._lines = self._offsets = self._found = None
+        return self._dict
+
+    def get(self, key, default=None):
+        value = self._lookup(key)
+        return default if value is None else value
+
+    def __getitem__(self, key):
+        value = self._lookup(key)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key):
+        return self._lookup(key) is not None
+
+    def __setitem__(self, key, value):
+        self.to_dict()[key] = value
+
+    def __delitem__(self, key):
+        del self.to_dict()[key]
+
+    def __iter__(self):
+        return iter(self.to_dict())
+
+    def __len__(self):
+        return len(self._lines) if self._dict is None \
+            else len(self._dict)
+
+    def keys(self):
+        return self.to_dict().keys()
+
+    def values(self):
+        return self.to_dict().values()
+
+    def items(self):
+        return self.to_dict().items()
+
+    def update(self, other_dict):
+        self.to_dict().update(other_dict)
+
+
 def mro(cls):  # pragma: no cover
     """Return the method resolution order of a class.
 
@@ -316,6 +440,32 @@ class Request:
     #:    Request.max_readline = 16 * 1024  # 16KB lines allowed
     max_readline = 2 * 1024
 
+    #: Specify the maximum size of the request line and headers combined.
+    #: Requests with larger heads are rejected.
+    #:
+    #: Example::
+    #:
+    #:    Request.max_head_size = 4 * 1024  # 4KB request heads allowed
+    max_head_size = 2 * 1024
+
+    #: Specify the maximum number of headers allowed in a request. Requests
+    #: with more headers are rejected.
+    max_headers = 24
+
+    #: Specify the number of seconds allowed to read the request line and
+    #: headers. Clients that take longer are disconnected. Set to ``None`` to
+    #: wait indefinitely.
+    head_timeout = 5
+
+    #: Specify the number of seconds allowed to read a request body that is
+    #: stored in ``body``. Bodies that are accessed through ``stream`` are
+    #: read by the application and are not subject to this timeout.
+    body_timeout = 10
+
+    #: Specify the number of seconds a persistent connection can remain idle
+    #: waiting for the next request before it is closed.
+    idle_timeout = 5
+
     class G:
         pass
 
@@ -360,12 +510,13 @@ class Request:
             self.path, self.query_string = self.path.split('?', 1)
             self.args = self._parse_urlencoded(self.query_string)
 
-        if 'Content-Length' in self.headers:
-            self.content_length = int(self.headers['Content-Length'])
-        if 'Content-Type' in self.headers:
-            self.content_type = self.headers['Content-Type']
-        if 'Cookie' in self.headers:
-            for cookie in self.headers['Cookie'].split(';'):
+        content_length = self.headers.get('Content-Length')
+        if content_length is not None:
+            self.content_length = int(content_length)
+        self.content_type = self.headers.get('Content-Type')
+        cookies = self.headers.get('Cookie')
+        if cookies is not None:
+            for cookie in cookies.split(';'):
                 name, value = cookie.strip().split('=', 1)
                 self.cookies[name] = value
 
@@ -377,9 +528,16 @@ class Request:
         self._form = None
         self._files = None
         self.after_request_handlers = []
+        #: The capacity reserved for this request by the application's
+        #: :class:`Admission` instance.
+        self.weight = 0
+        #: The URL pattern of the route that handles this request, or
+        #: ``None`` if the request does not match a route.
+        self.route = None
 
     @staticmethod
-    async def create(app, client_reader, client_writer, client_addr):
+    async def create(app, client_reader, client_writer, client_addr,
+                     idle=False):
         """Create a request object.
 
         :param app: The Microdot application instance.
@@ -388,35 +546,39 @@ class Request:
         :param client_writer: An output stream where the response data can be
                               written.
         :param client_addr: The address of the client, as a tuple.
+        :param idle: ``True`` if the request follows another one on a
+                     persistent connection. The wait for its first line is
+                     then bounded by :attr:`idle_timeout`, and the
+                     :attr:`head_timeout` starts once it arrives.
 
         This method is a coroutine. It returns a newly created ``Request``
-        object.
+        object, or ``None`` if the client closed the connection or left a
+        persistent connection idle. An ``asyncio.TimeoutError`` is raised
+        when the client is too slow to send a request.
         """
-        # request line
-        line = (await Request._safe_readline(client_reader)).strip().decode()
-        if not line:  # pragma: no cover
+        line = None
+        if idle:
+            try:
+                line = await with_timeout(
+                    Request._safe_readline(client_reader),
+                    Request.idle_timeout)
+            except asyncio.TimeoutError:
+                app.idle_closes += 1
+                return None
+        head = await Request._timed(
+            Request._read_head(client_reader, line),
+            Request.head_timeout, app, 'head')
+        if head is None:  # pragma: no cover
             return None
-        method, url, http_version = line.split()
-        http_version = http_version.split('/', 1)[1]
-
-        # headers
-        headers = NoCaseDict()
-        content_length = 0
-        while True:
-            line = (await Request._safe_readline(
-                client_reader)).strip().decode()
-            if line == '':
-                break
-            header, value = line.split(':', 1)
-            value = value.strip()
-            headers[header] = value
-            if header.lower() == 'content-length':
-                content_length = int(value)
+        method, url, http_version, headers = head
+        content_length = int(headers.get('Content-Length', 0))
 
         # body
         body = b''
         if content_length and content_length <= Request.max_body_length:
-            body = await client_reader.readexactly(content_length)
+            body = await Request._timed(
+                client_reader.readexactly(content_length),
+                Request.body_timeout, app, 'body')
             stream = None
         else:
             body = b''
@@ -426,6 +588,52 @@ class Request:
                        body=body, stream=stream,
                        sock=(client_reader, client_writer))
 
+    @staticmethod
+    async def _timed(coro, timeout, app, kind):
+        # await a read, counting it in the app's timeouts if it takes longer
+        # than allowed
+        try:
+            return await with_timeout(coro, timeout)
+        except asyncio.TimeoutError:
+            app.timeouts[kind] += 1
+            raise
+
+    @staticmethod
+    async def _read_head(client_reader, line=None):
+        # request line
+        if line is None:
+            line = await Request._safe_readline(client_reader)
+        head_size = len(line)
+        line = line.strip().decode()
+        if not line:  # pragma: no cover
+            return None
+        method, url, http_version = line.split()
+        http_version = http_version.split('/', 1)[1]
+
+        # headers, kept as read and decoded on access
+        lines = []
+        offsets = []
+        while True:
+            line = await Request._safe_readline(client_reader)
+            head_size += len(line)
+            if head_size > Request.max_head_size:
+                raise ValueError('request head too large')
+            end = len(line)
+            if end and line[end - 1] == 10:
+                end -= 1
+            if end and line[end - 1] == 13:
+                end -= 1
+            if end == 0:
+                break
+            if len(lines) >= Request.max_headers:
+                raise ValueError('too many headers')
+            colon = line.find(b':')
+            if colon <= 0:
+                raise ValueError('invalid header')
+            lines.append(line)
+            offsets.extend((colon, end))
+        return method, url, http_version, RequestHeaders(lines, offsets)
+
     def _parse_urlencoded(self, urlencoded):
         data = MultiDict()
         if len(urlencoded) > 0:  # pragma: no branch
@@ -559,6 +767,28 @@ class Response:
 
     send_file_buffer_size = 1024
 
+    #: The initial size of the buffer where the status line and headers of a
+    #: response are assembled before they are written. Bodies given as bytes
+    #: that are not larger than this size are sent in the same write as the
+    #: headers.
+    write_buffer_size = 512
+
+    #: The number of seconds a single write of the response can take before
+    #: the client is considered stalled and disconnected. The limit applies
+    #: to each write rather than to the whole response, so that long-lived
+    #: streams are not cut off. Set to ``None`` to wait indefinitely.
+    write_timeout = 10
+
+    #: The size of the buffer in which the pieces of a streamed body, such
+    #: as the fragments yielded by a template, are coalesced before they are
+    #: written. The buffer is allocated once per response and each write
+    #: sends at most this many bytes of it, or a single larger piece as is.
+    #: With chunked transfer encoding this is the size of the chunks. Set to
+    #: 0 to write every piece as soon as it is produced, as event streams
+    #: require. The default fills a TCP segment (1460 bytes of payload) with
+    #: every write.
+    chunk_min_size = 1536
+
     #: The content type to use for responses that do not explicitly define a
     #: ``Content-Type`` header.
     default_content_type = 'text/plain'
@@ -587,6 +817,12 @@ class Response:
             # this applies to bytes, file-like objects or generators
             self.body = body
         self.is_head = False
+        #: The HTTP version of the response, set to match the request.
+        #: Streamed bodies of HTTP/1.1 responses are sent with chunked
+        #: transfer encoding.
+        self.http_version = '1.0'
+        #: The number of bytes written by :meth:`write`.
+        self.bytes_sent = 0
 
     def set_cookie(self, cookie, value, path=None, domain=None, expires=None,
                    max_age=None, secure=False, http_only=False,
@@ -639,55 +875,153 @@ class Response:
                         max_age=0, **kwargs)
 
     def complete(self):
-        if isinstance(self.body, bytes) and \
+        if isinstance(self.body, bytes) and self.status_code != 304 and \
                 'Content-Length' not in self.headers:
             self.headers['Content-Length'] = str(len(self.body))
+        elif self.http_version == '1.1' and not self.is_head and \
+                self.body and self.status_code not in (204, 304) and \
+                'Content-Length' not in self.headers:
+            self.headers['Transfer-Encoding'] = 'chunked'
         if 'Content-Type' not in self.headers:
             self.headers['Content-Type'] = self.default_content_type
             if 'charset=' not in self.headers['Content-Type']:
                 self.headers['Content-Type'] += '; charset=UTF-8'
 
+    def serialize_head(self, body=None):
+        """Return the status line and headers of the response, optionally
+        followed by a body given as bytes, assembled in a single buffer.
+
+        The buffer is allocated with :attr:`Response.write_buffer_size` bytes
+        and only grows if the head and body do not fit in it.
+        """
+        reason = self.reason if self.reason is not None else \
+            ('OK' if self.status_code == 200 else 'N/A')
+        buf = bytearray(self.write_buffer_size)
+        n = _buffer_put(buf, 0, b'HTTP/' + self.http_version.encode() + b' ')
+        n = _buffer_put(buf, n, str(self.status_code).encode())
+        n = _buffer_put(buf, n, b' ')
+        n = _buffer_put(buf, n, reason.encode())
+        n = _buffer_put(buf, n, b'\r\n')
+        for header, value in self.headers.items():
+            header = header.encode()
+            values = value if isinstance(value, list) else [value]
+            for value in values:
+                n = _buffer_put(buf, n, header)
+                n = _buffer_put(buf, n, b': ')
+                n = _buffer_put(buf, n, str(value).encode())
+                n = _buffer_put(buf, n, b'\r\n')
+        n = _buffer_put(buf, n, b'\r\n')
+        if body:
+            n = _buffer_put(buf, n, body)
+        return memoryview(buf)[:n]
+
     async def write(self, stream):
         self.complete()
 
+        iter = None
         try:
-            # status code
-            reason = self.reason if self.reason is not None else \
-                ('OK' if self.status_code == 200 else 'N/A')
-            await stream.awrite('HTTP/1.0 {status_code} {reason}\r\n'.format(
-                status_code=self.status_code, reason=reason).encode())
-
-            # headers
-            for header, value in self.headers.items():
-                values = value if isinstance(value, list) else [value]
-                for value in values:
-                    await stream.awrite('{header}: {value}\r\n'.format(
-                        header=header, value=value).encode())
-            await stream.awrite(b'\r\n')
+            # status code and headers, with small bodies coalesced into the
+            # same write
+            body = self.body if not self.is_head and \
+                isinstance(self.body, bytes) and \
+                len(self.body) <= self.write_buffer_size else None
+            await self._awrite(stream, self.serialize_head(body))
 
             # body
-            if not self.is_head:
+            if not self.is_head and body is None:
+                chunked = self.headers.get('Transfer-Encoding') == 'chunked'
+                size = self.chunk_min_size
+                if size:
+                    # room for the chunk size line before the data and for
+                    # the chunk end and the terminating chunk after it
+                    start = len('{:x}\r\n'.format(size)) if chunked else 0
+                    buf = bytearray(start + size + 7 if chunked else size)
+                    mv = memoryview(buf)
+                n = 0
                 iter = self.body_iter()
-                async for body in iter:
-                    if isinstance(body, str):  # pragma: no cover
-                        body = body.encode()
-                    try:
-                        await stream.awrite(body)
-                    except OSError as exc:  # pragma: no cover
-                        if exc.errno in MUTED_SOCKET_ERRORS or \
-                                exc.args[0] == 'Connection lost':
-                            if hasattr(iter, 'aclose'):
-                                await iter.aclose()
-                        raise
+                try:
+                    async for body in iter:
+                        if isinstance(body, str):  # pragma: no cover
+                            body = body.encode()
+                        if not body:
+                            continue
+                        if n and n + len(body) > size:
+                            await self._awrite(stream, self._flush(
+                                mv, start, n, chunked, False))
+                            n = 0
+                        if len(body) >= size:
+                            # pieces that do not fit are written as they are
+                            await self._awrite(
+                                stream, self._chunk(body) if chunked else body)
+                            continue
+                        buf[start + n:start + n + len(body)] = body
+                        n += len(body)
+                        if n == size:
+                            await self._awrite(stream, self._flush(
+                                mv, start, n, chunked, False))
+                            n = 0
+                    if n or chunked:
+                        # the last data chunk and the terminating chunk go
+                        # out in the same write
+                        await self._awrite(stream, self._flush(
+                            mv, start, n, chunked, True) if size else
+                            b'0\r\n\r\n')
+                except BaseException:  # pragma: no cover
+                    # release the body (an open file, an event stream
+                    # subscription) before the error propagates
+                    if hasattr(iter, 'aclose'):
+                        await iter.aclose()
+                    raise
                 if hasattr(iter, 'aclose'):  # pragma: no branch
                     await iter.aclose()
 
+        except asyncio.TimeoutError:  # pragma: no cover
+            raise
         except OSError as exc:  # pragma: no cover
             if exc.errno in MUTED_SOCKET_ERRORS or \
                     exc.args[0] == 'Connection lost':
                 pass
             else:
                 raise
+        finally:
+            if iter is None:
+                # the body of a HEAD response, or of a response whose head
+                # could not be written, is never iterated
+                await self.release()
+
+    async def release(self):
+        """Close a body that is not going to be sent, such as an open file
+        or an event stream subscription. Bytes bodies need no release."""
+        if self.body and not isinstance(self.body, (bytes, bytearray)):
+            iter = self.body_iter()
+            if hasattr(iter, 'aclose'):
+                await iter.aclose()
+
+    async def _awrite(self, stream, data):
+        self.bytes_sent += len(data)
+        await with_timeout(stream.awrite(data), self.write_timeout)
+
+    @staticmethod
+    def _flush(mv, start, n, chunked, last):
+        """Return the part of a coalescing buffer to write, framing its
+        ``n`` data bytes as a chunk when ``chunked`` is set"""
+        if not chunked:
+            return mv[:n]
+        end = start + n
+        if n:
+            head = '{:x}\r\n'.format(n).encode()
+            mv[start - len(head):start] = head
+            mv[end:end + 2] = b'\r\n'
+            start -= len(head)
+            end += 2
+        if last:
+            mv[end:end + 5] = b'0\r\n\r\n'
+            end += 5
+        return mv[start:end]
+
+    @staticmethod
+    def _chunk(data):
+        return '{:x}\r\n'.format(len(data)).encode() + data + b'\r\n'
 
     def body_iter(self):
         if hasattr(self.body, '__anext__'):
@@ -718,11 +1052,10 @@ class Response:
                         self.i = self.ITER_FILE_OBJ
                     elif hasattr(response.body, '__next__'):
                         self.i = self.ITER_SYNC_GEN
-                        return next(response.body)
                     else:
                         self.i = self.ITER_NO_BODY
                         return response.body
-                elif self.i == self.ITER_SYNC_GEN:
+                if self.i == self.ITER_SYNC_GEN:
                     try:
                         return next(response.body)
                     except StopIteration:
@@ -855,6 +1188,22 @@ class URLPattern():
         self.segments = []
         self.regex = None
 
+    @staticmethod
+    def parse_segment(segment):
+        """Parse a dynamic path segment of a URL pattern.
+
+        Returns a ``(type, name)`` tuple for segments enclosed in ``<`` and
+        ``>``, or ``None`` for static segments.
+        """
+        if not segment or segment[0] != '<':
+            return None
+        if segment[-1] != '>':
+            raise ValueError('invalid URL pattern')
+        segment = segment[1:-1]
+        if ':' in segment:
+            return tuple(segment.rsplit(':', 1))
+        return 'string', segment
+
     def compile(self):
         """Generate a regular expression for the URL pattern.
 
@@ -863,15 +1212,9 @@ class URLPattern():
         """
         pattern = ''
         for segment in self.url_pattern.lstrip('/').split('/'):
-            if segment and segment[0] == '<':
-                if segment[-1] != '>':
-                    raise ValueError('invalid URL pattern')
-                segment = segment[1:-1]
-                if ':' in segment:
-                    type_, name = segment.rsplit(':', 1)
-                else:
-                    type_ = 'string'
-                    name = segment
+            dynamic = self.parse_segment(segment)
+            if dynamic:
+                type_, name = dynamic
                 parser = None
                 if type_.startswith('re:'):
                     pattern += '/({pattern})'.format(pattern=type_[3:])
@@ -915,6 +1258,189 @@ class URLPattern():
         return 'URLPattern: {}'.format(self.url_pattern)
 
 
+class RouteIndex():
+    """A dispatch index for the URL patterns of an application.
+
+    Static URL patterns are stored in a dictionary keyed by path. Dynamic
+    patterns, optionally ending in a ``path`` segment, are stored in a tree
+    of path segments, where ``re:`` segments and custom segment types match
+    a single segment with their own regular expression. Only patterns whose
+    expressions can match a ``/``, or with a ``path`` segment before the
+    end, are matched as a whole against every path that is routed. Other
+    than those, the cost of routing a request does not grow with the number
+    of routes.
+
+    Patterns are identified by the position in which they were added to the
+    index.
+    """
+    builtin_patterns = {
+        'string': '/([^/]+)',
+        'int': '/(-?\\d+)',
+        'path': '/(.+)',
+    }
+
+    def __init__(self):
+        self.size = 0
+        self.static = {}
+        self.root = self._node()
+        self.fallback = []
+
+    @staticmethod
+    def _node():
+        # static children, dynamic children, terminal positions, path tails
+        return [{}, [], [], []]
+
+    def _is_builtin(self, type_):
+        return type_ in self.builtin_patterns and \
+            URLPattern.segment_patterns.get(type_) == \
+            self.builtin_patterns[type_]
+
+    def _segment_regex(self, type_):
+        """Return the expression that matches a single segment of a type,
+        or ``None`` if the type's expression can match across a ``/`` or
+        the type is unknown"""
+        if type_.startswith('re:'):
+            pattern = type_[3:]
+        elif type_ in URLPattern.segment_patterns:
+            # registered as '/(pattern)'
+            pattern = URLPattern.segment_patterns[type_][2:-1]
+        else:
+            # left to URLPattern.compile() to report
+            return None
+        if self._matches_slash(pattern):
+            return None
+        return re.compile('^(' + pattern + ')$')
+
+    @staticmethod
+    def _matches_slash(pattern):
+        """Return True if an expression could match a ``/``: a literal
+        slash, ``.``, ``\\S``, ``\\W``, ``\\D``, a character class that
+        includes it or a negated class that does not exclude it"""
+        i = 0
+        while i < len(pattern):
+            c = pattern[i]
+            if c == '\\':
+                if pattern[i + 1:i + 2] in ('S', 'W', 'D', '/'):
+                    return True
+                i += 2
+            elif c == '[':
+                end = i + 1
+                if pattern[end:end + 1] == '^':
+                    end += 1
+                if pattern[end:end + 1] == ']':
+                    end += 1
+                while end < len(pattern) and pattern[end] != ']':
+                    end += 2 if pattern[end] == '\\' else 1
+                body = pattern[i + 1:end]
+                if body.startswith('^') != ('/' in body):
+                    return True
+                i = end + 1
+            elif c in './':
+                return True
+            else:
+                i += 1
+        return False
+
+    def add(self, url_pattern):
+        """Add a URL pattern to the index.
+
+        :param url_pattern: The :class:`URLPattern` instance to add.
+        """
+        position = self.size
+        self.size += 1
+        segments = url_pattern.url_pattern.lstrip('/').split('/')
+        dynamic = [URLPattern.parse_segment(segment) for segment in segments]
+        if not any(dynamic):
+            path = '/' + '/'.join(segments)
+            self.static.setdefault(path, []).append(position)
+            return
+        regexes = []
+        for i, d in enumerate(dynamic):
+            regex = None
+            if d and not self._is_builtin(d[0]):
+                regex = self._segment_regex(d[0])
+                if regex is None:
+                    self.fallback.append((position, url_pattern))
+                    return
+            elif d and d[0] == 'path' and i != len(segments) - 1:
+                self.fallback.append((position, url_pattern))
+                return
+            regexes.append(regex)
+
+        node = self.root
+        for segment, d, regex in zip(segments, dynamic, regexes):
+            if d is None:
+                if segment not in node[0]:
+                    node[0][segment] = self._node()
+                node = node[0][segment]
+            elif d[0] == 'path' and regex is None:
+                node[3].append((position, d[1]))
+                return
+            else:
+                for type_, name, child, _ in node[1]:
+                    if (type_, name) == d:
+                        break
+                else:
+                    child = self._node()
+                    node[1].append((d[0], d[1], child, regex))
+                node = child
+        node[2].append(position)
+
+    def match(self, path):
+        """Match a path against all the URL patterns in the index.
+
+        Returns a list of ``(position, args)`` tuples for the patterns that
+        match the path, sorted by position.
+        """
+        if path[:1] != '/':
+            return []
+        matches = [(position, {}) for position in self.static.get(path, [])]
+        self._match(self.root, path[1:].split('/'), 0, {}, matches)
+        for position, url_pattern in self.fallback:
+            args = url_pattern.match(path)
+            if args is not None:
+                matches.append((position, args))
+        matches.sort(key=lambda match: match[0])
+        return matches
+
+    def _match(self, node, segments, i, args, matches):
+        if i == len(segments):
+            for position in node[2]:
+                matches.append((position, args))
+            return
+        segment = segments[i]
+        if segment in node[0]:
+            self._match(node[0][segment], segments, i + 1, args, matches)
+        for type_, name, child, regex in node[1]:
+            value = segment
+            if regex is not None:
+                if not regex.match(segment):
+                    continue
+            elif not segment:
+                # string and int segments are never empty
+                continue
+            elif type_ == 'int':
+                digits = segment[1:] if segment[0] == '-' else segment
+                if not digits or \
+                        any(c not in '0123456789' for c in digits):
+                    continue
+            parser = URLPattern.segment_parsers.get(type_)
+            if parser:
+                value = parser(value)
+                if value is None:
+                    continue
+            child_args = args.copy()
+            child_args[name] = value
+            self._match(child, segments, i + 1, child_args, matches)
+        rest = '/'.join(segments[i:]) if node[3] else ''
+        if rest:
+            # a path tail can start with an empty segment, as in //x
+            for position, name in node[3]:
+                child_args = args.copy()
+                child_args[name] = rest
+                matches.append((position, child_args))
+
+
 class HTTPException(Exception):
     def __init__(self, status_code, reason=None):
         self.status_code = status_code
@@ -924,6 +1450,236 @@ class HTTPException(Exception):
         return 'HTTPException: {}'.format(self.status_code)
 
 
+class Admission:
+    """Admission control for the requests handled by a server.
+
+    :param max_weight: The total weight of the requests that can be handled
+                       concurrently. Routes have a weight of 1 unless a
+                       different one is given in the ``route`` decorator.
+    :param max_pending: The number of requests that can wait for capacity to
+                        be released. Further requests are rejected right
+                        away.
+    :param wait_timeout: The number of seconds a pending request waits before
+                         it is rejected.
+    :param min_free_memory: The free heap, in bytes per unit of weight, that
+                            must be available to admit a request. Only
+                            enforced on platforms that provide
+                            ``gc.mem_free()``.
+    :param retry_after: The value of the ``Retry-After`` header of the
+                        ``503`` responses sent to rejected requests.
+    :param backlog: The size of the listening socket's accept queue, or
+                    ``None`` to use the platform default.
+
+    Example::
+
+        app = Microdot()
+        app.admission = Admission(max_weight=4, min_free_memory=8192)
+
+        @app.route('/report', weight=3)
+        async def report(request):
+            # ...
+    """
+    def __init__(self, max_weight=4, max_pending=2, wait_timeout=2,
+                 min_free_memory=0, retry_after=5, backlog=2):
+        self.max_weight = max_weight
+        self.max_pending = max_pending
+        self.wait_timeout = wait_timeout
+        self.min_free_memory = min_free_memory
+        self.retry_after = retry_after
+        self.backlog = backlog
+        self.in_use = 0
+        self.pending = 0
+        self.released = asyncio.Event()
+        self.admitted = 0
+        self.rejected = 0
+
+    def _memory_available(self, weight):
+        if not self.min_free_memory:
+            return True
+        try:
+            from gc import collect, mem_free
+        except ImportError:  # pragma: no cover
+            return True
+        if mem_free() >= self.min_free_memory * weight:
+            return True
+        collect()
+        return mem_free() >= self.min_free_memory * weight
+
+    def _fits(self, weight):
+        return self.in_use + weight <= self.max_weight and \
+            self._memory_available(weight)
+
+    async def acquire(self, weight=1):
+        """Reserve capacity for a request.
+
+        Returns the weight that was reserved, which must be given back with
+        :meth:`release`, or ``None`` if the request was rejected. Weights
+        larger than ``max_weight`` are capped, so that heavy requests are
+        still handled when the server is idle, and routes with a weight of 0,
+        such as long-lived event streams that have their own limits, are
+        always admitted.
+        """
+        weight = min(weight, self.max_weight)
+        if not self._fits(weight):
+            if self.pending >= self.max_pending:
+                self.rejected += 1
+                return None
+            self.pending += 1
+            try:
+                # time.time() counts whole seconds on MicroPython
+                started = ticks_ms()
+                timeout = int(self.wait_timeout * 1000)
+                while not self._fits(weight):
+                    remaining = timeout - ticks_diff(ticks_ms(), started)
+                    if remaining <= 0:
+                        self.rejected += 1
+                        return None
+                    self.released.clear()
+                    try:
+                        await asyncio.wait_for(self.released.wait(),
+                                               remaining / 1000)
+                    except asyncio.TimeoutError:
+                        pass
+            finally:
+                self.pending -= 1
+        self.in_use += weight
+        self.admitted += 1
+        return weight
+
+    def release(self, weight):
+        """Give back the capacity reserved by :meth:`acquire`."""
+        self.in_use -= weight
+        self.released.set()
+
+    def overloaded_response(self):
+        return Response('Service unavailable', status_code=503,
+                        headers={'Retry-After': str(self.retry_after)})
+
+
+class Histogram:
+    """A latency histogram with fixed buckets.
+
+    :param bounds: The upper bounds of the buckets, in microseconds, in
+                   increasing order. Values above the last bound are counted
+                   in an extra bucket.
+    """
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.total = 0
+        self.max = 0
+
+    def add(self, value):
+        i = 0
+        for bound in self.bounds:
+            if value <= bound:
+                break
+            i += 1
+        self.counts[i] += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def percentile(self, fraction):
+        """Return the upper bound of the bucket that holds the given fraction
+        of the values, or the largest value seen for the extra bucket."""
+        target = fraction * sum(self.counts)
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if count and seen >= target:
+                return self.bounds[i] if i < len(self.bounds) else self.max
+        return 0
+
+    def stats(self):
+        count = sum(self.counts)
+        return {
+            'avg_ms': round(self.total / count / 1000, 2) if count else 0,
+            'max_ms': round(self.max / 1000, 2),
+            'p50_ms': self.percentile(0.5) / 1000,
+            'p95_ms': self.percentile(0.95) / 1000,
+            'hist': self.counts,
+        }
+
+
+class RouteMetrics:
+    """The metrics recorded for a single route."""
+    def __init__(self, bounds):
+        self.count = 0
+        self.status = [0] * 5  # 1xx to 5xx
+        self.bytes_sent = 0
+        self.handler = Histogram(bounds)
+        self.write = Histogram(bounds)
+
+    def stats(self):
+        return {
+            'count': self.count,
+            'status': {'{}xx'.format(i + 1): n
+                       for i, n in enumerate(self.status) if n},
+            'bytes': self.bytes_sent,
+            'handler': self.handler.stats(),
+            'write': self.write.stats(),
+        }
+
+
+class Metrics:
+    """Per-route request metrics for a server.
+
+    For each route, the number of requests, the status classes of the
+    responses, the bytes sent and histograms of the time spent in the handler
+    and writing the response are recorded. Requests that do not match a route
+    are recorded under ``'unmatched'``.
+
+    :param buckets_ms: The upper bounds of the histogram buckets, in
+                       milliseconds. Longer times are counted in an extra
+                       bucket.
+    :param max_routes: The maximum number of routes that are tracked
+                       separately. Further routes are recorded under
+                       ``'other'``, which keeps the memory used bounded.
+
+    Example::
+
+        app = Microdot()
+        app.metrics = Metrics()
+
+        @app.route('/metrics')
+        async def metrics(request):
+            return app.metrics.stats()
+    """
+    def __init__(self, buckets_ms=(1, 2, 5, 10, 20, 50, 100, 200, 500, 1000,
+                                   2000), max_routes=16):
+        self.buckets_ms = buckets_ms
+        self.bounds = [int(b * 1000) for b in buckets_ms]
+        self.max_routes = max_routes
+        self.routes = {}
+        self.requests = 0
+
+    def record(self, route, status_code, handler_us, write_us, bytes_sent):
+        """Record a request that was handled and written."""
+        metrics = self.routes.get(route)
+        if metrics is None:
+            if len(self.routes) >= self.max_routes:
+                route = 'other'
+                metrics = self.routes.get(route)
+            if metrics is None:
+                metrics = self.routes[route] = RouteMetrics(self.bounds)
+        self.requests += 1
+        metrics.count += 1
+        if 100 <= status_code < 600:
+            metrics.status[status_code // 100 - 1] += 1
+        metrics.bytes_sent += bytes_sent
+        metrics.handler.add(handler_us)
+        metrics.write.add(write_us)
+
+    def stats(self):
+        return {
+            'requests': self.requests,
+            'buckets_ms': self.buckets_ms,
+            'routes': {route: metrics.stats()
+                       for route, metrics in self.routes.items()},
+        }
+
+
 class Microdot:
     """An HTTP application class.
 
@@ -940,6 +1696,7 @@ class Microdot:
 
     def __init__(self):
         self.url_map = []
+        self.route_index = RouteIndex()
         self.before_request_handlers = []
         self.after_request_handlers = []
         self.after_error_request_handlers = []
@@ -948,8 +1705,26 @@ class Microdot:
         self.options_handler = self.default_options_handler
         self.debug = False
         self.server = None
-
-    def route(self, url_pattern, methods=None):
+        #: An :class:`Admission` instance that limits the requests handled
+        #: concurrently, or ``None`` to accept all requests.
+        self.admission = None
+        #: A :class:`Metrics` instance that records per-route request
+        #: metrics, or ``None`` to disable them.
+        self.metrics = None
+        #: Set to ``False`` to close every connection after one response,
+        #: as HTTP/1.0 servers do.
+        self.keep_alive = True
+        #: The number of connections closed because a read or write took
+        #: longer than allowed, by phase. The limits are set in
+        #: :attr:`Request.head_timeout`, :attr:`Request.body_timeout` and
+        #: :attr:`Response.write_timeout`.
+        self.timeouts = {'head': 0, 'body': 0, 'write': 0}
+        #: The number of persistent connections closed after waiting
+        #: :attr:`Request.idle_timeout` for another request. These are
+        #: normal closes and not counted in :attr:`timeouts`.
+        self.idle_closes = 0
+
+    def route(self, url_pattern, methods=None, weight=1):
         """Decorator that is used to register a function as a request handler
         for a given URL.
 
@@ -958,6 +1733,9 @@ class Microdot:
         :param methods: The list of HTTP methods to be handled by the
                         decorated function. If omitted, only ``GET`` requests
                         are handled.
+        :param weight: The share of the server's capacity taken by a request
+                       to this route when admission control is enabled. The
+                       default is 1.
 
         The URL pattern can be a static path (for example, ``/users`` or
         ``/api/invoices/search``) or a path with dynamic components enclosed
@@ -982,7 +1760,7 @@ class Microdot:
         def decorated(f):
             self.url_map.append(
                 ([m.upper() for m in (methods or ['GET'])],
-                 URLPattern(url_pattern), f, '', None))
+                 URLPattern(url_pattern), f, '', None, weight))
             return f
         return decorated
 
@@ -1160,10 +1938,11 @@ class Microdot:
                       sub-application. When ``False``, they apply to the entire
                       application. The default is ``False``.
         """
-        for methods, pattern, handler, _prefix, _subapp in subapp.url_map:
+        for methods, pattern, handler, _prefix, _subapp, weight in \
+                subapp.url_map:
             self.url_map.append(
                 (methods, URLPattern(url_prefix + pattern.url_pattern),
-                 handler, url_prefix + _prefix, _subapp or subapp))
+                 handler, url_prefix + _prefix, _subapp or subapp, weight))
         if not local:
             for handler in subapp.before_request_handlers:
                 self.before_request_handlers.append(handler)
@@ -1245,6 +2024,10 @@ class Microdot:
             if not hasattr(writer, 'awrite'):  # pragma: no cover
                 # CPython provides the awrite and aclose methods in 3.8+
                 async def awrite(self, data):
+                    if isinstance(data, memoryview):
+                        # the transport can hold on to the data until it is
+                        # sent, while responses reuse their write buffer
+                        data = bytes(data)
                     self.write(data)
                     await self.drain()
 
@@ -1262,11 +2045,15 @@ class Microdot:
             print('Starting async server on {host}:{port}...'.format(
                 host=host, port=port))
 
+        kwargs = {}
+        if self.admission and self.admission.backlog:
+            kwargs['backlog'] = self.admission.backlog
         try:
             self.server = await asyncio.start_server(serve, host, port,
-                                                     ssl=ssl)
+                                                     ssl=ssl, **kwargs)
         except TypeError:  # pragma: no cover
-            self.server = await asyncio.start_server(serve, host, port)
+            self.server = await asyncio.start_server(serve, host, port,
+                                                     **kwargs)
 
         while True:
             try:
@@ -1331,60 +2118,148 @@ class Microdot:
         """
         self.server.close()
 
+    def match_routes(self, path):
+        """Return the routes that match a path, as a list of
+        ``(route, args)`` tuples in the order in which the routes were
+        registered.
+
+        The dispatch index is updated with any routes that were added to the
+        URL map since the last call.
+        """
+        if self.route_index.size > len(self.url_map):  # pragma: no cover
+            self.route_index = RouteIndex()
+        for route in self.url_map[self.route_index.size:]:
+            self.route_index.add(route[1])
+        return [(self.url_map[position], args)
+                for position, args in self.route_index.match(path)]
+
     def find_route(self, req):
         method = req.method.upper()
         if method == 'OPTIONS' and self.options_handler:
-            return self.options_handler(req), '', None
+            return self.options_handler(req), '', None, 1
         if method == 'HEAD':
             method = 'GET'
         f = 404
         p = ''
         s = None
-        for route_methods, route_pattern, route_handler, url_prefix, subapp \
-                in self.url_map:
-            req.url_args = route_pattern.match(req.path)
-            if req.url_args is not None:
-                p = url_prefix
-                s = subapp
-                if method in route_methods:
-                    f = route_handler
-                    break
-                else:
-                    f = 405
-        return f, p, s
+        w = 1
+        req.url_args = None
+        for route, url_args in self.match_routes(req.path):
+            route_methods, pattern, route_handler, url_prefix, subapp, \
+                weight = route
+            req.url_args = url_args
+            p = url_prefix
+            s = subapp
+            if method in route_methods:
+                f = route_handler
+                w = weight
+                req.route = pattern.url_pattern
+                break
+            else:
+                f = 405
+        return f, p, s, w
 
     def default_options_handler(self, req):
         allow = []
-        for route_methods, route_pattern, _, _, _ in self.url_map:
-            if route_pattern.match(req.path) is not None:
-                allow.extend(route_methods)
+        for route, _ in self.match_routes(req.path):
+            allow.extend(route[0])
         if 'GET' in allow:
             allow.append('HEAD')
         allow.append('OPTIONS')
         return {'Allow': ', '.join(allow)}
 
-    async def handle_request(self, reader, writer):
-        req = None
-        try:
-            req = await Request.create(self, reader, writer,
-                                       writer.get_extra_info('peername'))
-        except Exception as exc:  # pragma: no cover
-            print_exception(exc)
+    def can_keep_alive(self, req, res):
+        """Check if the connection can be reused after a response.
 
-        res = await self.dispatch_request(req)
+        Only HTTP/1.1 connections are kept alive, and only when the request
+        body was fully read and neither side asked to close the connection.
+        Responses sent over a persistent connection always have a known
+        length, either through ``Content-Length`` or chunked encoding.
+        """
+        if not self.keep_alive or req is None or \
+                res == Response.already_handled or \
+                req.http_version != '1.1' or \
+                req.content_length > Request.max_body_length:
+            return False
+        return req.headers.get('Connection', '').lower() != 'close' and \
+            res.headers.get('Connection', '').lower() != 'close'
+
+    async def handle_request(self, reader, writer):
+        first = True
+        while True:
+            req = None
+            try:
+                req = await Request.create(self, reader, writer,
+                                           writer.get_extra_info('peername'),
+                                           idle=not first)
+            except asyncio.TimeoutError:
+                # the client stalled while sending a request, it is told so
+                # before the connection is closed
+                await self.send_timeout(writer)
+                break
+            except OSError:  # pragma: no cover
+                if not first:
+                    # the client dropped a persistent connection
+                    break
+            except Exception as exc:  # pragma: no cover
+                print_exception(exc)
+            if req is None and not first:
+                # the client closed a persistent connection
+                break
+            first = False
+
+            started = ticks_us()
+            res = await self.dispatch_request(req)
+            handled = ticks_us()
+            keep_alive = self.can_keep_alive(req, res)
+            if req and req.http_version == '1.1' and not keep_alive and \
+                    res != Response.already_handled:
+                res.headers['Connection'] = 'close'
+            try:
+                if res != Response.already_handled:  # pragma: no branch
+                    await res.write(writer)
+            except asyncio.TimeoutError:
+                # the client stopped reading the response
+                self.timeouts['write'] += 1
+                keep_alive = False
+            except OSError as exc:  # pragma: no cover
+                keep_alive = False
+                if exc.errno not in MUTED_SOCKET_ERRORS:
+                    raise
+            finally:
+                if req and req.weight:
+                    # capacity is held until the response is fully written
+                    self.admission.release(req.weight)
+            if self.metrics:
+                self.metrics.record(
+                    req.route if req and req.route else 'unmatched',
+                    res.status_code, ticks_diff(handled, started),
+                    ticks_diff(ticks_us(), handled), res.bytes_sent)
+            if self.debug and req:  # pragma: no cover
+                print('{method} {path} {status_code}'.format(
+                    method=req.method, path=req.path,
+                    status_code=res.status_code))
+            if not keep_alive:
+                break
         try:
-            if res != Response.already_handled:  # pragma: no branch
-                await res.write(writer)
-            await writer.aclose()
+            await with_timeout(writer.aclose(), Response.write_timeout)
+        except asyncio.TimeoutError:  # pragma: no cover
+            # data that a stalled client does not read can hold the socket
+            # open, CPython transports can drop it
+            if hasattr(writer, 'transport'):
+                writer.transport.abort()
         except OSError as exc:  # pragma: no cover
-            if exc.errno in MUTED_SOCKET_ERRORS:
-                pass
-            else:
+            if exc.errno not in MUTED_SOCKET_ERRORS:
                 raise
-        if self.debug and req:  # pragma: no cover
-            print('{method} {path} {status_code}'.format(
-                method=req.method, path=req.path,
-                status_code=res.status_code))
+
+    async def send_timeout(self, writer):
+        res = Response('Request timeout', status_code=408,
+                       headers={'Connection': 'close'},
+                       reason='Request Timeout')
+        try:
+            await res.write(writer)
+        except (asyncio.TimeoutError, OSError):  # pragma: no cover
+            pass
 
     def get_request_handlers(self, req, attr, local_first=True):
         handlers = getattr(self, attr + '_handlers')
@@ -1409,11 +2284,20 @@ class Microdot:
                 res = await self.error_response(req, 413, 'Payload too large')
             else:
                 # find the route in the app's URL map
-                f, req.url_prefix, req.subapp = self.find_route(req)
+                f, req.url_prefix, req.subapp, weight = self.find_route(req)
+                if callable(f) and self.admission:
+                    weight = await self.admission.acquire(weight)
+                    if weight is None:
+                        # the server is saturated
+                        f = self.admission.overloaded_response()
+                    else:
+                        req.weight = weight
 
                 try:
                     res = None
-                    if callable(f):
+                    if isinstance(f, Response):
+                        res = f
+                    elif callable(f):
                         # invoke the before request handlers
                         for handler in self.get_request_handlers(
                                 req, 'before_request', False):
@@ -1522,6 +2406,8 @@ class Microdot:
                 res = await invoke_handler(
                     handler, req, res) or res
         res.is_head = (req and req.method == 'HEAD')
+        res.http_version = '1.1' if req and req.http_version == '1.1' \
+            else '1.0'
         return res
 
 
@@ -0,0 +1,172 @@
+"""
+microdot_sse
+------------
+
+Server-Sent Events support for Microdot. A :class:`SSEBroadcaster` fans out
+events to a bounded number of long-lived ``text/event-stream`` responses,
+each one with its own bounded queue so that a slow client can only lose its
+own events.
+"""
+import asyncio
+
+from microdot import Response
+
+try:
+    import orjson as json
+except ImportError:
+    import json
+
+
+def format_event(data, event=None, event_id=None):
+    """Encode an event in the ``text/event-stream`` format.
+
+    :param data: The event payload. Dictionaries and lists are encoded as
+                 JSON, other types are converted to a string.
+    :param event: An optional event name.
+    :param event_id: An optional event id.
+    """
+    if isinstance(data, (dict, list)):
+        data = json.dumps(data)
+    if not isinstance(data, bytes):
+        data = str(data).encode()
+    data = b'data: ' + data + b'\n\n'
+    if event_id is not None:
+        data = b'id: ' + str(event_id).encode() + b'\n' + data
+    if event is not None:
+        data = b'event: ' + event.encode() + b'\n' + data
+    return data
+
+
+class SSE:
+    """The event queue of a single client.
+
+    :param max_queue: The maximum number of events that are held for the
+                      client. When the queue is full the oldest event is
+                      dropped.
+    """
+    def __init__(self, max_queue=8):
+        self.max_queue = max_queue
+        self.queue = []
+        self.event = asyncio.Event()
+        self.dropped = 0
+        self.closed = False
+
+    def put(self, data):
+        """Queue an event that was encoded with :func:`format_event`."""
+        if len(self.queue) >= self.max_queue:
+            self.queue.pop(0)
+            self.dropped += 1
+        self.queue.append(data)
+        self.event.set()
+
+    def close(self):
+        """End the event stream after the queued events are sent."""
+        self.closed = True
+        self.event.set()
+
+
+class SSEBroadcaster:
+    """Fan out events to all the subscribed clients.
+
+    :param max_subscribers: The maximum number of concurrent event streams.
+                            Further clients receive a 503 response.
+    :param max_queue: The maximum number of events queued per client.
+    :param heartbeat: Seconds of inactivity after which a comment line is
+                      sent to keep the connection alive and to detect
+                      clients that went away.
+
+    Example::
+
+        events = SSEBroadcaster()
+
+        @app.route('/events')
+        async def live_events(request):
+            return events.response(request)
+
+        # elsewhere, for example in a sampling loop
+        events.publish({'co2': 750}, event='co2')
+    """
+    def __init__(self, max_subscribers=4, max_queue=8, heartbeat=30):
+        self.max_subscribers = max_subscribers
+        self.max_queue = max_queue
+        self.heartbeat = heartbeat
+        self.subscribers = []
+        self.rejected = 0
+
+    def publish(self, data, event=None, event_id=None):
+        """Send an event to all the subscribed clients.
+
+        The event is encoded once and shared by all the client queues. This
+        method does not block, so it can be called from any task.
+        """
+        if not self.subscribers:
+            return
+        data = format_event(data, event=event, event_id=event_id)
+        for sse in self.subscribers:
+            sse.put(data)
+
+    def close(self):
+        """End all the event streams."""
+        for sse in self.subscribers:
+            sse.close()
+
+    def response(self, request, initial=None, event=None):
+        """Return a streaming response subscribed to this broadcaster.
+
+        :param request: The request object.
+        :param initial: An optional event payload to send to this client
+                        before any broadcast events, such as the current
+                        state.
+        :param event: The event name of the initial payload.
+        """
+        if len(self.subscribers) >= self.max_subscribers:
+            self.rejected += 1
+            return Response('Too many event streams', status_code=503,
+                            headers={'Retry-After': str(self.heartbeat)})
+        sse = SSE(self.max_queue)
+        if initial is not None:
+            sse.put(format_event(initial, event=event))
+        broadcaster = self
+
+        class sse_loop:
+            subscribed = False
+
+            def __aiter__(self):
+                return self
+
+            async def __anext__(self):
+                if not self.subscribed:
+                    # subscribe once the body is sent, a response that is
+                    # never written (HEAD, an error) holds no subscription
+                    subscribers = broadcaster.subscribers
+                    if sse.closed or \
+                            len(subscribers) >= broadcaster.max_subscribers:
+                        # other streams were admitted in the meantime
+                        broadcaster.rejected += 1
+                        raise StopAsyncIteration
+                    subscribers.append(sse)
+                    self.subscribed = True
+                while not sse.queue:
+                    if sse.closed:
+                        await self.aclose()
+                        raise StopAsyncIteration
+                    try:
+                        await asyncio.wait_for(sse.event.wait(),
+                                               broadcaster.heartbeat)
+                    except asyncio.TimeoutError:
+                        return b': heartbeat\n\n'
+                    sse.event.clear()
+                return sse.queue.pop(0)
+
+            async def aclose(self):
+                sse.closed = True
+                if sse in broadcaster.subscribers:
+                    broadcaster.subscribers.remove(sse)
+
+        res = Response(body=sse_loop(), headers={
+            'Content-Type': 'text/event-stream',
+            'Cache-Control': 'no-cache',
+        })
+        # every event is sent in its own chunk as soon as it is published
+        res.chunk_min_size = 0
+        return res
@@ -0,0 +1,339 @@
+"""
+microdot_websocket
+------------------
+
+WebSocket support for Microdot. The :func:`with_websocket` decorator turns a
+route into a WebSocket endpoint, and a :class:`WebSocketBroadcaster` pushes
+binary frames to a bounded number of connected clients while reading their
+control messages.
+"""
+import asyncio
+import binascii
+import hashlib
+
+from microdot import MUTED_SOCKET_ERRORS, Request, Response, print_exception
+
+
+class WebSocketError(Exception):
+    """Exception raised when an error occurs in a WebSocket connection."""
+    pass
+
+
+class WebSocket:
+    """A WebSocket connection.
+
+    Only unfragmented frames are supported, which is what browsers send for
+    short messages.
+    """
+    CONT = 0
+    TEXT = 1
+    BINARY = 2
+    CLOSE = 8
+    PING = 9
+    PONG = 10
+
+    #: Specify the maximum message size that can be received when calling the
+    #: ``receive()`` method. Messages with payloads that are larger than this
+    #: size will be rejected and the connection closed. Set to -1 to use the
+    #: value set in ``Request.max_body_length``.
+    max_message_length = -1
+
+    def __init__(self, request):
+        self.request = request
+        self.closed = False
+        self.lock = asyncio.Lock()
+
+    async def handshake(self):
+        response = self._handshake_response()
+        await self.request.sock[1].awrite(
+            b'HTTP/1.1 101 Switching Protocols\r\n'
+            b'Upgrade: websocket\r\n'
+            b'Connection: Upgrade\r\n'
+            b'Sec-WebSocket-Accept: ' + response + b'\r\n\r\n')
+
+    async def receive(self):
+        """Receive a message. Text messages are returned as a string and
+        binary messages as bytes.
+
+        Ping frames are answered with a pong and pong frames are ignored. A
+        :class:`WebSocketError` is raised when the client closes the
+        connection.
+        """
+        while True:
+            opcode, payload = await self._read_frame()
+            send_opcode, data = self._process_websocket_frame(opcode, payload)
+            if send_opcode:
+                await self.send(data, send_opcode)
+            elif data is not None:
+                return data
+
+    async def send(self, data, opcode=None):
+        """Send a message. Strings are sent as text messages and bytes as
+        binary messages, unless ``opcode`` is given."""
+        frame = self._encode_websocket_frame(
+            data,
+            opcode or (self.TEXT if isinstance(data, str) else self.BINARY))
+        await self.write_frame(frame)
+
+    async def write_frame(self, frame):
+        """Write an encoded frame. Frames written by different tasks, such
+        as the pongs sent by ``receive()`` and the frames of a broadcaster,
+        go out one whole frame at a time."""
+        async with self.lock:
+            await self.request.sock[1].awrite(frame)
+
+    async def close(self):
+        if not self.closed:
+            self.closed = True
+            await self.send(b'', self.CLOSE)
+
+    def _handshake_response(self):
+        headers = self.request.headers
+        if 'upgrade' not in headers.get('Connection', '').lower() or \
+                headers.get('Upgrade', '').lower() != 'websocket' or \
+                'Sec-WebSocket-Key' not in headers:
+            return self.request.app.abort(400)
+        d = hashlib.sha1(headers['Sec-WebSocket-Key'].encode())
+        d.update(b'258EAFA5-E914-47DA-95CA-C5AB0DC85B11')
+        return binascii.b2a_base64(d.digest())[:-1]
+
+    @classmethod
+    def _parse_frame_header(cls, header):
+        fin = header[0] & 0x80
+        opcode = header[0] & 0x0f
+        if fin == 0 or opcode == cls.CONT:
+            raise WebSocketError('Continuation frames not supported')
+        has_mask = header[1] & 0x80
+        length = header[1] & 0x7f
+        if length == 126:
+            length = -2
+        elif length == 127:
+            length = -8
+        return fin, opcode, has_mask, length
+
+    def _process_websocket_frame(self, opcode, payload):
+        if opcode == self.TEXT:
+            payload = payload.decode()
+        elif opcode == self.BINARY:
+            pass
+        elif opcode == self.CLOSE:
+            raise WebSocketError('Websocket connection closed')
+        elif opcode == self.PING:
+            return self.PONG, payload
+        else:
+            # pongs and unknown opcodes carry no message
+            return None, None
+        return None, payload
+
+    @classmethod
+    def _encode_websocket_frame(cls, payload, opcode):
+        if isinstance(payload, str):
+            payload = payload.encode()
+        length = len(payload)
+        if length < 126:
+            frame = bytearray(2 + length)
+            frame[1] = length
+            n = 2
+        elif length < (1 << 16):
+            frame = bytearray(4 + length)
+            frame[1] = 126
+            frame[2:4] = length.to_bytes(2, 'big')
+            n = 4
+        else:
+            frame = bytearray(10 + length)
+            frame[1] = 127
+            frame[2:10] = length.to_bytes(8, 'big')
+            n = 10
+        frame[0] = 0x80 | opcode
+        frame[n:] = payload
+        return frame
+
+    async def _read_frame(self):
+        stream = self.request.sock[0]
+        header = await stream.readexactly(2)
+        fin, opcode, has_mask, length = self._parse_frame_header(header)
+        if length == -2:
+            length = int.from_bytes(await stream.readexactly(2), 'big')
+        elif length == -8:
+            length = int.from_bytes(await stream.readexactly(8), 'big')
+        max_allowed_length = Request.max_body_length \
+            if self.max_message_length == -1 else self.max_message_length
+        if length > max_allowed_length:
+            raise WebSocketError('Message too large')
+        if has_mask:
+            mask = await stream.readexactly(4)
+        payload = await stream.readexactly(length) if length else b''
+        if has_mask:
+            payload = bytes(x ^ mask[i % 4] for i, x in enumerate(payload))
+        return opcode, payload
+
+
+async def websocket_upgrade(request):
+    """Upgrade a request handler to a websocket connection.
+
+    This function can be called directly inside a route function to process a
+    WebSocket upgrade handshake, for example after the user's credentials are
+    verified. The function returns the websocket object.
+    """
+    ws = WebSocket(request)
+    await ws.handshake()
+
+    @request.after_request
+    async def after_request(request, response):
+        return Response.already_handled
+
+    return ws
+
+
+def with_websocket(f):
+    """Decorator to make a route a WebSocket endpoint.
+
+    This decorator is used to define a route that accepts websocket
+    connections. The route then receives a websocket object as a second
+    argument that it can use to send and receive messages::
+
+        @app.route('/echo')
+        @with_websocket
+        async def echo(request, ws):
+            while True:
+                message = await ws.receive()
+                await ws.send(message)
+    """
+    async def wrapper(request, *args, **kwargs):
+        ws = await websocket_upgrade(request)
+        try:
+            await f(request, ws, *args, **kwargs)
+        except OSError as exc:
+            if exc.errno not in MUTED_SOCKET_ERRORS:  # pragma: no cover
+                raise
+        except (WebSocketError, EOFError):
+            pass
+        except Exception as exc:
+            print_exception(exc)
+        finally:
+            try:
+                await ws.close()
+            except Exception:
+                pass
+        return Response.already_handled
+    return wrapper
+
+
+class WebSocketClient:
+    """The state of a client connected to a :class:`WebSocketBroadcaster`.
+
+    :param ws: The websocket connection.
+    :param max_queue: The maximum number of frames held for the client. When
+                      the queue is full the oldest frame is dropped.
+    """
+    def __init__(self, ws, max_queue):
+        self.ws = ws
+        self.max_queue = max_queue
+        self.queue = []
+        self.event = asyncio.Event()
+        self.dropped = 0
+        #: The series the client subscribed to, or ``None`` for all series.
+        self.series = None
+
+    def put(self, frame):
+        if len(self.queue) >= self.max_queue:
+            self.queue.pop(0)
+            self.dropped += 1
+        self.queue.append(frame)
+        self.event.set()
+
+
+class WebSocketBroadcaster:
+    """Push binary messages to all the connected WebSocket clients.
+
+    :param max_clients: The maximum number of concurrent connections.
+                        Further clients are closed right after the handshake.
+    :param max_queue: The maximum number of frames queued per client.
+    :param max_message_length: The maximum size of a control message sent
+                               by a client.
+    :param ping_interval: Seconds of inactivity after which a ping frame is
+                          sent to detect clients that went away.
+
+    Example::
+
+        live = WebSocketBroadcaster()
+
+        @app.route('/ws')
+        @with_websocket
+        async def live_ws(request, ws):
+            await live.serve(ws, on_message)
+
+        # elsewhere, for example in a sampling loop
+        live.publish(b'...', series='co2')
+    """
+    def __init__(self, max_clients=4, max_queue=8, max_message_length=128,
+                 ping_interval=30):
+        self.max_clients = max_clients
+        self.max_queue = max_queue
+        self.max_message_length = max_message_length
+        self.ping_interval = ping_interval
+        self.clients = []
+        self.rejected = 0
+
+    def publish(self, data, series=None):
+        """Queue a binary message for the clients subscribed to ``series``.
+
+        The frame is encoded once and shared by all the client queues. This
+        method does not block, so it can be called from any task.
+        """
+        if not self.clients:
+            return
+        frame = WebSocket._encode_websocket_frame(data, WebSocket.BINARY)
+        for client in self.clients:
+            if series is None or client.series is None or \
+                    series in client.series:
+                client.put(frame)
+
+    async def serve(self, ws, on_message=None):
+        """Run a client connection until it is closed.
+
+        :param ws: The websocket connection, as given by
+                   :func:`with_websocket`.
+        :param on_message: An optional coroutine that is invoked with the
+                           :class:`WebSocketClient` and each message received
+                           from the client, to handle control messages.
+        """
+        if len(self.clients) >= self.max_clients:
+            self.rejected += 1
+            return
+        ws.max_message_length = self.max_message_length
+        client = WebSocketClient(ws, self.max_queue)
+        self.clients.append(client)
+        sender = asyncio.create_task(self._send_loop(client))
+        try:
+            while True:
+                message = await ws.receive()
+                if on_message:
+                    await on_message(client, message)
+        finally:
+            sender.cancel()
+            self.clients.remove(client)
+
+    async def _send_loop(self, client):
+        try:
+            while True:
+                if not client.queue:
+                    try:
+                        await asyncio.wait_for(client.event.wait(),
+                                               self.ping_interval)
+                    except asyncio.TimeoutError:
+                        await client.ws.send(b'', WebSocket.PING)
+                        continue
+                    client.event.clear()
+                while client.queue:
+                    await client.ws.write_frame(client.queue.pop(0))
+        except asyncio.CancelledError:
+            pass
+        except Exception:
+            # a failed write ends the connection, closing the socket also
+            # wakes up the reader so that the client is removed
+            client.ws.closed = True
+            try:
+                await client.ws.request.sock[1].aclose()
+            except Exception:
+                pass
@@ -0,0 +1,323 @@
+"""
+Template Minifier for CO2 Monitor
+Collapses whitespace in the markup of .tpl templates, strips comments from
+inline CSS and JS and removes the whitespace that CSS and JS do not need,
+leaving {{ }} and {% %} tags untouched. Also checks that minified templates
+render pages equivalent to the originals.
+"""
+import re
+import shutil
+import subprocess
+import tempfile
+from html.parser import HTMLParser
+
+# Template tags are swapped for placeholders made of private use characters
+# while the text around them is minified. Statement placeholders produce no
+# output, so whitespace next to them is judged by the tokens around them.
+STMT = "\ue000"
+EXPR = "\ue001"
+END = "\ue002"
+TEMPLATE_TAG_RE = re.compile(r"\{%.*?%\}|\{\{.*?\}\}", re.S)
+PLACEHOLDER_RE = re.compile("[%s%s](\\d+)%s" % (STMT, EXPR, END))
+
+MARKUP_RE = re.compile(
+    r"(?P<comment><!--.*?-->)"
+    r"|(?P<raw><(?P<rawname>script|style|pre|textarea)\b[^>]*>.*?</(?P=rawname)\s*>)"
+    r"|(?P<tag><[^>]*>)"
+    r"|(?P<ws>\s+)"
+    r"|(?P<stmt>%s\d+%s)"
+    r"|(?P<text>[^<\s%s]+|[<%s])" % (STMT, END, STMT, STMT),
+    re.S | re.I)
+
+# Elements whose surrounding whitespace is never rendered, including the
+# SVG shapes, between which whitespace is not drawn
+BLOCK_TAGS = {
+    "!doctype", "html", "head", "body", "title", "meta", "link", "style",
+    "script", "div", "p", "h1", "h2", "h3", "h4", "h5", "h6", "ul", "ol",
+    "li", "table", "thead", "tbody", "tr", "th", "td", "br", "hr", "form",
+    "header", "footer", "section", "nav", "main", "g", "line", "polyline",
+    "path", "rect", "circle", "text",
+}
+
+JS_TYPES = ("", "text/javascript", "application/javascript", "module")
+
+
+def protect(source):
+    """Replace template tags with placeholders, return the text and tags"""
+    tags = []
+
+    def placeholder(match):
+        tags.append(match.group(0))
+        kind = STMT if match.group(0).startswith("{%") else EXPR
+        return "%s%d%s" % (kind, len(tags) - 1, END)
+
+    return TEMPLATE_TAG_RE.sub(placeholder, source), tags
+
+
+def restore(text, tags):
+    return PLACEHOLDER_RE.sub(lambda m: tags[int(m.group(1))], text)
+
+
+def tag_name(tag):
+    match = re.match(r"</?\s*([!\w-]+)", tag)
+    return match.group(1).lower() if match else ""
+
+
+def minify_tag(tag):
+    """Collapse whitespace between the attributes of a tag, quoted values are
+    kept as written"""
+    parts = re.split(r"(\"[^\"]*\"|'[^']*')", tag)
+    for i in range(0, len(parts), 2):
+        parts[i] = re.sub(r"\s+", " ", parts[i])
+    tag = "".join(parts)
+    return re.sub(r"\s+(/?>)$", r"\1", tag)
+
+
+def minify_css(css):
+    css = re.sub(r"/\*.*?\*/", "", css, flags=re.S)
+    css = re.sub(r"\s+", " ", css)
+    css = re.sub(r"\s*([{};,>])\s*", r"\1", css)
+    css = re.sub(r":\s+", ":", css)
+    return css.replace(";}", "}").strip()
+
+
+# Characters next to which a JS space is never needed. + and - are left out
+# so that "a - -b" keeps its meaning, / so that regexes and comments stay
+# intact. Newlines are only dropped after characters that cannot end a
+# statement or before ones that cannot start one.
+JS_PUNCTUATION = "{}()[];,:=<>!&|?"
+# A / after one of these (or at the start) begins a regex, not a division
+JS_REGEX_PREFIX = "(,=:[!&|?{};+-*%<>~^\n"
+
+
+def minify_js(js):
+    """Strip comments and needless whitespace from a script.
+
+    Strings, template literals and regexes are copied as they are. Newlines
+    are kept unless the characters around them make automatic semicolon
+    insertion impossible, so the statements of the script do not change.
+    """
+    out = []
+    i = 0
+    n = len(js)
+    while i < n:
+        c = js[i]
+        if c in "'\"`":
+            end = i + 1
+            while end < n and js[end] != c:
+                end += 2 if js[end] == "\\" else 1
+            out.append(js[i:end + 1])
+            i = end + 1
+        elif js.startswith("//", i):
+            end = js.find("\n", i)
+            i = n if end == -1 else end
+        elif js.startswith("/*", i):
+            end = js.find("*/", i + 2)
+            end = n if end == -1 else end + 2
+            out.append("\n" if "\n" in js[i:end] else " ")
+            i = end
+        elif c == "/" and (not "".join(out).rstrip(" ") or
+                           "".join(out).rstrip(" ")[-1] in JS_REGEX_PREFIX):
+            end = i + 1
+            in_class = False
+            while end < n and (js[end] != "/" or in_class):
+                if js[end] == "\\":
+                    end += 1
+                elif js[end] == "[":
+                    in_class = True
+                elif js[end] == "]":
+                    in_class = False
+                end += 1
+            end += 1
+            while end < n and js[end].isalpha():
+                end += 1
+            out.append(js[i:end])
+            i = end
+        elif c.isspace():
+            end = i
+            while end < n and js[end].isspace():
+                end += 1
+            out.append("\n" if "\n" in js[i:end] else " ")
+            i = end
+        else:
+            out.append(c)
+            i += 1
+
+    # drop the whitespace tokens that no statement depends on
+    tokens = out
+    result = []
+    for k, token in enumerate(tokens):
+        if token not in (" ", "\n"):
+            result.append(token)
+            continue
+        prev = result[-1][-1] if result else ""
+        nxt = tokens[k + 1][0] if k + 1 < len(tokens) else ""
+        if not prev or not nxt or nxt in " \n":
+            continue
+        if token == " ":
+            if prev in JS_PUNCTUATION or nxt in JS_PUNCTUATION:
+                continue
+        elif prev in "{([,;=:?&|<>!" or nxt in ")]},;.":
+            continue
+        result.append(token)
+    return "".join(result)
+
+
+def minify_raw(block, name):
+    """Minify the content of a script or style element"""
+    open_end = block.index(">") + 1
+    close_start = block.lower().rindex("</")
+    open_tag = minify_tag(block[:open_end])
+    content = block[open_end:close_start]
+    close_tag = block[close_start:]
+    if name == "style":
+        content = minify_css(content)
+    elif name == "script":
+        script_type = re.search(r"\btype\s*=\s*[\"']?([^\"'\s>]*)", open_tag)
+        if (script_type.group(1).lower() if script_type else "") in JS_TYPES:
+            content = minify_js(content)
+        else:
+            content = content.strip()
+    else:
+        open_tag = block[:open_end]
+    return open_tag + content + close_tag
+
+
+def minify_markup(text):
+    tokens = []
+    for match in MARKUP_RE.finditer(text):
+        kind = match.lastgroup
+        value = match.group(0)
+        if kind == "comment":
+            if PLACEHOLDER_RE.search(value):
+                tokens.append(("text", value))
+            continue
+        if kind == "raw":
+            name = match.group("rawname").lower()
+            tokens.append(("raw", minify_raw(value, name), name))
+        elif kind == "tag":
+            tokens.append(("tag", minify_tag(value), tag_name(value)))
+        else:
+            tokens.append((kind, value))
+
+    def neighbour(k, step):
+        k += step
+        while 0 <= k < len(tokens) and tokens[k][0] in ("ws", "stmt"):
+            k += step
+        return tokens[k] if 0 <= k < len(tokens) else None
+
+    out = []
+    for k, token in enumerate(tokens):
+        if token[0] != "ws":
+            out.append(token[1])
+            continue
+        prev, nxt = neighbour(k, -1), neighbour(k, 1)
+        if prev is None or nxt is None:
+            continue
+        if any(t[0] in ("tag", "raw") and t[2] in BLOCK_TAGS
+               for t in (prev, nxt)):
+            continue
+        # a single space renders the same as any run of whitespace, but is
+        # only needed once between two statements
+        if out and out[-1] == " ":
+            continue
+        out.append(" ")
+    return "".join(out)
+
+
+def minify_template(source):
+    """Return the minified source of a .tpl template"""
+    text, tags = protect(source)
+    return restore(minify_markup(text), tags) + "\n"
+
+
+# Tokens of CSS and JS code: strings, comments and whitespace (dropped),
+# multi-character operators, words and single characters
+CODE_RE = re.compile(
+    r"(\"(?:\\.|[^\"\\])*\"|'(?:\\.|[^'\\])*'|`(?:\\.|[^`\\])*`)"
+    r"|(//[^\n]*|/\*.*?\*/|\s+)"
+    r"|(===|!==|=>|==|!=|<=|>=|&&|\|\||\?\?|\+\+|--|[-+*/%&|^]=|<<|>>"
+    r"|\.\.\.|[\w$#.%\u0080-\uffff]+|.)", re.S)
+
+
+def code_tokens(code, css=False):
+    """Tokens of a script or style, for comparing them independently of the
+    minifier. The last semicolon of a CSS block is optional."""
+    tokens = [m.group(1) or m.group(3) for m in CODE_RE.finditer(code)
+              if not m.group(2)]
+    if css:
+        tokens = [t for i, t in enumerate(tokens)
+                  if not (t == ";" and tokens[i + 1:i + 2] == ["}"])]
+    return tuple(tokens)
+
+
+class _Flow(HTMLParser):
+    """Collect the structure of a page: tags with their attributes, script
+    and style contents without whitespace, and the text as a browser lays
+    it out"""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.events = []
+        self.text = []
+        self.scripts = []
+        self.raw = None
+
+    def handle_starttag(self, tag, attrs):
+        self.events.append(("start", tag, tuple(attrs)))
+        if tag in BLOCK_TAGS:
+            self.text.append("\n")
+        if tag in ("script", "style"):
+            self.raw = tag
+            attrs = dict(attrs)
+            if tag == "script" and attrs.get("type", "") in JS_TYPES:
+                self.scripts.append("")
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        self.raw = None
+
+    def handle_endtag(self, tag):
+        self.events.append(("end", tag))
+        if tag in BLOCK_TAGS:
+            self.text.append("\n")
+        self.raw = None
+
+    def handle_data(self, data):
+        if self.raw:
+            if self.raw == "script" and self.scripts:
+                self.scripts[-1] += data
+            self.events.append(
+                ("raw", code_tokens(data, self.raw == "style")))
+        else:
+            # line breaks in text render as spaces, only block elements
+            # start new lines
+            self.text.append(re.sub(r"\s+", " ", data))
+
+    def flow(self):
+        text = re.sub(r" +", " ", "".join(self.text))
+        return re.sub(r" ?\n[\n ]*", "\n", text).strip()
+
+
+def check_equivalent(original, minified):
+    """Return None if two rendered pages are equivalent, else the reason"""
+    a, b = _Flow(), _Flow()
+    a.feed(original)
+    b.feed(minified)
+    if a.events != b.events:
+        for x, y in zip(a.events, b.events):
+            if x != y:
+                return "markup differs: %r != %r" % (x, y)
+        return "markup differs in length"
+    if a.flow() != b.flow():
+        return "rendered text differs"
+    node = shutil.which("node")
+    for script in b.scripts if node else []:
+        with tempfile.NamedTemporaryFile("w", suffix=".js") as f:
+            f.write(script)
+            f.flush()
+            result = subprocess.run([node, "--check", f.name],
+                                    capture_output=True, text=True)
+        if result.returncode != 0:
+            return "minified script does not parse: " + result.stderr
+    return None
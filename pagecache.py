@@ -0,0 +1,159 @@
+"""
+Cache of rendered pages for the CO2 monitor web server.
+
+Pages are stored as encoded bytes, keyed by name and by a state version that
+the application bumps whenever the data shown on the page changes. A hit can
+be written to the socket as a single buffer without rendering the template.
+A miss is streamed to the client while the page is collected for the cache.
+The LRU store underneath is shared with the template fragment cache of
+utemplate.fragments.
+"""
+import time
+
+try:
+    from gc import collect, mem_free
+except ImportError:
+    mem_free = None
+
+
+class LRUCache:
+    """A byte-bounded LRU cache of encoded data, the store shared by the page
+    cache and the template fragment cache.
+
+    Each name keeps only its latest data, together with the version it was
+    stored for. A lookup misses when the version changed or the entry's ttl
+    ran out.
+
+    :param max_bytes: The maximum total size of the cached data.
+    :param max_entries: The maximum number of entries, ``None`` for no
+                        limit other than ``max_bytes``.
+    :param min_free_memory: The cache is emptied when the free heap drops
+                            below this many bytes. Only enforced on platforms
+                            that provide ``gc.mem_free()``, ``None`` disables
+                            the check.
+    """
+
+    def __init__(self, max_bytes, max_entries=None, min_free_memory=None):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.min_free_memory = min_free_memory
+        self.entries = {}  # name -> (version, expires, data)
+        self.order = []  # least recently used first
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, name, version):
+        """Return the data cached for a version, or None"""
+        entry = self.entries.get(name)
+        if (
+            entry is None
+            or entry[0] != version
+            or (entry[1] is not None and time.time() >= entry[1])
+        ):
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.order.remove(name)
+        self.order.append(name)
+        return entry[2]
+
+    def put(self, name, version, data, ttl=None):
+        """Store data that expires after ttl seconds (None for never),
+        evicting older entries to stay in bounds"""
+        self.discard(name)
+        if len(data) > self.max_bytes:
+            return
+        while self.order and (
+            (self.max_entries is not None and len(self.order) >= self.max_entries)
+            or self.size + len(data) > self.max_bytes
+        ):
+            self.discard(self.order[0])
+        if self.memory_low():
+            self.clear()
+            collect()
+            if self.memory_low():
+                return
+        expires = None if ttl is None else time.time() + ttl
+        self.entries[name] = (version, expires, data)
+        self.order.append(name)
+        self.size += len(data)
+
+    def capture(self, name, version, chunks, ttl=None, limit=None):
+        """Yield chunks of bytes as they are produced and store them joined
+        once the last one went out. The chunks are kept as they are until
+        then. Data larger than limit (max_bytes if None) is passed through
+        without being collected."""
+        limit = self.max_bytes if limit is None else limit
+        data = []
+        size = 0
+        for chunk in chunks:
+            if data is not None:
+                size += len(chunk)
+                if size > limit:
+                    data = None
+                else:
+                    data.append(chunk)
+            yield chunk
+        if data is not None:
+            self.put(name, version, b"".join(data), ttl)
+
+    def discard(self, name):
+        entry = self.entries.pop(name, None)
+        if entry is not None:
+            self.order.remove(name)
+            self.size -= len(entry[2])
+
+    def clear(self):
+        self.entries = {}
+        self.order = []
+        self.size = 0
+
+    def memory_low(self):
+        return (
+            mem_free is not None
+            and self.min_free_memory is not None
+            and mem_free() < self.min_free_memory
+        )
+
+    def stats(self):
+        return {
+            "entries": len(self.order),
+            "bytes": self.size,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+class PageCache(LRUCache):
+    """A byte-bounded LRU cache of rendered pages.
+
+    :param max_bytes: The maximum total size of the cached pages.
+    :param max_age: Seconds after which a page is rendered again even if the
+                    state version did not change, for pages that also show
+                    the current time. ``None`` disables expiry.
+    :param min_free_memory: The cache is emptied when the free heap drops
+                            below this many bytes. Only enforced on platforms
+                            that provide ``gc.mem_free()``.
+    :param max_page: The size of the largest page collected by
+                     :meth:`capture`, which bounds the memory held while a
+                     page is streamed. ``None`` for ``max_bytes``.
+    """
+
+    def __init__(
+        self, max_bytes=16384, max_age=60, min_free_memory=16384, max_page=None
+    ):
+        super().__init__(max_bytes, min_free_memory=min_free_memory)
+        self.max_age = max_age
+        self.max_page = max_bytes if max_page is None else max_page
+
+    def put(self, name, version, data, ttl=None):
+        """Store a rendered page, which expires after max_age seconds"""
+        super().put(name, version, data, self.max_age if ttl is None else ttl)
+
+    def capture(self, name, version, chunks):
+        """Yield the chunks of a page as it is streamed to the client and
+        store the page once the last chunk went out. A page is dropped as
+        soon as it outgrows max_page, and the rest of it is passed through
+        without being collected."""
+        return super().capture(name, version, chunks, limit=self.max_page)
@@ -0,0 +1,418 @@
+"""
+Readings of a CO2 log file as a numeric series, and its downsampling.
+
+A log is read as (seconds, ppm) pairs, where seconds count from midnight of
+the first logged day, so that a few weeks of readings stay small integers on
+MicroPython. The downsamplers consume such pairs one at a time and yield at
+most a fixed number of them, bucketing the readings by time. They need the
+time range up front, which span() reads from the first and last rows of the
+file, and then run in a single pass over the rows: memory is bounded by the
+number of output points and, for LTTB, by the readings of two buckets.
+
+Readings of consecutive logs are merged into a single series of a date
+range by read_range(), one row of each log at a time.
+
+The encoders stream a series as JSON, either as [timestamp, ppm] pairs or
+delta-coded, or as delta-coded binary, in chunks of bounded size.
+"""
+import struct
+
+SECONDS_PER_DAY = 86400
+
+
+def day_number(date):
+    """Days since 1970-01-01 of a YYYY-MM-DD date"""
+    y, m, d = int(date[0:4]), int(date[5:7]), int(date[8:10])
+    if m <= 2:
+        y -= 1
+    era = y // 400
+    yoe = y - era * 400
+    doy = (153 * (m + (-3 if m > 2 else 9)) + 2) // 5 + d - 1
+    return era * 146097 + yoe * 365 + yoe // 4 - yoe // 100 + doy - 719468
+
+
+def day_string(days):
+    """YYYY-MM-DD date of a day number, the inverse of day_number()"""
+    days += 719468
+    era = days // 146097
+    doe = days - era * 146097
+    yoe = (doe - doe // 1460 + doe // 36524 - doe // 146096) // 365
+    doy = doe - (365 * yoe + yoe // 4 - yoe // 100)
+    mp = (5 * doy + 2) // 153
+    d = doy - (153 * mp + 2) // 5 + 1
+    m = mp + 3 if mp < 10 else mp - 9
+    return f"{yoe + era * 400 + (m <= 2):04d}-{m:02d}-{d:02d}"
+
+
+def timestamp(first_day, seconds):
+    """YYYY-MM-DD HH:MM:SS timestamp of a point of a series"""
+    day, seconds = divmod(seconds, SECONDS_PER_DAY)
+    return (f"{day_string(first_day + day)} {seconds // 3600:02d}:"
+            f"{seconds // 60 % 60:02d}:{seconds % 60:02d}")
+
+
+def last_row(path):
+    """Return the last line of a file, read from its tail"""
+    with open(path, "rb") as f:
+        f.seek(0, 2)
+        size = f.tell()
+        f.seek(max(0, size - 64))
+        tail = f.read().decode().rstrip()
+    return tail[tail.rfind("\n") + 1:].strip()
+
+
+def is_row_start(path, offset):
+    """Return True if offset is the start of a row of a file, or its end"""
+    if offset <= 0:
+        return offset == 0
+    with open(path, "rb") as f:
+        f.seek(offset - 1)
+        return f.read(1) == b"\n"
+
+
+def span(path):
+    """Return (first_day, num_days) of the dates logged in a file, or None
+    if it holds no readings"""
+    with open(path, "r") as f:
+        f.readline()  # header
+        first = f.readline().strip()
+    if not first:
+        return None
+    first_day = day_number(first)
+    return first_day, day_number(last_row(path)) - first_day + 1
+
+
+def readings(path, first_day, num_days, start=0, stop=None):
+    """Yield the (seconds, ppm) readings of a file that fall within
+    num_days days from first_day.
+
+    start and stop limit the rows read to a range of byte offsets: start
+    must be the offset of a row, 0 for the first one, and rows that end
+    after stop are left out, so that readings appended while the rows are
+    read can be picked up from stop later.
+    """
+    date, day = None, 0
+    with open(path, "r") as f:
+        if start:
+            f.seek(start)
+        else:
+            start = len(f.readline())  # header
+        for line in f:
+            # Logs are ASCII, the length of a line is its size in bytes
+            start += len(line)
+            if stop is not None and start > stop:
+                break
+            t, _, c = line.partition(",")
+            if not c:
+                continue
+            if t[0:10] != date:
+                date = t[0:10]
+                day = day_number(date) - first_day
+            if 0 <= day < num_days:
+                yield (day * SECONDS_PER_DAY + int(t[11:13]) * 3600
+                       + int(t[14:16]) * 60 + int(t[17:19]), int(c))
+
+
+def read(path, first_day, num_days, target=0, method="lttb", start=0,
+         stop=None):
+    """Yield the readings of a file like readings(), downsampled to about
+    target points unless target is 0"""
+    points = readings(path, first_day, num_days, start, stop)
+    if target:
+        end = num_days * SECONDS_PER_DAY - 1
+        points = downsample(points, 0, end, target, method)
+    return points
+
+
+def merge(streams):
+    """Merge streams of readings sorted by time into one sorted stream.
+
+    Holds the next reading of each stream and yields the earliest, found by
+    a linear scan, which is cheaper than a heap for the few logs that share
+    days. Readings at the same time are taken from the streams in order.
+    """
+    heads = []
+    for stream in streams:
+        try:
+            heads.append([next(stream), stream])
+        except StopIteration:
+            pass
+    while heads:
+        i = 0
+        for k in range(1, len(heads)):
+            if heads[k][0][0] < heads[i][0][0]:
+                i = k
+        head = heads[i]
+        yield head[0]
+        try:
+            head[0] = next(head[1])
+        except StopIteration:
+            heads.pop(i)
+
+
+def _sequential(logs, first_day, num_days):
+    """Yield the readings of (first_day, end_day, path) logs sorted by first
+    day. Logs that share days are merged, the others are read one after the
+    other, so that a single file is open at a time."""
+    i = 0
+    while i < len(logs):
+        end = logs[i][1]
+        j = i + 1
+        while j < len(logs) and logs[j][0] < end:
+            end = max(end, logs[j][1])
+            j += 1
+        if j == i + 1:
+            yield from readings(logs[i][2], first_day, num_days)
+        else:
+            yield from merge([readings(log[2], first_day, num_days)
+                              for log in logs[i:j]])
+        i = j
+
+
+def read_range(paths, first_day, num_days, target=0, method="lttb"):
+    """Yield the readings of several logs that fall within num_days days
+    from first_day, in time order and downsampled like read().
+    Logs whose first and last rows are outside the range are not read."""
+    logs = []
+    for path in paths:
+        days = span(path)
+        if (days and days[0] < first_day + num_days
+                and days[0] + days[1] > first_day):
+            logs.append((days[0], days[0] + days[1], path))
+    logs.sort()
+    points = _sequential(logs, first_day, num_days)
+    if target:
+        end = num_days * SECONDS_PER_DAY - 1
+        points = downsample(points, 0, end, target, method)
+    return points
+
+
+def _area(a, b, c):
+    """Twice the area of the triangle a, b, c"""
+    area = (a[0] - c[0]) * (b[1] - a[1]) - (a[0] - b[0]) * (c[1] - a[1])
+    return area if area >= 0 else -area
+
+
+def _select(a, candidates, c):
+    best, best_area = candidates[0], -1
+    for b in candidates:
+        area = _area(a, b, c)
+        if area > best_area:
+            best, best_area = b, area
+    return best
+
+
+def _mean(points):
+    n = len(points)
+    return (sum(p[0] for p in points) // n, sum(p[1] for p in points) // n)
+
+
+def lttb(points, start, end, buckets):
+    """Largest-Triangle-Three-Buckets: keep the first and last points and,
+    from each bucket of time, the point that forms the largest triangle with
+    the point kept before it and the mean of the next bucket. Preserves the
+    shape of the series."""
+    width = end - start + 1
+    a = None
+    current, following, bucket = [], [], None
+    for p in points:
+        if a is None:
+            a = p
+            yield p
+            continue
+        b = (p[0] - start) * buckets // width
+        if b == bucket:
+            following.append(p)
+            continue
+        # The following bucket is complete, choose the point of the current
+        if current:
+            a = _select(a, current, _mean(following))
+            yield a
+        current, following, bucket = following, [p], b
+    if a is None or not following:
+        return
+    last = following.pop()
+    if current:
+        a = _select(a, current, _mean(following) if following else last)
+        yield a
+    if following:
+        yield _select(a, following, last)
+    yield last
+
+
+def minmax(points, start, end, buckets):
+    """Keep the lowest and the highest point of each bucket of time, in time
+    order. Preserves peaks, at up to two points per bucket."""
+    width = end - start + 1
+    bucket, low, high = None, None, None
+    for p in points:
+        b = (p[0] - start) * buckets // width
+        if b != bucket:
+            if low is not None:
+                yield from _extremes(low, high)
+            bucket, low, high = b, p, p
+        elif p[1] < low[1]:
+            low = p
+        elif p[1] > high[1]:
+            high = p
+    if low is not None:
+        yield from _extremes(low, high)
+
+
+def _extremes(low, high):
+    if low is high:
+        yield low
+    elif low[0] < high[0]:
+        yield low
+        yield high
+    else:
+        yield high
+        yield low
+
+
+def average(points, start, end, buckets):
+    """Replace each bucket of time by the mean time and ppm of its points"""
+    width = end - start + 1
+    bucket, sum_x, sum_y, n = None, 0, 0, 0
+    for p in points:
+        b = (p[0] - start) * buckets // width
+        if b != bucket:
+            if n:
+                yield (sum_x // n, (2 * sum_y + n) // (2 * n))
+            bucket, sum_x, sum_y, n = b, 0, 0, 0
+        sum_x += p[0]
+        sum_y += p[1]
+        n += 1
+    if n:
+        yield (sum_x // n, (2 * sum_y + n) // (2 * n))
+
+
+DOWNSAMPLERS = {"lttb": lttb, "minmax": minmax, "avg": average}
+
+
+def _ends(points, target):
+    """Keep the first point, and the last one if target allows two"""
+    first = last = None
+    for p in points:
+        if first is None:
+            first = p
+        else:
+            last = p
+    if first is not None and target >= 1:
+        yield first
+    if last is not None and target >= 2:
+        yield last
+
+
+def downsample(points, start, end, target, method="lttb"):
+    """Reduce (x, y) points with x in [start, end] to at most target points.
+
+    minmax and avg divide the range into as many buckets as target allows.
+    Targets too small for the buckets of a method, below 3 for lttb and
+    below 2 for minmax, keep the first and last points. A target of 0 or
+    less keeps no points with any method. Raises KeyError for an unknown
+    method.
+    """
+    sampler = DOWNSAMPLERS[method]
+    if target <= 0:
+        return iter(())
+    if method == "lttb":
+        if target < 3:
+            return _ends(points, target)
+        buckets = target - 2
+    elif method == "minmax":
+        if target < 2:
+            return _ends(points, target)
+        buckets = target // 2
+    else:
+        buckets = target
+    return sampler(points, start, end, buckets)
+
+
+def encode_json(points, first_day, batch=32):
+    """Stream points as a JSON array of [timestamp, ppm] pairs"""
+    yield "["
+    chunk, sep = [], ""
+    for seconds, ppm in points:
+        chunk.append('["%s",%d]' % (timestamp(first_day, seconds), ppm))
+        if len(chunk) >= batch:
+            yield sep + ",".join(chunk)
+            chunk, sep = [], ","
+    if chunk:
+        yield sep + ",".join(chunk)
+    yield "]"
+
+
+def deltas(points, base=0):
+    """Yield (t0, step, v0) for the first point, then (dt - step, dv) for
+    each following point, where dt and dv are the differences to the point
+    before and step is the time between the first two points. Times are
+    offset by base. Regular logs code to runs of small numbers, mostly 0."""
+    prev, step = None, None
+    for t, v in points:
+        if prev is None:
+            prev = (t, v)
+            continue
+        if step is None:
+            step = t - prev[0]
+            yield base + prev[0], step, prev[1]
+        yield t - prev[0] - step, v - prev[1]
+        prev = (t, v)
+    if prev is not None and step is None:
+        yield base + prev[0], 0, prev[1]
+
+
+def encode_delta(points, first_day, batch=64):
+    """Stream points as delta-coded JSON, with Unix times:
+    {"t0": time, "step": seconds, "v0": ppm, "d": [dt - step, dv, ...]}.
+    A series without points is {}."""
+    opened = False
+    chunk, sep = [], ""
+    for d in deltas(points, first_day * SECONDS_PER_DAY):
+        if not opened:
+            yield '{"t0":%d,"step":%d,"v0":%d,"d":[' % d
+            opened = True
+            continue
+        chunk.append("%d,%d" % d)
+        if len(chunk) >= batch:
+            yield sep + ",".join(chunk)
+            chunk, sep = [], ","
+    if chunk:
+        yield sep + ",".join(chunk)
+    yield "]}" if opened else "{}"
+
+
+def _varint(buf, n):
+    """Append n as a zigzag-coded LEB128 varint"""
+    n = n << 1 if n >= 0 else (-n << 1) - 1
+    while n > 0x7F:
+        buf.append(n & 0x7F | 0x80)
+        n >>= 7
+    buf.append(n)
+
+
+def encode_binary(points, first_day, batch=256):
+    """Stream points as delta-coded binary: a little-endian uint32 t0 (Unix
+    time), int32 step and uint16 v0, followed by a zigzag varint pair
+    (dt - step, dv) per point, mostly one byte each. A series without
+    points is empty."""
+    buf = bytearray()
+    for d in deltas(points, first_day * SECONDS_PER_DAY):
+        if len(d) == 3:
+            yield struct.pack("<IiH", *d)
+            continue
+        _varint(buf, d[0])
+        _varint(buf, d[1])
+        if len(buf) >= batch:
+            yield bytes(buf)
+            buf = bytearray()
+    if buf:
+        yield bytes(buf)
+
+
+# format -> (encoder, Content-Type)
+FORMATS = {
+    "json": (encode_json, "application/json"),
+    "delta": (encode_delta, "application/json"),
+    "bin": (encode_binary, "application/octet-stream"),
+}
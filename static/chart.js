@@ -0,0 +1,284 @@
+// CO2 chart renderer. The page provides the series either inline in a
+// <script id="series" type="application/json"> element (static previews) or
+// through the data-src attribute of the SVG element (the device). The series
+// API may answer with [timestamp, ppm] pairs or with the delta-coded JSON or
+// binary formats of series.py, which are decoded to pairs.
+(function(){
+    const svg = document.getElementById("spark");
+    const W = +svg.getAttribute("width"), H = +svg.getAttribute("height");
+    const isWeekly = svg.dataset.weekly === "1";
+    const chartTitle = svg.dataset.title;
+    const marginX = isWeekly ? 80 : 60, marginY = 40;
+    const innerW = W - 2 * marginX, innerH = H - 2 * marginY;
+
+    // Fixed CO2 reference lines
+    const co2Levels = [500, 1000, 1500, 2000];
+    const maxValue = 2000;
+    const minValue = 0;
+
+    function referenceLines() {
+        // Add horizontal reference lines for CO2 levels
+        const refLines = [];
+        co2Levels.forEach(level => {
+            const y = marginY + innerH - ((level - minValue) / (maxValue - minValue)) * innerH;
+            const line = document.createElementNS(svg.namespaceURI, "line");
+            line.setAttribute("x1", marginX);
+            line.setAttribute("y1", y);
+            line.setAttribute("x2", marginX + innerW);
+            line.setAttribute("y2", y);
+            line.setAttribute("stroke", "#ccc");
+            line.setAttribute("stroke-width", 1);
+            line.setAttribute("stroke-dasharray", "3,3");
+            refLines.push(line);
+
+            // Add labels for reference lines
+            const label = document.createElementNS(svg.namespaceURI, "text");
+            label.setAttribute("x", marginX + innerW + 5);
+            label.setAttribute("y", y + 4);
+            label.setAttribute("fill", "#666");
+            label.textContent = `${level}ppm`;
+            refLines.push(label);
+        });
+        return refLines;
+    }
+
+    function text(x, label) {
+        const txt = document.createElementNS(svg.namespaceURI, "text");
+        txt.setAttribute("x", x);
+        txt.setAttribute("y", H - 15);
+        txt.setAttribute("text-anchor", "middle");
+        txt.textContent = label;
+        return txt;
+    }
+
+    function drawWeekly(data) {
+        const parseDate = (dateStr) => new Date(dateStr.split(' ')[0] + 'T00:00:00Z');
+        const formatDate = (date) => date.toISOString().split('T')[0];
+
+        const firstDate = parseDate(data[0][0]);
+        const lastDate = parseDate(data[data.length - 1][0]);
+
+        const fullDateRange = [];
+        for (let d = new Date(firstDate); d <= lastDate; d.setDate(d.getDate() + 1)) {
+            fullDateRange.push(formatDate(new Date(d)));
+        }
+        const numDays = fullDateRange.length;
+
+        // Create x-axis labels with vertical lines and dates: | 2025-08-08 | 2025-08-09 |
+        // Ranges longer than two weeks only label every few days
+        const every = Math.ceil(numDays / 14);
+        const dateLabels = [];
+        fullDateRange.forEach((dateStr, i) => {
+            // Vertical line at day boundary
+            dateLabels.push(text(marginX + (i * innerW / numDays), "|"));
+            // Date label centered between current and next vertical line
+            if (i % every === 0) {
+                dateLabels.push(text(marginX + ((i + 0.5) * innerW / numDays), dateStr));
+            }
+        });
+        // Add final vertical line at the end
+        dateLabels.push(text(marginX + innerW, "|"));
+
+        // Map measurements to timeline positions using the full date range
+        const dayIndex = {};
+        fullDateRange.forEach((dateStr, i) => { dayIndex[dateStr] = i; });
+        const toPoint = d => {
+            const datePart = d[0].split(' ')[0];
+            const dateIndex = dayIndex[datePart];
+            if (dateIndex === undefined) return '';
+
+            const [hour, minute, second] = d[0].split(' ')[1].split(':').map(Number);
+            const timeFraction = (hour * 3600 + minute * 60 + second) / 86400;
+
+            const x = marginX + ((dateIndex + timeFraction) * innerW / numDays);
+            const y = marginY + innerH - ((d[1] - minValue) / (maxValue - minValue)) * innerH;
+            return `${x},${y}`;
+        };
+        return [toPoint, dateLabels];
+    }
+
+    function drawDaily(data) {
+        const hourLabels = [];
+        for (let i = 0; i < 24; i++) {
+            hourLabels.push(text(marginX + (i * innerW / 23), `${i.toString().padStart(2, '0')}:00`));
+        }
+
+        // Map measurements to timeline positions
+        const toPoint = d => {
+            const [datePart, timePart] = d[0].split(' ');
+            const [hour, minute, second] = timePart.split(':').map(Number);
+            const timeIndex = hour + minute/60 + second/3600;
+            const x = marginX + (timeIndex * innerW / 24);
+            const y = marginY + innerH - ((d[1] - minValue) / (maxValue - minValue)) * innerH;
+            return `${x},${y}`;
+        };
+        return [toPoint, hourLabels];
+    }
+
+    // The drawn series and the mapping of its readings to points
+    let series = [], toPoint = null;
+
+    function draw(data) {
+        series = data;
+        if (!data.length) return;
+        const refLines = referenceLines();
+        let labels;
+        [toPoint, labels] = isWeekly ? drawWeekly(data) : drawDaily(data);
+        const pts = data.map(toPoint).join(" ");
+
+        svg.innerHTML = `<g>
+            ${refLines.map(line => line.outerHTML).join('')}
+            <polyline points="${pts}" stroke="#4caf50" stroke-width="2" fill="none"/>
+        </g>`;
+
+        const title = document.createElementNS(svg.namespaceURI, "text");
+        title.setAttribute("x", W/2);
+        title.setAttribute("y", 25);
+        title.setAttribute("text-anchor", "middle");
+        title.textContent = `CO₂ concentration (ppm) - ${chartTitle}`;
+        svg.appendChild(title);
+
+        // Add date or hour labels
+        labels.forEach(label => svg.appendChild(label));
+    }
+
+    // Several weeks drawn over each other, aligned by weekday and hour
+    const weekdays = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"];
+    const colors = ["#4caf50", "#2196f3", "#ff9800", "#9c27b0"];
+
+    function weekPoint(d) {
+        const date = new Date(d[0].replace(" ", "T") + "Z");
+        const day = (date.getUTCDay() + 6) % 7;
+        const seconds = date.getUTCHours() * 3600 + date.getUTCMinutes() * 60 + date.getUTCSeconds();
+        const x = marginX + ((day + seconds / 86400) * innerW / 7);
+        const y = marginY + innerH - ((d[1] - minValue) / (maxValue - minValue)) * innerH;
+        return `${x},${y}`;
+    }
+
+    function drawOverlay(weeks) {
+        const refLines = referenceLines();
+        svg.innerHTML = `<g>
+            ${refLines.map(line => line.outerHTML).join('')}
+            ${weeks.map(([label, data], i) =>
+                `<polyline points="${data.map(weekPoint).join(" ")}" style="stroke:${colors[i % colors.length]}"/>`
+            ).join('')}
+        </g>`;
+
+        const title = text(W / 2, `CO₂ concentration (ppm) - ${chartTitle}`);
+        title.setAttribute("y", 20);
+        svg.appendChild(title);
+
+        // Legend in the colors of the weeks, centered under the title
+        weeks.forEach(([label], i) => {
+            const item = text(W / 2 + (i - (weeks.length - 1) / 2) * 110, `— ${label}`);
+            item.setAttribute("y", 36);
+            item.setAttribute("style", `fill:${colors[i % colors.length]}`);
+            svg.appendChild(item);
+        });
+
+        weekdays.forEach((name, i) => {
+            svg.appendChild(text(marginX + (i * innerW / 7), "|"));
+            svg.appendChild(text(marginX + ((i + 0.5) * innerW / 7), name));
+        });
+        svg.appendChild(text(marginX + innerW, "|"));
+    }
+
+    const stamp = t => new Date(t * 1000).toISOString().slice(0, 19).replace("T", " ");
+
+    // {"t0": time, "step": seconds, "v0": ppm, "d": [dt - step, dv, ...]}
+    function decodeDelta(s) {
+        if (s.t0 === undefined) return [];
+        let t = s.t0, v = s.v0;
+        const data = [[stamp(t), v]];
+        for (let i = 0; i < s.d.length; i += 2) {
+            t += s.step + s.d[i];
+            v += s.d[i + 1];
+            data.push([stamp(t), v]);
+        }
+        return data;
+    }
+
+    // uint32 t0, int32 step, uint16 v0, then zigzag varint (dt - step, dv) pairs
+    function decodeBinary(buf) {
+        if (buf.byteLength < 10) return [];
+        const view = new DataView(buf), bytes = new Uint8Array(buf);
+        let t = view.getUint32(0, true), v = view.getUint16(8, true), i = 10;
+        const step = view.getInt32(4, true);
+        const varint = () => {
+            let n = 0, scale = 1, b;
+            do {
+                b = bytes[i++];
+                n += (b & 0x7f) * scale;
+                scale *= 128;
+            } while (b & 0x80);
+            return n % 2 ? -(n + 1) / 2 : n / 2;
+        };
+        const data = [[stamp(t), v]];
+        while (i < bytes.length) {
+            t += step + varint();
+            v += varint();
+            data.push([stamp(t), v]);
+        }
+        return data;
+    }
+
+    function load(r) {
+        if (r.headers.get("Content-Type") === "application/octet-stream") {
+            return r.arrayBuffer().then(decodeBinary);
+        }
+        return r.json().then(s => Array.isArray(s) ? s : decodeDelta(s));
+    }
+
+    // Add readings logged after the drawn ones. Points are appended to the
+    // polyline unless a reading starts a new day, which widens the x axis.
+    function append(rows) {
+        if (!rows.length) return;
+        const polyline = svg.querySelector("polyline");
+        const newDay = isWeekly && series.length &&
+            rows[rows.length - 1][0].split(' ')[0] > series[series.length - 1][0].split(' ')[0];
+        if (!polyline || newDay) {
+            draw(series.concat(rows));
+            return;
+        }
+        series = series.concat(rows);
+        polyline.setAttribute("points",
+            polyline.getAttribute("points") + " " + rows.map(toPoint).join(" "));
+    }
+
+    // Poll the readings API from the cursor of the last response, a 409
+    // means the log was truncated or replaced and the page must reload.
+    // Polling stops with the last rows of a log closed by the week's end.
+    function poll(cursor) {
+        setTimeout(() => {
+            fetch(`${svg.dataset.readings}&since=${cursor}`).then(r => {
+                if (r.status === 409) return location.reload();
+                if (!r.ok) return poll(cursor);
+                const next = r.headers.get("X-Cursor");
+                const closed = r.headers.get("X-Log-Closed") !== null;
+                return load(r).then(rows => {
+                    append(rows);
+                    if (!closed) poll(next);
+                });
+            }).catch(() => poll(cursor));
+        }, svg.dataset.poll * 1000);
+    }
+
+    const inline = document.getElementById("series");
+    const overlay = document.getElementById("overlay");
+    if (overlay) {
+        // One week at a time, the device serves one series request at once
+        const weeks = [];
+        JSON.parse(overlay.textContent).reduce((done, [label, url]) =>
+            done.then(() => fetch(url).then(load).then(data => { weeks.push([label, data]); })),
+            Promise.resolve()
+        ).then(() => drawOverlay(weeks));
+    } else if (inline) {
+        draw(JSON.parse(inline.textContent));
+    } else {
+        fetch(svg.dataset.src).then(r => {
+            const cursor = r.headers.get("X-Cursor");
+            if (svg.dataset.readings && cursor !== null) poll(cursor);
+            return load(r);
+        }).then(draw);
+    }
+})();
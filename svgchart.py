@@ -0,0 +1,105 @@
+"""
+Server-side SVG chart of a CO2 log file.
+
+Draws the same chart as static/chart.js, but on the device: the polyline
+points, reference lines and axis labels are computed as integers and
+streamed from the CSV while the page is written, so the client renders the
+final SVG without running any JavaScript. The file is read twice: once for
+its first and last rows, which fix the x axis, and once row by row for the
+points, so memory use does not grow with the length of the log. Points
+can be downsampled on the way to about one per pixel of the plot.
+"""
+
+from series import day_string, read, span
+
+WIDTH = 1000
+HEIGHT = 600
+MARGIN_Y = 40
+MAX_PPM = 2000
+LEVELS = (500, 1000, 1500, 2000)
+
+
+class SvgChart:
+    """Geometry and points of the chart of one log file.
+
+    :param path: The ``time,co2`` CSV file to draw.
+    :param weekly: Draw a weekly chart with one column per day from the
+                   first to the last logged date, otherwise a daily chart
+                   over 24 hours.
+    :param target: Downsample the readings to about this many points with
+                   ``series.downsample()``, ``None`` to draw them all.
+    :param method: The downsampling method, ``lttb``, ``minmax`` or ``avg``.
+    :param batch: Number of points joined into each chunk yielded by
+                  :meth:`points`.
+
+    ``references`` lists the ``(y, ppm)`` reference lines and ``labels`` the
+    ``(x, text)`` labels of the x axis. Both are empty when the file holds
+    no readings, in which case nothing should be drawn.
+    """
+
+    def __init__(self, path, weekly=True, target=None, method="lttb",
+                 batch=32):
+        self.path = path
+        self.weekly = weekly
+        self.target = target
+        self.method = method
+        self.batch = batch
+        self.width = WIDTH
+        self.height = HEIGHT
+        self.margin_x = 80 if weekly else 60
+        self.margin_y = MARGIN_Y
+        self.inner_w = WIDTH - 2 * self.margin_x
+        self.inner_h = HEIGHT - 2 * MARGIN_Y
+        self.right = self.margin_x + self.inner_w
+        self.label_y = HEIGHT - 15
+        self.first_day = 0
+        self.num_days = 1
+        self.references = []
+        self.labels = []
+
+        days = span(path)
+        if days is None:
+            return
+        self.first_day = days[0]
+        if weekly:
+            self.num_days = days[1]
+        self.references = [(self.y(level), level) for level in LEVELS]
+        self.labels = self.axis_labels()
+
+    def y(self, ppm):
+        return self.margin_y + self.inner_h - ppm * self.inner_h // MAX_PPM
+
+    def axis_labels(self):
+        x0, w = self.margin_x, self.inner_w
+        if not self.weekly:
+            return [(x0 + hour * w // 24, f"{hour:02d}:00")
+                    for hour in range(24)]
+        # | 2025-08-08 | 2025-08-09 | with one column per day
+        n = self.num_days
+        labels = []
+        for i in range(n):
+            labels.append((x0 + i * w // n, "|"))
+            labels.append((x0 + (2 * i + 1) * w // (2 * n),
+                           day_string(self.first_day + i)))
+        labels.append((self.right, "|"))
+        return labels
+
+    def points(self):
+        """Yield the polyline points as strings of ``x,y`` pairs"""
+        if not self.references:
+            return
+        points = read(self.path, self.first_day, self.num_days, self.target,
+                      self.method)
+        # Positions are computed in minutes so that the products stay small
+        # integers on MicroPython
+        span_minutes = self.num_days * 1440
+        x0, w = self.margin_x, self.inner_w
+        chunk = []
+        for seconds, ppm in points:
+            x = x0 + seconds // 60 * w // span_minutes
+            chunk.append(f"{x},{self.y(ppm)}")
+            if len(chunk) >= self.batch:
+                yield " ".join(chunk) + " "
+                chunk = []
+        if chunk:
+            yield " ".join(chunk)
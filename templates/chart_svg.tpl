@@ -0,0 +1,26 @@
+{% args title: str = "CO2 Chart", chart=None, static_url: str = "/static" %}
+<!DOCTYPE html>
+<html>
+<head>
+    <meta charset="utf-8"/>
+    <title>{{title}}</title>
+    <link rel="stylesheet" href="{{static_url}}/chart.css?v=1">
+</head>
+<body>
+    <svg id="spark" width="1000" height="600">
+    {% if chart and chart.references %}
+        <g>
+        {% for y, level in chart.references %}
+            <line x1="{{chart.margin_x}}" y1="{{y}}" x2="{{chart.right}}" y2="{{y}}" stroke="#ccc" stroke-width="1" stroke-dasharray="3,3"/>
+            <text x="{{chart.right + 5}}" y="{{y + 4}}" fill="#666">{{level}}ppm</text>
+        {% endfor %}
+            <polyline points="{% for points in chart.points() %}{{points}}{% endfor %}" stroke="#4caf50" stroke-width="2" fill="none"/>
+        </g>
+        <text x="{{chart.width // 2}}" y="25" text-anchor="middle">CO₂ concentration (ppm) - {{title}}</text>
+        {% for x, label in chart.labels %}
+        <text x="{{x}}" y="{{chart.label_y}}" text-anchor="middle">{{label}}</text>
+        {% endfor %}
+    {% endif %}
+    </svg>
+</body>
+</html>
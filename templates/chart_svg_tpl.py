@@ -0,0 +1,42 @@
+# Autogenerated file
+def render(title: str = "CO2 Chart", chart=None, static_url: str = "/static"):
+    yield b'<!DOCTYPE html><html><head><meta charset="utf-8"/><title>'
+    yield title.encode()
+    yield b'</title><link rel="stylesheet" href="'
+    yield static_url.encode()
+    yield b'/chart.css?v=1"></head><body><svg id="spark" width="1000" height="600">'
+    if chart and chart.references:
+        yield b'<g>'
+        for y, level in chart.references:
+            yield b'<line x1="'
+            yield str(chart.margin_x).encode()
+            yield b'" y1="'
+            yield str(y).encode()
+            yield b'" x2="'
+            yield str(chart.right).encode()
+            yield b'" y2="'
+            yield str(y).encode()
+            yield b'" stroke="#ccc" stroke-width="1" stroke-dasharray="3,3"/><text x="'
+            yield str(chart.right + 5).encode()
+            yield b'" y="'
+            yield str(y + 4).encode()
+            yield b'" fill="#666">'
+            yield str(level).encode()
+            yield b'ppm</text>'
+        yield b'<polyline points="'
+        for points in chart.points():
+            yield str(points).encode()
+        yield b'" stroke="#4caf50" stroke-width="2" fill="none"/></g><text x="'
+        yield str(chart.width // 2).encode()
+        yield b'" y="25" text-anchor="middle">CO\xe2\x82\x82 concentration (ppm) - '
+        yield title.encode()
+        yield b'</text>'
+        for x, label in chart.labels:
+            yield b'<text x="'
+            yield str(x).encode()
+            yield b'" y="'
+            yield str(chart.label_y).encode()
+            yield b'" text-anchor="middle">'
+            yield str(label).encode()
+            yield b'</text>'
+    yield b'</svg></body></html>\n'
@@ -1,4 +1,4 @@
-{% args current_co2=None, last_measurement_time="", current_time="", log_files=[] %}
+{% args current_co2=None, last_measurement_time: str = "", current_time: str = "", log_files=[] %}
 <!DOCTYPE html>
 <html>
 <head>
@@ -131,9 +131,9 @@
         <h1>CO2 Monitor</h1>
         
         {% if current_co2 is not None %}
-        <div class="co2-display {% if current_co2 > 1500 %}danger{% elif current_co2 > 1000 %}warning{% endif %}">
-            <div class="co2-value">{{current_co2}} ppm</div>
-            <div class="co2-status">
+        <div id="co2-display" class="co2-display {% if current_co2 > 1500 %}danger{% elif current_co2 > 1000 %}warning{% endif %}">
+            <div id="co2-value" class="co2-value">{{current_co2}} ppm</div>
+            <div id="co2-status" class="co2-status">
                 {% if current_co2 > 1500 %}
                 🚨 Action Required
                 {% elif current_co2 > 1000 %}
@@ -142,10 +142,10 @@
                 👍 Excellent
                 {% endif %}
             </div>
-            <meter value="{{current_co2}}" min="400" max="1500" optimum="450" high="800">{{current_co2}} ppm</meter>
+            <meter id="co2-meter" value="{{current_co2}}" min="400" max="1500" optimum="450" high="800">{{current_co2}} ppm</meter>
             
             <ul class="details">
-                <li>Updated: {{last_measurement_time}}</li>
+                <li>Updated: <span id="co2-updated">{{last_measurement_time}}</span></li>
                 <li>Current time: {{current_time}}</li>
                 <li>Sensor: <a href="https://sensirion.com/products/catalog/SCD40">SCD40</a></li>
             </ul>
@@ -158,7 +158,12 @@
         {% endif %}
 
 
+        {% cache log_files 300 %}
         <h2>Data Files</h2>
+        <p class="actions">
+            <a href="/range" class="chart">Last 4 weeks</a>
+            <a href="/overlay" class="chart">This week vs last week</a>
+        </p>
         <div class="table-container">
             <table>
                 <tr>
@@ -173,6 +178,7 @@
                     <td class="actions">
                         <a href="/download/{{filename}}" class="download">Download</a>
                         <a href="/spark/{{filename}}" class="chart">Chart</a>
+                        <a href="/svg/{{filename}}" class="chart">SVG</a>
                     </td>
                 </tr>
                 {% endfor %}
@@ -184,6 +190,31 @@
             <p>No data files available yet</p>
         </div>
         {% endif %}
+        {% endcache %}
     </div>
+    <script>
+        (function() {
+            if (!window.EventSource) return;
+            const source = new EventSource("/events");
+            source.addEventListener("co2", (e) => {
+                const m = JSON.parse(e.data);
+                const display = document.getElementById("co2-display");
+                if (!display) {
+                    // first reading since the page was rendered
+                    location.reload();
+                    return;
+                }
+                const level = m.co2 > 1500 ? 2 : m.co2 > 1000 ? 1 : 0;
+                display.className = "co2-display " + ["", "warning", "danger"][level];
+                document.getElementById("co2-value").textContent = m.co2 + " ppm";
+                document.getElementById("co2-status").textContent =
+                    ["👍 Excellent", "💨 Increase Ventilation", "🚨 Action Required"][level];
+                const meter = document.getElementById("co2-meter");
+                meter.value = m.co2;
+                meter.textContent = m.co2 + " ppm";
+                document.getElementById("co2-updated").textContent = m.timestamp;
+            });
+        })();
+    </script>
 </body>
 </html>
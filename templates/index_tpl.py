@@ -1,250 +1,55 @@
 # Autogenerated file
-def render(current_co2=None, last_measurement_time="", current_time="", log_files=[]):
-    yield """<!DOCTYPE html>
-<html>
-<head>
-    <title>CO2 Monitor</title>
-    <meta charset=\"utf-8\">
-    <meta name=\"viewport\" content=\"width=device-width, initial-scale=1\">
-    <style>
-        body """
-    yield """{ 
-            font-family: sans-serif; 
-            margin: 20px; 
-            background: #f5f5f5;
-        }
-        .container """
-    yield """{ 
-            max-width: 800px; 
-            margin: 0 auto; 
-            background: white; 
-            padding: 20px;
-            border-radius: 5px;
-        }
-        h1 """
-    yield """{ 
-            color: #333; 
-            margin: 0 0 10px 0;
-        }
-        .co2-display """
-    yield """{
-            background: white;
-            text-align: center;
-            padding: 15px;
-            margin: 10px 0;
-            border: 2px solid #4caf50;
-            border-radius: 5px;
-        }
-        .co2-display.warning """
-    yield """{
-            border-color: #FFA500;
-        }
-        .co2-display.danger """
-    yield """{
-            border-color: #d32f2f;
-            border-width: 3px;
-        }
-        .co2-value """
-    yield """{
-            font-size: 2.5em;
-            font-weight: bold;
-            margin: 5px 0;
-            color: #000000;
-        }
-        .co2-status """
-    yield """{
-            font-size: 1.1em;
-            margin: 5px 0;
-        }
-        meter """
-    yield """{
-            width: 200px;
-            height: 20px;
-        }
-        .details """
-    yield """{
-            list-style: none;
-            padding: 10px 0;
-            margin: 0;
-            font-size: 0.9em;
-            color: #666;
-        }
-        .details li """
-    yield """{
-            margin: 3px 0;
-        }
-        a """
-    yield """{
-            color: #4caf50;
-            text-decoration: none;
-        }
-        a:hover """
-    yield """{
-            text-decoration: underline;
-        }
-        h2 """
-    yield """{
-            color: #333;
-            margin: 20px 0 10px 0;
-            font-size: 1.2em;
-        }
-        .table-container """
-    yield """{
-            overflow-x: auto;
-            margin: 10px 0;
-        }
-        table """
-    yield """{
-            width: 100%;
-            min-width: 600px;
-            border-collapse: collapse;
-            background: white;
-        }
-        th """
-    yield """{
-            font-weight: bold;
-            border-bottom: 2px solid #ddd;
-            padding: 10px;
-            text-align: left;
-        }
-        td """
-    yield """{
-            padding: 10px;
-            border-bottom: 1px solid #ddd;
-        }
-        .actions a """
-    yield """{
-            display: inline-block;
-            padding: 4px 8px;
-            margin: 1px;
-            font-size: 0.8em;
-            border-radius: 3px;
-            white-space: nowrap;
-            border-bottom: 1px solid #ddd;
-            background: #f0f0f0;
-            color: #333;
-        }
-        .actions a:hover """
-    yield """{
-          text-decoration: none;
-          background: #ddd;
-        }
-
-        .download """
-    yield """{ background: #999; color: white; }
-        .delete """
-    yield """{ background: #999; color: white; }
-        .chart """
-    yield """{ background: #999; color: white; }
-        .waiting """
-    yield """{
-            text-align: center;
-            padding: 20px;
-            color: #666;
-            font-style: italic;
-        }
-        @media (max-width: 600px) """
-    yield """{
-            body """
-    yield """{ margin: 10px; }
-            .container """
-    yield """{ padding: 15px; }
-            .co2-value """
-    yield """{ font-size: 2em; }
-            meter """
-    yield """{ width: 150px; }
-        }
-    </style>
-</head>
-<body>
-    <div class=\"container\">
-        <h1>CO2 Monitor</h1>
-        
-        """
+def render(current_co2=None, last_measurement_time: str = "", current_time: str = "", log_files=[]):
+    yield b'<!DOCTYPE html><html><head><title>CO2 Monitor</title><meta charset="utf-8"><meta name="viewport" content="width=device-width, initial-scale=1"><style>body{font-family:sans-serif;margin:20px;background:#f5f5f5}.container{max-width:800px;margin:0 auto;background:white;padding:20px;border-radius:5px}h1{color:#333;margin:0 0 10px 0}.co2-display{background:white;text-align:center;padding:15px;margin:10px 0;border:2px solid #4caf50;border-radius:5px}.co2-display.warning{border-color:#FFA500}.co2-display.danger{border-color:#d32f2f;border-width:3px}.co2-value{font-size:2.5em;font-weight:bold;margin:5px 0;color:#000000}.co2-status{font-size:1.1em;margin:5px 0}meter{width:200px;height:20px}.details{list-style:none;padding:10px 0;margin:0;font-size:0.9em;color:#666}.details li{margin:3px 0}a{color:#4caf50;text-decoration:none}a:hover{text-decoration:underline}h2{color:#333;margin:20px 0 10px 0;font-size:1.2em}.table-container{overflow-x:auto;margin:10px 0}table{width:100%;min-width:600px;border-collapse:collapse;background:white}th{font-weight:bold;border-bottom:2px solid #ddd;padding:10px;text-align:left}td{padding:10px;border-bottom:1px solid #ddd}.actions a{display:inline-block;padding:4px 8px;margin:1px;font-size:0.8em;border-radius:3px;white-space:nowrap;border-bottom:1px solid #ddd;background:#f0f0f0;color:#333}.actions a:hover{text-decoration:none;background:#ddd}.download{background:#999;color:white}.delete{background:#999;color:white}.chart{background:#999;color:white}.waiting{text-align:center;padding:20px;color:#666;font-style:italic}@media (max-width:600px){body{margin:10px}.container{padding:15px}.co2-value{font-size:2em}meter{width:150px}}</style></head><body><div class="container"><h1>CO2 Monitor</h1>'
     if current_co2 is not None:
-        yield """        <div class=\"co2-display """
+        yield b'<div id="co2-display" class="co2-display '
         if current_co2 > 1500:
-            yield """danger"""
+            yield b'danger'
         elif current_co2 > 1000:
-            yield """warning"""
-        yield """\">
-            <div class=\"co2-value\">"""
-        yield str(current_co2)
-        yield """ ppm</div>
-            <div class=\"co2-status\">
-                """
+            yield b'warning'
+        yield b'"><div id="co2-value" class="co2-value">'
+        yield str(current_co2).encode()
+        yield b' ppm</div><div id="co2-status" class="co2-status">'
         if current_co2 > 1500:
-            yield """                🚨 Action Required
-                """
+            yield b'\xf0\x9f\x9a\xa8 Action Required '
         elif current_co2 > 1000:
-            yield """                💨 Increase Ventilation
-                """
+            yield b' \xf0\x9f\x92\xa8 Increase Ventilation '
         else:
-            yield """                👍 Excellent
-                """
-        yield """            </div>
-            <meter value=\""""
-        yield str(current_co2)
-        yield """\" min=\"400\" max=\"1500\" optimum=\"450\" high=\"800\">"""
-        yield str(current_co2)
-        yield """ ppm</meter>
-            
-            <ul class=\"details\">
-                <li>Updated: """
-        yield str(last_measurement_time)
-        yield """</li>
-                <li>Current time: """
-        yield str(current_time)
-        yield """</li>
-                <li>Sensor: <a href=\"https://sensirion.com/products/catalog/SCD40\">SCD40</a></li>
-            </ul>
-        </div>
-        """
+            yield b' \xf0\x9f\x91\x8d Excellent'
+        yield b'</div><meter id="co2-meter" value="'
+        yield str(current_co2).encode()
+        yield b'" min="400" max="1500" optimum="450" high="800">'
+        yield str(current_co2).encode()
+        yield b' ppm</meter><ul class="details"><li>Updated: <span id="co2-updated">'
+        yield last_measurement_time.encode()
+        yield b'</span></li><li>Current time: '
+        yield current_time.encode()
+        yield b'</li><li>Sensor: <a href="https://sensirion.com/products/catalog/SCD40">SCD40</a></li></ul></div>'
     else:
-        yield """        <div class=\"waiting\">
-            <div class=\"co2-value\">⏳</div>
-            <p>Waiting for first CO2 reading...</p>
-        </div>
-        """
-    yield """
-
-        <h2>Data Files</h2>
-        <div class=\"table-container\">
-            <table>
-                <tr>
-                    <th>Filename</th>
-                    <th>Size</th>
-                    <th>Actions</th>
-                </tr>
-                """
-    for filename, size in log_files:
-        yield """                <tr>
-                    <td>"""
-        yield str(filename)
-        yield """</td>
-                    <td>"""
-        yield str(size)
-        yield """ bytes</td>
-                    <td class=\"actions\">
-                        <a href=\"/download/"""
-        yield str(filename)
-        yield """\" class=\"download\">Download</a>
-                        <a href=\"/spark/"""
-        yield str(filename)
-        yield """\" class=\"chart\">Chart</a>
-                    </td>
-                </tr>
-                """
-    yield """            </table>
-        </div>
-        
-        """
-    if not log_files:
-        yield """        <div class=\"waiting\">
-            <p>No data files available yet</p>
-        </div>
-        """
-    yield """    </div>
-</body>
-</html>
-"""
+        yield b'<div class="waiting"><div class="co2-value">\xe2\x8f\xb3</div><p>Waiting for first CO2 reading...</p></div>'
+    from utemplate import fragments as _fragments
+    _k1 = log_files
+    _f1 = _fragments.store.get((__name__, 0, 1), _k1)
+    if _f1 is None:
+        def _frag1():
+            yield b''
+            yield b'<h2>Data Files</h2><p class="actions"><a href="/range" class="chart">Last 4 weeks</a> <a href="/overlay" class="chart">This week vs last week</a></p><div class="table-container"><table><tr><th>Filename</th><th>Size</th><th>Actions</th></tr>'
+            for filename, size in log_files:
+                yield b'<tr><td>'
+                yield str(filename).encode()
+                yield b'</td><td>'
+                yield str(size).encode()
+                yield b' bytes</td><td class="actions"><a href="/download/'
+                yield str(filename).encode()
+                yield b'" class="download">Download</a> <a href="/spark/'
+                yield str(filename).encode()
+                yield b'" class="chart">Chart</a> <a href="/svg/'
+                yield str(filename).encode()
+                yield b'" class="chart">SVG</a></td></tr>'
+            yield b'</table></div>'
+            if not log_files:
+                yield b'<div class="waiting"><p>No data files available yet</p></div>'
+        yield from _fragments.store.capture((__name__, 0, 1), _k1, _frag1(), 300)
+    else:
+        yield _f1
+    yield b'</div><script>(function(){if(!window.EventSource)return;const source=new EventSource("/events");source.addEventListener("co2",(e)=>{const m=JSON.parse(e.data);const display=document.getElementById("co2-display");if(!display){location.reload();return;}\nconst level=m.co2>1500?2:m.co2>1000?1:0;display.className="co2-display " +["","warning","danger"][level];document.getElementById("co2-value").textContent=m.co2 + " ppm";document.getElementById("co2-status").textContent=["\xf0\x9f\x91\x8d Excellent","\xf0\x9f\x92\xa8 Increase Ventilation","\xf0\x9f\x9a\xa8 Action Required"][level];const meter=document.getElementById("co2-meter");meter.value=m.co2;meter.textContent=m.co2 + " ppm";document.getElementById("co2-updated").textContent=m.timestamp;});})();</script></body></html>\n'
@@ -1,3 +1,6 @@
+import sys
+
+
 class Loader:
 
     def __init__(self, pkg, dir):
@@ -8,7 +11,24 @@ class Loader:
         if pkg and pkg != "__main__":
             dir = pkg + "." + dir
         self.p = dir
+        # template name -> render function, so that a page view is a dict
+        # lookup instead of an import
+        self.renders = {}
 
     def load(self, name):
-        name = name.replace(".", "_")
-        return __import__(self.p + name, None, None, (name,)).render
+        try:
+            return self.renders[name]
+        except KeyError:
+            pass
+        mod = name.replace(".", "_")
+        render = __import__(self.p + mod, None, None, (mod,)).render
+        self.renders[name] = render
+        return render
+
+    def invalidate(self, name=None):
+        # Forget a loaded template (all of them if name is None), so that
+        # the next load imports its compiled module again
+        names = list(self.renders) if name is None else [name]
+        for name in names:
+            self.renders.pop(name, None)
+            sys.modules.pop(self.p + name.replace(".", "_"), None)
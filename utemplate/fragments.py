@@ -0,0 +1,23 @@
+# Store of rendered template fragments for the {% cache key ttl %} directive.
+#
+# Compiled templates look up the current value of `store` on every render,
+# so an application (or a test inspecting hit rates) can replace it with a
+# FragmentStore of another size or any object with the same get() and
+# capture() (put() for templates compiled with optimize=False).
+from pagecache import LRUCache
+
+
+class FragmentStore(LRUCache):
+    """A bounded LRU of rendered fragments.
+
+    Each fragment keeps only its latest rendering, together with the value
+    of its key expression. A lookup misses when the key changed or the
+    fragment's ttl (in seconds, None for no expiry) ran out. A fragment
+    larger than max_bytes is streamed without being stored.
+    """
+
+    def __init__(self, max_entries=8, max_bytes=4096):
+        super().__init__(max_bytes, max_entries=max_entries)
+
+
+store = FragmentStore()
@@ -3,12 +3,24 @@ try:
     from uos import stat, remove
 except:
     from os import stat, remove
+from time import time
 from . import source
 
 
 class Loader(source.Loader):
 
+    # check_interval is the number of seconds between checks of a
+    # template's source against its compiled module, 0 checks on every load
+    def __init__(self, pkg, dir, check_interval=2):
+        super().__init__(pkg, dir)
+        self.check_interval = check_interval
+        self.checked = {}
+
     def load(self, name):
+        now = time()
+        if name in self.renders and now - self.checked.get(name, now) < self.check_interval:
+            return self.renders[name]
+        self.checked[name] = now
         o_path = self.pkg_path + self.compiled_path(name)
         i_path = self.pkg_path + self.dir + "/" + name
         try:
@@ -17,5 +29,6 @@ class Loader(source.Loader):
             if i_stat[8] > o_stat[8]:
                 # input file is newer, remove output to force recompile
                 remove(o_path)
+                self.invalidate(name)
         finally:
             return super().load(name)
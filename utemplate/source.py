@@ -10,7 +10,17 @@ class Compiler:
     EXPR = "{"
     EXPR_END = "}}"
 
-    def __init__(self, file_in, file_out, indent=0, seq=0, loader=None):
+    # literal whitespace is kept as is inside these elements
+    PRESERVE_TAGS = ("pre", "textarea")
+
+    # With optimize=True (the default) the generated code yields bytes:
+    # adjacent literals are merged into a single pre-encoded constant with
+    # insignificant whitespace removed, and expressions naming an argument
+    # annotated as str in {% args %}, e.g. {% args title: str = "" %}, are
+    # encoded without a str() call. Any other expression is yielded as
+    # str(e).encode(). optimize=False generates the stock code that yields
+    # str.
+    def __init__(self, file_in, file_out, indent=0, seq=0, loader=None, optimize=True):
         self.file_in = file_in
         self.file_out = file_out
         self.loader = loader
@@ -20,6 +30,14 @@ class Compiler:
         self.in_literal = False
         self.flushed_header = False
         self.args = "*a, **d"
+        self.optimize = optimize
+        self.pending = []
+        self.after_newline = False
+        self.preserve = False
+        self.str_args = set()
+        self.fn_seq = seq
+        self.fragments = 0
+        self.cache_stack = []
 
     def indent(self, adjust=0):
         if not self.flushed_header:
@@ -32,6 +50,9 @@ class Compiler:
     def literal(self, s):
         if not s:
             return
+        if self.optimize:
+            self.pending.append(s)
+            return
         if not self.in_literal:
             self.indent()
             self.file_out.write('yield """')
@@ -43,18 +64,92 @@ class Compiler:
             self.file_out.write('"""\n')
         self.in_literal = False
 
+    def flush_literal(self):
+        if not self.pending:
+            return
+        s = "".join(self.pending)
+        self.pending = []
+        preserve = self.preserve
+        self.update_preserve(s)
+        if not (preserve or self.preserve):
+            if self.after_newline:
+                s = s.lstrip(" \t\n")
+            s = self.strip_whitespace(s)
+        if not s:
+            return
+        self.after_newline = s.endswith("\n")
+        self.indent()
+        self.file_out.write("yield %r\n" % s.encode())
+
+    def update_preserve(self, s):
+        s = s.lower()
+        for tag in self.PRESERVE_TAGS:
+            start = s.rfind("<" + tag)
+            if start != -1 and start > s.rfind("</" + tag):
+                self.preserve = True
+                return
+            if s.rfind("</" + tag) != -1:
+                self.preserve = False
+
+    @staticmethod
+    def strip_whitespace(s):
+        # Replace every run of whitespace that contains a newline by a
+        # single newline, which HTML, CSS and JS (for automatic semicolon
+        # insertion) all treat the same as the original run
+        lines = s.split("\n")
+        if len(lines) == 1:
+            return s
+        out = [lines[0].rstrip(" \t")]
+        for line in lines[1:-1]:
+            line = line.strip(" \t")
+            if line:
+                out.append(line)
+        out.append(lines[-1].lstrip(" \t"))
+        return "\n".join(out)
+
     def render_expr(self, e):
+        if self.optimize:
+            self.flush_literal()
+            self.after_newline = False
+            self.indent()
+            if e in self.str_args:
+                self.file_out.write("yield " + e + ".encode()\n")
+            else:
+                self.file_out.write("yield str(" + e + ").encode()\n")
+            return
         self.indent()
         self.file_out.write('yield str(' + e + ')\n')
 
+    @staticmethod
+    def string_args(args):
+        names = set()
+        for arg in args.split(","):
+            name, sep, annotation = arg.partition("=")[0].partition(":")
+            if sep and annotation.strip() == "str":
+                names.add(name.strip())
+        return names
+
+    def rebind(self, targets):
+        for name in targets.split(","):
+            self.str_args.discard(name.strip(" ()"))
+
     def parse_statement(self, stmt):
         tokens = stmt.split(None, 1)
-        if tokens[0] == "args":
+        if self.optimize:
+            self.flush_literal()
+        if tokens[0] == "cache":
+            self.open_cache(tokens[1])
+        elif stmt == "endcache":
+            self.close_cache()
+        elif tokens[0] == "args":
             if len(tokens) > 1:
                 self.args = tokens[1]
             else:
                 self.args = ""
+            if self.optimize:
+                self.str_args = self.string_args(self.args)
         elif tokens[0] == "set":
+            self.rebind(stmt[3:].split("=", 1)[0])
             self.indent()
             self.file_out.write(stmt[3:].strip() + "\n")
         elif tokens[0] == "include":
@@ -75,7 +170,8 @@ class Compiler:
 
             with self.loader.input_open(tokens[0][1:-1]) as inc:
                 self.seq += 1
-                c = Compiler(inc, self.file_out, len(self.stack) + self._indent, self.seq)
+                c = Compiler(inc, self.file_out, len(self.stack) + self._indent, self.seq,
+                             optimize=self.optimize)
                 inc_id = self.seq
                 self.seq = c.compile()
             self.indent()
@@ -86,6 +182,8 @@ class Compiler:
                 self.indent(-1)
                 self.file_out.write(stmt + ":\n")
             else:
+                if tokens[0] == "for":
+                    self.rebind(tokens[1].split(" in ", 1)[0])
                 self.indent()
                 self.file_out.write(stmt + ":\n")
                 self.stack.append(tokens[0])
@@ -100,6 +198,59 @@ class Compiler:
             else:
                 assert False
 
+    # {% cache key ttl %}...{% endcache %} renders its body into a nested
+    # generator and keeps the output in utemplate.fragments.store until the
+    # value of the key expression changes or ttl seconds (None for no expiry)
+    # pass. With optimize=True the output is streamed through the store's
+    # capture(), which keeps it only if it fits, otherwise it is joined and
+    # stored with put(). Variables set inside the block are local to it.
+    def open_cache(self, args):
+        # MicroPython's str.rsplit() does not take None as the separator
+        args = args.split()
+        key, ttl = " ".join(args[:-1]), args[-1]
+        self.fragments += 1
+        n = self.fragments
+        self.indent()
+        self.file_out.write("from utemplate import fragments as _fragments\n")
+        self.indent()
+        self.file_out.write("_k%d = %s\n" % (n, key))
+        self.indent()
+        self.file_out.write("_f%d = _fragments.store.get((__name__, %d, %d), _k%d)\n"
+                            % (n, self.fn_seq, n, n))
+        self.indent()
+        self.file_out.write("if _f%d is None:\n" % n)
+        self.stack.append("if")
+        self.indent()
+        self.file_out.write("def _frag%d():\n" % n)
+        self.stack.append("cache")
+        # keeps the nested function a generator if the body is empty
+        self.indent()
+        self.file_out.write("yield %s\n" % ("b''" if self.optimize else "''"))
+        self.cache_stack.append((n, ttl))
+
+    def close_cache(self):
+        n, ttl = self.cache_stack.pop()
+        assert self.stack[-1] == "cache"
+        self.stack.pop(-1)
+        if self.optimize:
+            self.indent()
+            self.file_out.write("yield from _fragments.store.capture((__name__, %d, %d), _k%d, _frag%d(), %s)\n"
+                                % (self.fn_seq, n, n, n, ttl))
+            self.indent(-1)
+            self.file_out.write("else:\n")
+            self.indent()
+            self.file_out.write("yield _f%d\n" % n)
+            self.stack.pop(-1)
+            return
+        self.indent()
+        self.file_out.write("_f%d = ''.join(_frag%d())\n" % (n, n))
+        self.indent()
+        self.file_out.write("_fragments.store.put((__name__, %d, %d), _k%d, _f%d, %s)\n"
+                            % (self.fn_seq, n, n, n, ttl))
+        self.stack.pop(-1)
+        self.indent()
+        self.file_out.write("yield _f%d\n" % n)
+
     def parse_line(self, l):
         while l:
             start = l.find(self.START_CHAR)
@@ -138,6 +289,7 @@ class Compiler:
         self.header()
         for l in self.file_in:
             self.parse_line(l)
+        self.flush_literal()
         self.close_literal()
         return self.seq
 